@@ -18,6 +18,9 @@
 import os
 
 import gevent.monkey
+import psycopg2
+from gevent.socket import wait_read, wait_write
+from psycopg2 import extensions
 
 
 # Ensure gevent is monkeypatched before ssl is imported (gunicorn does this too
@@ -29,6 +32,26 @@ import gevent.monkey
 gevent.monkey.patch_all()
 
 
+def wait_callback(connection, timeout=None):
+    """Yield to other greenlets while psycopg2 waits for the database."""
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+
+# Monkey patching does not reach the sockets of libpq; without the callback, a
+# query, e.g., of the change listener in `warehouse.events`, blocks every
+# greenlet of the worker until it returns.
+extensions.set_wait_callback(wait_callback)
+
+
 _config = os.environ["ENVIRONMENT"]
 
 bind = "0.0.0.0:8000"
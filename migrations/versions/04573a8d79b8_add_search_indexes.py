@@ -0,0 +1,38 @@
+"""add search indexes
+
+Revision ID: 04573a8d79b8
+Revises: a5f47f78f197
+Create Date: 2026-10-19 09:41:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '04573a8d79b8'
+down_revision = 'a5f47f78f197'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copies of the documents declared in `warehouse.models`; autogenerate
+# does not detect expression indexes.
+DOCUMENTS = [
+    ('organism', "to_tsvector('simple', name)"),
+    ('strain', "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(genotype, ''))"),
+    ('experiment', "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"),
+    ('sample', "to_tsvector('simple', name)"),
+    ('medium_compound', "to_tsvector('simple', compound_name)"),
+    ('proteomics', "to_tsvector('simple', full_name)"),
+]
+
+
+def upgrade():
+    for table, document in DOCUMENTS:
+        op.create_index(f'ix_{table}_search', table, [sa.text(document)], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table, _ in reversed(DOCUMENTS):
+        op.drop_index(f'ix_{table}_search', table_name=table)
@@ -0,0 +1,106 @@
+"""add measurement experiments
+
+Revision ID: 3e8b1f0c9a52
+Revises: 5c75d561ea63
+Create Date: 2026-10-19 11:02:17.508114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e8b1f0c9a52'
+down_revision = '5c75d561ea63'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['fluxomics', 'growth', 'metabolomics', 'molar_yields', 'proteomics', 'uptake_secretion_rates']
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('experiment_id', sa.Integer(), nullable=True))
+        # Assigning the key changes no data; do not announce it to clients.
+        op.execute(f'ALTER TABLE {table} DISABLE TRIGGER {table}_change')
+        op.execute(f"""
+            UPDATE {table} SET experiment_id = condition.experiment_id
+            FROM sample JOIN condition ON condition.id = sample.condition_id
+            WHERE sample.id = {table}.sample_id
+        """)
+        op.execute(f'ALTER TABLE {table} ENABLE TRIGGER {table}_change')
+        op.alter_column(table, 'experiment_id', nullable=False)
+        op.create_index(op.f(f'ix_{table}_experiment_id'), table, ['experiment_id'], unique=False)
+        op.create_foreign_key(op.f(f'{table}_experiment_id_fkey'), table, 'experiment', ['experiment_id'], ['id'], onupdate='CASCADE', deferrable=True, initially='DEFERRED')
+    # Frozen copy of the triggers declared in `warehouse.models`.
+    move_measurements = ' '.join(
+        f'UPDATE {table} SET experiment_id = experiment '
+        f'WHERE sample_id = ANY (samples);'
+        for table in TABLES
+    )
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION assign_measurement_experiment()
+        RETURNS trigger AS $$
+        BEGIN
+            -- Samples copied in the same statement are not visible yet; the
+            -- copies of their measurements name the experiment themselves.
+            NEW.experiment_id := COALESCE((
+                SELECT condition.experiment_id
+                FROM sample JOIN condition ON condition.id = sample.condition_id
+                WHERE sample.id = NEW.sample_id
+            ), NEW.experiment_id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE OR REPLACE FUNCTION move_measurements_experiment()
+        RETURNS trigger AS $$
+        DECLARE
+            experiment integer;
+            samples integer[];
+        BEGIN
+            IF TG_TABLE_NAME = 'sample' THEN
+                IF NEW.condition_id = OLD.condition_id THEN
+                    RETURN NULL;
+                END IF;
+                SELECT experiment_id INTO experiment FROM condition
+                WHERE id = NEW.condition_id;
+                samples := ARRAY[NEW.id];
+            ELSE
+                IF NEW.experiment_id = OLD.experiment_id THEN
+                    RETURN NULL;
+                END IF;
+                experiment := NEW.experiment_id;
+                samples := ARRAY(
+                    SELECT id FROM sample WHERE condition_id = NEW.id
+                );
+            END IF;
+            {move_measurements}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER sample_experiment AFTER UPDATE OF condition_id
+        ON sample FOR EACH ROW EXECUTE PROCEDURE move_measurements_experiment();
+        CREATE TRIGGER condition_experiment AFTER UPDATE OF experiment_id
+        ON condition FOR EACH ROW
+        EXECUTE PROCEDURE move_measurements_experiment();
+    """)
+    for table in TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_experiment
+            BEFORE INSERT OR UPDATE OF sample_id ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE assign_measurement_experiment();
+        """)
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_experiment ON {table}')
+    op.execute('DROP TRIGGER condition_experiment ON condition')
+    op.execute('DROP TRIGGER sample_experiment ON sample')
+    op.execute('DROP FUNCTION move_measurements_experiment()')
+    op.execute('DROP FUNCTION assign_measurement_experiment()')
+    for table in reversed(TABLES):
+        op.drop_constraint(op.f(f'{table}_experiment_id_fkey'), table, type_='foreignkey')
+        op.drop_index(op.f(f'ix_{table}_experiment_id'), table_name=table)
+        op.drop_column(table, 'experiment_id')
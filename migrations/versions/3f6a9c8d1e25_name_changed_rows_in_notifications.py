@@ -0,0 +1,84 @@
+"""name the changed rows in change notifications
+
+Revision ID: 3f6a9c8d1e25
+Revises: 7d2e4b91c0a3
+Create Date: 2026-10-19 16:48:35.112907
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a9c8d1e25'
+down_revision = '7d2e4b91c0a3'
+branch_labels = None
+depends_on = None
+
+
+CHANNEL = 'warehouse_changes'
+
+# The column named in the notifications of each table. This is a frozen copy
+# of the change triggers declared in `warehouse.models`.
+COLUMNS = {
+    'organism': 'project_id',
+    'strain': 'project_id',
+    'experiment': 'project_id',
+    'medium': 'project_id',
+    'medium_compound': 'medium_id',
+    'condition': 'experiment_id',
+    'sample': 'condition_id',
+}
+for _table in ['fluxomics', 'metabolomics', 'proteomics',
+               'uptake_secretion_rates', 'molar_yields', 'growth',
+               'packed_metabolomics', 'packed_proteomics']:
+    COLUMNS[_table] = 'sample_id'
+
+
+def notify_functions(with_id):
+    """
+    Return the functions sending the notifications, with or without the id of
+    the changed row. The triggers call the functions by name.
+    """
+    row_id = "'id', NEW.id," if with_id else ""
+    object_id = "'id', NEW.object_id," if with_id else ""
+    functions = [
+        f"""
+        CREATE OR REPLACE FUNCTION notify_{table}_change()
+        RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', json_build_object(
+                'resource', TG_TABLE_NAME,
+                'action', lower(TG_OP),
+                {row_id}
+                '{column}', NEW.{column}
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+        for table, column in COLUMNS.items()
+    ]
+    functions.append(f"""
+        CREATE OR REPLACE FUNCTION notify_deletion() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', json_build_object(
+                'resource', NEW.resource,
+                'action', 'delete',
+                {object_id}
+                'project_id', NEW.project_id
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    return functions
+
+
+def upgrade():
+    for function in notify_functions(with_id=True):
+        op.execute(function)
+
+
+def downgrade():
+    for function in notify_functions(with_id=False):
+        op.execute(function)
@@ -0,0 +1,51 @@
+"""give packed measurements ids
+
+Revision ID: 4b9e27d6a1f8
+Revises: 3f6a9c8d1e25
+Create Date: 2026-10-19 19:12:03.514290
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9e27d6a1f8'
+down_revision = '3f6a9c8d1e25'
+branch_labels = None
+depends_on = None
+
+
+# The packed tables and the tables of their unpacked measurements, whose
+# sequences the ids are drawn from.
+UNPACKED = {
+    'packed_metabolomics': 'metabolomics',
+    'packed_proteomics': 'proteomics',
+}
+
+
+def upgrade():
+    for table, unpacked in UNPACKED.items():
+        op.add_column(
+            table,
+            sa.Column('ids', postgresql.ARRAY(sa.Integer()), nullable=True),
+        )
+        op.execute(f"""
+            UPDATE {table}
+            SET ids = ARRAY(
+                SELECT nextval(pg_get_serial_sequence('{unpacked}', 'id'))
+                FROM generate_series(1, cardinality(measurements))
+            )
+        """)
+        op.alter_column(table, 'ids', nullable=False)
+        op.create_index(
+            f'ix_{table}_ids', table, ['ids'], unique=False,
+            postgresql_using='gin',
+        )
+
+
+def downgrade():
+    for table in UNPACKED:
+        op.drop_index(f'ix_{table}_ids', table_name=table)
+        op.drop_column(table, 'ids')
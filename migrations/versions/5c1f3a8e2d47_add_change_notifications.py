@@ -0,0 +1,74 @@
+"""add change notifications
+
+Revision ID: 5c1f3a8e2d47
+Revises: bdd302e1d80e
+Create Date: 2026-10-19 11:42:07.215603
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f3a8e2d47'
+down_revision = 'bdd302e1d80e'
+branch_labels = None
+depends_on = None
+
+
+CHANNEL = 'warehouse_changes'
+
+# The column named in the notifications of each table. This is a frozen copy
+# of the change triggers declared in `warehouse.models`.
+COLUMNS = {
+    'organism': 'project_id',
+    'strain': 'project_id',
+    'experiment': 'project_id',
+    'medium': 'project_id',
+    'medium_compound': 'medium_id',
+    'condition': 'experiment_id',
+    'sample': 'condition_id',
+}
+for _table in ['fluxomics', 'metabolomics', 'proteomics',
+               'uptake_secretion_rates', 'molar_yields', 'growth']:
+    COLUMNS[_table] = 'sample_id'
+
+
+def upgrade():
+    for table, column in COLUMNS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION notify_{table}_change()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('{CHANNEL}', json_build_object(
+                    'resource', TG_TABLE_NAME,
+                    'action', lower(TG_OP),
+                    '{column}', NEW.{column}
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER {table}_change AFTER INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE notify_{table}_change();
+        """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_deletion() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', json_build_object(
+                'resource', NEW.resource,
+                'action', 'delete',
+                'project_id', NEW.project_id
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER tombstone_deletion AFTER INSERT ON tombstone
+        FOR EACH ROW EXECUTE PROCEDURE notify_deletion();
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER tombstone_deletion ON tombstone')
+    op.execute('DROP FUNCTION notify_deletion()')
+    for table in COLUMNS:
+        op.execute(f'DROP TRIGGER {table}_change ON {table}')
+        op.execute(f'DROP FUNCTION notify_{table}_change()')
@@ -0,0 +1,94 @@
+"""record tombstones of directly deleted rows only
+
+Revision ID: 7d2e4b91c0a3
+Revises: b5792bad6d32
+Create Date: 2026-10-19 16:02:11.408213
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e4b91c0a3'
+down_revision = 'b5792bad6d32'
+branch_labels = None
+depends_on = None
+
+
+# The foreign key to the parent of each table without a `project_id`, and the
+# joins leading from the parent to the table with the `project_id`. This is a
+# frozen copy of the tombstone triggers declared in `warehouse.models`.
+PARENTS = {
+    'medium_compound': ('medium_id', 'medium', '', 'medium'),
+    'condition': ('experiment_id', 'experiment', '', 'experiment'),
+    'sample': (
+        'condition_id', 'condition',
+        ' JOIN experiment ON experiment.id = condition.experiment_id',
+        'experiment',
+    ),
+}
+for _table in ['fluxomics', 'metabolomics', 'proteomics',
+               'uptake_secretion_rates', 'molar_yields', 'growth',
+               'packed_metabolomics', 'packed_proteomics']:
+    PARENTS[_table] = (
+        'sample_id', 'sample',
+        ' JOIN condition ON condition.id = sample.condition_id'
+        ' JOIN experiment ON experiment.id = condition.experiment_id',
+        'experiment',
+    )
+TABLES = ['organism', 'strain', 'experiment', 'medium', *PARENTS]
+
+
+def tombstone_trigger(table, cascaded):
+    """
+    Return the trigger recording the tombstones of `table`.
+
+    The previous triggers also recorded the rows deleted by `ON DELETE CASCADE`,
+    whose project is looked up in the tombstone of their parent.
+    """
+    if table in PARENTS:
+        column, parent, joins, owner = PARENTS[table]
+        project_id = (
+            f"(SELECT {owner}.project_id "
+            f"FROM {parent}{joins} "
+            f"WHERE {parent}.id = OLD.{column})"
+        )
+        if cascaded:
+            project_id = (
+                f"COALESCE("
+                f"(SELECT project_id FROM tombstone "
+                f"WHERE resource = '{parent}' "
+                f"AND object_id = OLD.{column} LIMIT 1), "
+                f"{project_id})"
+            )
+    else:
+        project_id = 'OLD.project_id'
+    if cascaded:
+        deleted, condition = "now()", ""
+    else:
+        deleted, condition = "clock_timestamp()", "WHEN (pg_trigger_depth() = 0)"
+    return f"""
+        CREATE OR REPLACE FUNCTION record_{table}_tombstone()
+        RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO tombstone (resource, object_id, project_id, deleted)
+            VALUES ('{table}', OLD.id, {project_id}, {deleted} AT TIME ZONE 'utc');
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER {table}_tombstone BEFORE DELETE ON {table}
+        FOR EACH ROW {condition}
+        EXECUTE PROCEDURE record_{table}_tombstone();
+    """
+
+
+def upgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_tombstone ON {table}')
+        op.execute(tombstone_trigger(table, cascaded=False))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_tombstone ON {table}')
+        op.execute(tombstone_trigger(table, cascaded=True))
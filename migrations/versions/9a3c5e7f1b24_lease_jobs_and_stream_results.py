@@ -0,0 +1,47 @@
+"""lease jobs and stream their results
+
+Revision ID: 9a3c5e7f1b24
+Revises: 4b9e27d6a1f8
+Create Date: 2026-10-19 20:03:41.208716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3c5e7f1b24'
+down_revision = '4b9e27d6a1f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('job', sa.Column('heartbeat', sa.DateTime(), nullable=True))
+    op.add_column(
+        'job',
+        sa.Column(
+            'attempts', sa.Integer(), nullable=False, server_default='0'
+        ),
+    )
+    op.alter_column('job', 'attempts', server_default=None)
+    # Running jobs count as claimed once, when they were last updated.
+    op.execute(
+        "UPDATE job SET heartbeat = updated, attempts = 1 "
+        "WHERE status = 'running'"
+    )
+    op.execute(
+        "ALTER TABLE job ALTER COLUMN result TYPE bytea "
+        "USING convert_to(result::text, 'UTF8')"
+    )
+    op.execute("ALTER TABLE job ALTER COLUMN result SET STORAGE EXTERNAL")
+
+
+def downgrade():
+    op.execute(
+        "ALTER TABLE job ALTER COLUMN result TYPE jsonb "
+        "USING convert_from(result, 'UTF8')::jsonb"
+    )
+    op.execute("ALTER TABLE job ALTER COLUMN result SET STORAGE EXTENDED")
+    op.drop_column('job', 'attempts')
+    op.drop_column('job', 'heartbeat')
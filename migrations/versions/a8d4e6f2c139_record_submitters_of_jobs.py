@@ -0,0 +1,28 @@
+"""record the submitters of jobs
+
+Revision ID: a8d4e6f2c139
+Revises: f3a7c1d9b248
+Create Date: 2026-10-20 14:08:51.736920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4e6f2c139'
+down_revision = 'f3a7c1d9b248'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The submitters of the queued jobs are unknown; those of no project are
+    # no longer visible to anyone.
+    op.add_column(
+        'job', sa.Column('subject', sa.String(length=255), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('job', 'subject')
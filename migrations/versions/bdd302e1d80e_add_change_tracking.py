@@ -0,0 +1,128 @@
+"""add change tracking
+
+Revision ID: bdd302e1d80e
+Revises: 0926ff07931f
+Create Date: 2026-10-19 09:10:30.680825
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bdd302e1d80e'
+down_revision = '0926ff07931f'
+branch_labels = None
+depends_on = None
+
+
+# The foreign key to the parent of each table without a `project_id`, and the
+# joins leading from the parent to the table with the `project_id`. This is a
+# frozen copy of the tombstone triggers declared in `warehouse.models`.
+PARENTS = {
+    'medium_compound': ('medium_id', 'medium', '', 'medium'),
+    'condition': ('experiment_id', 'experiment', '', 'experiment'),
+    'sample': (
+        'condition_id', 'condition',
+        ' JOIN experiment ON experiment.id = condition.experiment_id',
+        'experiment',
+    ),
+}
+for _table in ['fluxomics', 'metabolomics', 'proteomics',
+               'uptake_secretion_rates', 'molar_yields', 'growth']:
+    PARENTS[_table] = (
+        'sample_id', 'sample',
+        ' JOIN condition ON condition.id = sample.condition_id'
+        ' JOIN experiment ON experiment.id = condition.experiment_id',
+        'experiment',
+    )
+TABLES = ['organism', 'strain', 'experiment', 'medium', *PARENTS]
+
+
+def tombstone_trigger(table):
+    if table in PARENTS:
+        column, parent, joins, owner = PARENTS[table]
+        project_id = (
+            f"COALESCE("
+            f"(SELECT project_id FROM tombstone "
+            f"WHERE resource = '{parent}' "
+            f"AND object_id = OLD.{column} LIMIT 1), "
+            f"(SELECT {owner}.project_id "
+            f"FROM {parent}{joins} "
+            f"WHERE {parent}.id = OLD.{column}))"
+        )
+    else:
+        project_id = 'OLD.project_id'
+    return f"""
+        CREATE OR REPLACE FUNCTION record_{table}_tombstone()
+        RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO tombstone (resource, object_id, project_id, deleted)
+            VALUES ('{table}', OLD.id, {project_id}, now() AT TIME ZONE 'utc');
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER {table}_tombstone BEFORE DELETE ON {table}
+        FOR EACH ROW EXECUTE PROCEDURE record_{table}_tombstone();
+    """
+
+
+def upgrade():
+    # The `updated` timestamp is now set on creation as well.
+    for table in TABLES:
+        op.execute(
+            f'UPDATE {table} SET updated = created WHERE updated IS NULL'
+        )
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('tombstone',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resource', sa.Text(), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=True),
+    sa.Column('deleted', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tombstone_deleted'), 'tombstone', ['deleted'], unique=False)
+    op.create_index(op.f('ix_tombstone_project_id'), 'tombstone', ['project_id'], unique=False)
+    op.create_index('ix_tombstone_resource_object_id', 'tombstone', ['resource', 'object_id'], unique=False)
+    op.create_index(op.f('ix_condition_updated'), 'condition', ['updated'], unique=False)
+    op.create_index(op.f('ix_experiment_updated'), 'experiment', ['updated'], unique=False)
+    op.create_index(op.f('ix_fluxomics_updated'), 'fluxomics', ['updated'], unique=False)
+    op.create_index(op.f('ix_growth_updated'), 'growth', ['updated'], unique=False)
+    op.create_index(op.f('ix_medium_updated'), 'medium', ['updated'], unique=False)
+    op.create_index(op.f('ix_medium_compound_updated'), 'medium_compound', ['updated'], unique=False)
+    op.create_index(op.f('ix_metabolomics_updated'), 'metabolomics', ['updated'], unique=False)
+    op.create_index(op.f('ix_molar_yields_updated'), 'molar_yields', ['updated'], unique=False)
+    op.create_index(op.f('ix_organism_updated'), 'organism', ['updated'], unique=False)
+    op.create_index(op.f('ix_proteomics_updated'), 'proteomics', ['updated'], unique=False)
+    op.create_index(op.f('ix_sample_updated'), 'sample', ['updated'], unique=False)
+    op.create_index(op.f('ix_strain_updated'), 'strain', ['updated'], unique=False)
+    op.create_index(op.f('ix_uptake_secretion_rates_updated'), 'uptake_secretion_rates', ['updated'], unique=False)
+    # ### end Alembic commands ###
+    for table in TABLES:
+        op.execute(tombstone_trigger(table))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_tombstone ON {table}')
+        op.execute(f'DROP FUNCTION record_{table}_tombstone()')
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index(op.f('ix_uptake_secretion_rates_updated'), table_name='uptake_secretion_rates')
+    op.drop_index(op.f('ix_strain_updated'), table_name='strain')
+    op.drop_index(op.f('ix_sample_updated'), table_name='sample')
+    op.drop_index(op.f('ix_proteomics_updated'), table_name='proteomics')
+    op.drop_index(op.f('ix_organism_updated'), table_name='organism')
+    op.drop_index(op.f('ix_molar_yields_updated'), table_name='molar_yields')
+    op.drop_index(op.f('ix_metabolomics_updated'), table_name='metabolomics')
+    op.drop_index(op.f('ix_medium_compound_updated'), table_name='medium_compound')
+    op.drop_index(op.f('ix_medium_updated'), table_name='medium')
+    op.drop_index(op.f('ix_growth_updated'), table_name='growth')
+    op.drop_index(op.f('ix_fluxomics_updated'), table_name='fluxomics')
+    op.drop_index(op.f('ix_experiment_updated'), table_name='experiment')
+    op.drop_index(op.f('ix_condition_updated'), table_name='condition')
+    op.drop_index('ix_tombstone_resource_object_id', table_name='tombstone')
+    op.drop_index(op.f('ix_tombstone_project_id'), table_name='tombstone')
+    op.drop_index(op.f('ix_tombstone_deleted'), table_name='tombstone')
+    op.drop_table('tombstone')
+    # ### end Alembic commands ###
@@ -0,0 +1,42 @@
+"""scope idempotency keys to users
+
+Revision ID: d6f1a83c52e9
+Revises: 9a3c5e7f1b24
+Create Date: 2026-10-19 21:14:52.630187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f1a83c52e9'
+down_revision = '9a3c5e7f1b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The users of the recorded keys are unknown; retries of their requests
+    # are handled again, like those of expired keys.
+    op.execute("DELETE FROM idempotency_key")
+    op.add_column(
+        'idempotency_key',
+        sa.Column('subject', sa.String(length=255), nullable=False),
+    )
+    op.drop_constraint(
+        'idempotency_key_pkey', 'idempotency_key', type_='primary'
+    )
+    op.create_primary_key(
+        'idempotency_key_pkey', 'idempotency_key', ['subject', 'key']
+    )
+
+
+def downgrade():
+    # Keys of different users may collide.
+    op.execute("DELETE FROM idempotency_key")
+    op.drop_constraint(
+        'idempotency_key_pkey', 'idempotency_key', type_='primary'
+    )
+    op.drop_column('idempotency_key', 'subject')
+    op.create_primary_key('idempotency_key_pkey', 'idempotency_key', ['key'])
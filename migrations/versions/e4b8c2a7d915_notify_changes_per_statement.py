@@ -0,0 +1,129 @@
+"""notify changes per statement
+
+Revision ID: e4b8c2a7d915
+Revises: d6f1a83c52e9
+Create Date: 2026-10-20 09:26:18.402615
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8c2a7d915'
+down_revision = 'd6f1a83c52e9'
+branch_labels = None
+depends_on = None
+
+
+CHANNEL = 'warehouse_changes'
+NOTIFICATION_IDS = 500
+
+# The column named in the notifications of each table. This is a frozen copy
+# of the change triggers declared in `warehouse.models`.
+COLUMNS = {
+    'organism': 'project_id',
+    'strain': 'project_id',
+    'experiment': 'project_id',
+    'medium': 'project_id',
+    'medium_compound': 'medium_id',
+    'condition': 'experiment_id',
+    'sample': 'condition_id',
+}
+for _table in ['fluxomics', 'metabolomics', 'proteomics',
+               'uptake_secretion_rates', 'molar_yields', 'growth',
+               'packed_metabolomics', 'packed_proteomics']:
+    COLUMNS[_table] = 'sample_id'
+
+
+def notify_changed(resource, action, id, column):
+    return f"""
+        PERFORM pg_notify('{CHANNEL}', json_build_object(
+            'resource', resource,
+            'action', {action},
+            'ids', ids,
+            '{column}', {column}
+        )::text)
+        FROM (
+            SELECT resource, {column}, array_agg(id ORDER BY id) AS ids
+            FROM (
+                SELECT
+                    {resource} AS resource, {id} AS id, {column},
+                    (row_number() OVER (
+                        PARTITION BY {resource}, {column} ORDER BY {id}
+                    ) - 1) / {NOTIFICATION_IDS} AS chunk
+                FROM changed
+            ) AS numbered
+            GROUP BY resource, {column}, chunk
+        ) AS chunks
+        ORDER BY ids[1];
+    """
+
+
+def upgrade():
+    for table, column in COLUMNS.items():
+        op.execute(f'DROP TRIGGER {table}_change ON {table}')
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION notify_{table}_change()
+            RETURNS trigger AS $$
+            BEGIN
+                {notify_changed("TG_TABLE_NAME", "lower(TG_OP)", "id", column)}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER {table}_insert_change AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS changed
+            FOR EACH STATEMENT EXECUTE PROCEDURE notify_{table}_change();
+            CREATE TRIGGER {table}_update_change AFTER UPDATE ON {table}
+            REFERENCING NEW TABLE AS changed
+            FOR EACH STATEMENT EXECUTE PROCEDURE notify_{table}_change();
+        """)
+    op.execute('DROP TRIGGER tombstone_deletion ON tombstone')
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_deletion() RETURNS trigger AS $$
+        BEGIN
+            {notify_changed("resource", "'delete'", "object_id", "project_id")}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER tombstone_deletion AFTER INSERT ON tombstone
+        REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_deletion();
+    """)
+
+
+def downgrade():
+    for table, column in COLUMNS.items():
+        op.execute(f'DROP TRIGGER {table}_insert_change ON {table}')
+        op.execute(f'DROP TRIGGER {table}_update_change ON {table}')
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION notify_{table}_change()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('{CHANNEL}', json_build_object(
+                    'resource', TG_TABLE_NAME,
+                    'action', lower(TG_OP),
+                    'id', NEW.id,
+                    '{column}', NEW.{column}
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER {table}_change AFTER INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE notify_{table}_change();
+        """)
+    op.execute('DROP TRIGGER tombstone_deletion ON tombstone')
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_deletion() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', json_build_object(
+                'resource', NEW.resource,
+                'action', 'delete',
+                'id', NEW.object_id,
+                'project_id', NEW.project_id
+            )::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER tombstone_deletion AFTER INSERT ON tombstone
+        FOR EACH ROW EXECUTE PROCEDURE notify_deletion();
+    """)
@@ -0,0 +1,69 @@
+"""record tombstones of packed measurements
+
+Revision ID: f3a7c1d9b248
+Revises: e4b8c2a7d915
+Create Date: 2026-10-20 11:42:37.195804
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c1d9b248'
+down_revision = 'e4b8c2a7d915'
+branch_labels = None
+depends_on = None
+
+
+# The packed tables and the tables of their unpacked measurements. This is a
+# frozen copy of the tombstone triggers declared in `warehouse.models`.
+UNPACKED = {
+    'packed_metabolomics': 'metabolomics',
+    'packed_proteomics': 'proteomics',
+}
+PROJECT_ID = (
+    "(SELECT experiment.project_id FROM sample"
+    " JOIN condition ON condition.id = sample.condition_id"
+    " JOIN experiment ON experiment.id = condition.experiment_id"
+    " WHERE sample.id = OLD.sample_id)"
+)
+
+
+def upgrade():
+    for table, unpacked in UNPACKED.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION record_{table}_tombstone()
+            RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO tombstone (resource, object_id, project_id, deleted)
+                SELECT
+                    '{unpacked}', dropped.id, {PROJECT_ID},
+                    clock_timestamp() AT TIME ZONE 'utc'
+                FROM unnest(OLD.ids) AS dropped (id)
+                WHERE TG_OP = 'DELETE' OR NOT dropped.id = ANY(NEW.ids);
+                RETURN OLD;
+            END;
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER {table}_repack_tombstone
+            AFTER UPDATE OF ids ON {table}
+            FOR EACH ROW WHEN (NOT OLD.ids <@ NEW.ids)
+            EXECUTE PROCEDURE record_{table}_tombstone();
+        """)
+
+
+def downgrade():
+    for table in UNPACKED:
+        op.execute(f'DROP TRIGGER {table}_repack_tombstone ON {table}')
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION record_{table}_tombstone()
+            RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO tombstone (resource, object_id, project_id, deleted)
+                VALUES (
+                    '{table}', OLD.id, {PROJECT_ID},
+                    clock_timestamp() AT TIME ZONE 'utc'
+                );
+                RETURN OLD;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
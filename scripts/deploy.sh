@@ -18,11 +18,14 @@ set -xeu
 
 if [ "${TRAVIS_BRANCH}" = "master" ]; then
   DEPLOYMENT=warehouse-production
+  WORKER_DEPLOYMENT=warehouse-worker-production
 elif [ "${TRAVIS_BRANCH}" = "devel" ]; then
   DEPLOYMENT=warehouse-staging
+  WORKER_DEPLOYMENT=warehouse-worker-staging
 else
   echo "Skipping deployment for branch ${TRAVIS_BRANCH}"
   exit 0
 fi
 
 kubectl set image deployment/${DEPLOYMENT} web=${IMAGE}:${BUILD_TAG}
+kubectl set image deployment/${WORKER_DEPLOYMENT} worker=${IMAGE}:${BUILD_TAG}
@@ -0,0 +1,172 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Summarize the measurements of conditions and experiments.
+
+The replicates of a measurement, i.e., the measurements of the same entity in
+the samples of a condition, are aggregated with one `GROUP BY` query per
+measurement type, instead of transferring every measurement to the client.
+Those of all conditions of an experiment are aggregated by the same query
+with `GROUPING SETS`.
+"""
+
+from sqlalchemy import func, tuple_
+
+from warehouse import models
+from warehouse.app import db
+from warehouse.utils import MEASUREMENTS
+
+
+# The columns identifying the measured entity and the columns describing it,
+# by measurement name. Measurements are grouped by the former.
+GROUPS = {
+    "fluxomics": (
+        ("reaction_namespace", "reaction_identifier"),
+        ("reaction_name",),
+    ),
+    "metabolomics": (
+        ("compound_namespace", "compound_identifier"),
+        ("compound_name",),
+    ),
+    "proteomics": (("identifier",), ("name", "full_name")),
+    "uptake_secretion_rates": (
+        ("compound_namespace", "compound_identifier"),
+        ("compound_name",),
+    ),
+    "molar_yields": (
+        (
+            "product_namespace",
+            "product_identifier",
+            "substrate_namespace",
+            "substrate_identifier",
+        ),
+        ("product_name", "substrate_name"),
+    ),
+    "growth_rates": ((), ()),
+}
+
+
+def _aggregates(Measurement, condition_ids, keys, labels, pooled=False):
+    """
+    Query the statistics of the measurements grouped by the given keys.
+
+    The measurements are grouped by condition and, if `pooled`, also across
+    all of the given conditions, with a `condition_id` of `None`.
+    """
+    value = Measurement.measurement
+    # The columns of the dictionaries are named after their entries' columns.
+    columns = [getattr(Measurement, key).label(key) for key in keys]
+    keys = [getattr(Measurement, key) for key in keys]
+    query = (
+        db.session.query(
+            models.Sample.condition_id,
+            *columns,
+            *(
+                func.max(getattr(Measurement, label)).label(label)
+                for label in labels
+            ),
+            func.count().label("count"),
+            func.avg(value).label("mean"),
+            func.stddev_samp(value).label("stddev"),
+            func.min(value).label("min"),
+            func.max(value).label("max"),
+            # The uncertainty of the mean of the independent measurements
+            # which have one.
+            (
+                func.sqrt(
+                    func.sum(Measurement.uncertainty * Measurement.uncertainty)
+                )
+                / func.count(Measurement.uncertainty)
+            ).label("uncertainty"),
+        )
+        .select_from(Measurement)
+        .join(models.Sample, models.Sample.id == Measurement.sample_id)
+        .filter(models.Sample.condition_id.in_(condition_ids))
+    )
+    if pooled:
+        groups = [
+            func.grouping_sets(
+                tuple_(models.Sample.condition_id, *keys), tuple_(*keys)
+            )
+        ]
+    else:
+        groups = [models.Sample.condition_id, *keys]
+    return (
+        models.join_entities(query, Measurement)
+        .group_by(*groups)
+        .order_by(models.Sample.condition_id, *keys)
+    )
+
+
+def condition_statistics(condition_ids, types):
+    """
+    Aggregate the measurements of each of the given conditions.
+
+    :param condition_ids: The ids of the conditions
+    :param types: The names of the measurements to aggregate, see
+        `utils.MEASUREMENTS`
+    :return: A list of statistics to serialize with
+        `schemas.ConditionStatistics`, in the order of the given conditions
+    """
+    statistics = {
+        condition_id: {
+            "condition_id": condition_id,
+            **{name: [] for name in types},
+        }
+        for condition_id in condition_ids
+    }
+    for name in types:
+        keys, labels = GROUPS[name]
+        for row in _aggregates(
+            models.with_packed(MEASUREMENTS[name]), condition_ids, keys, labels
+        ):
+            statistics[row.condition_id][name].append(row._asdict())
+    return list(statistics.values())
+
+
+def experiment_statistics(condition_ids, types):
+    """
+    Aggregate the measurements of the conditions of an experiment.
+
+    :param condition_ids: The ids of the conditions of the experiment
+    :param types: The names of the measurements to aggregate, see
+        `utils.MEASUREMENTS`
+    :return: The statistics of all conditions, with those of each condition
+        in `conditions`, to serialize with `schemas.ExperimentStatistics`
+    """
+    statistics = {
+        condition_id: {
+            "condition_id": condition_id,
+            **{name: [] for name in types},
+        }
+        for condition_id in condition_ids
+    }
+    pooled = {name: [] for name in types}
+    if condition_ids:
+        for name in types:
+            keys, labels = GROUPS[name]
+            for row in _aggregates(
+                models.with_packed(MEASUREMENTS[name]),
+                condition_ids,
+                keys,
+                labels,
+                pooled=True,
+            ):
+                if row.condition_id is None:
+                    pooled[name].append(row._asdict())
+                else:
+                    statistics[row.condition_id][name].append(row._asdict())
+    return {**pooled, "conditions": list(statistics.values())}
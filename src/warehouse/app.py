@@ -42,7 +42,7 @@ basic_auth = BasicAuth(app)
 
 def init_app(application):
     """Initialize the main app with config information and routes."""
-    from warehouse import models, resources
+    from warehouse import events, jobs, models, resources, utils
 
     logging.config.dictConfig(application.config["LOGGING"])
     application.wsgi_app = ProxyFix(application.wsgi_app)
@@ -65,6 +65,12 @@ def init_app(application):
     # Add routes and resources
     resources.init_app(application)
 
+    # Add the listener for streaming changes
+    events.init_app(application)
+
+    # Add the commands running background jobs
+    jobs.init_app(application)
+
     # Add the flask-admin interface
     @application.before_request
     def restrict_admin():
@@ -85,5 +91,9 @@ def init_app(application):
     admin.add_view(ModelView(models.MolarYields, db.session))
     admin.add_view(ModelView(models.Growth, db.session))
 
-    # Add CORS information for all resources.
-    CORS(application)
+    # Add CORS information for all resources, and let browsers read the ids
+    # which collections did not return.
+    CORS(
+        application,
+        expose_headers=[utils.MISSING_IDS_HEADER, utils.FORBIDDEN_IDS_HEADER],
+    )
@@ -0,0 +1,208 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Assemble the nested data of experiments and conditions.
+
+Serializing `schemas.ConditionData` straight from the models lazily loads the
+samples of every condition and every measurement type of every sample. Instead,
+each table is loaded with a single query for the whole tree, and the rows are
+handed to the schemas through proxies of the model instances. Packed
+measurements are unpacked in the database and served along with the others.
+"""
+
+from collections import defaultdict
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+
+from warehouse import models
+from warehouse.app import db
+from warehouse.utils import changed_since, entity_fields
+
+
+# The measurement relationships of samples and their models.
+SAMPLE_MEASUREMENTS = {
+    "fluxomics": models.Fluxomics,
+    "metabolomics": models.Metabolomics,
+    "proteomics": models.Proteomics,
+    "uptake_secretion_rates": models.UptakeSecretionRates,
+    "molar_yields": models.MolarYields,
+    "growth_rate": models.Growth,
+}
+
+
+class Prefetched(object):
+    """Proxy a model instance, replacing relationships by loaded values."""
+
+    def __init__(self, instance, **relationships):
+        self._instance = instance
+        self.__dict__.update(relationships)
+
+    def __getattr__(self, name):
+        return getattr(self._instance, name)
+
+
+def _unpacked(Measurement, selected, updated_since):
+    """
+    Load the packed measurements of a model, unpacked by `models.unpack`.
+
+    :param Measurement: The measurement model class, see `models.PACKED_MODELS`
+    :param selected: A function returning the filter of the measurements to
+        load, given their columns
+    :param updated_since: See `conditions_data`
+    :return: A list of dictionaries with the fields of the model
+    """
+    unpacked = models.unpack(models.PACKED_MODELS[Measurement]).alias(
+        "unpacked"
+    )
+    query = db.session.query(unpacked)
+    for relationship, fields in entity_fields(Measurement).items():
+        Dictionary = models.entity_alias(Measurement, relationship)
+        query = query.join(
+            Dictionary, unpacked.c[f"{relationship}_id"] == Dictionary.id
+        ).add_columns(
+            *(
+                getattr(Dictionary, column).label(name)
+                for column, name in fields.items()
+            )
+        )
+    return [
+        row._asdict()
+        for row in query.filter(selected(unpacked.c))
+        .filter(changed_since(unpacked.c.updated, updated_since))
+        .order_by(unpacked.c.id)
+    ]
+
+
+def _changed(ModelClass, updated_since, ids):
+    """Return a filter for the rows changed since a time or with given ids."""
+    changed = changed_since(ModelClass.updated, updated_since)
+    if updated_since is None or not ids:
+        return changed
+    return or_(changed, ModelClass.id.in_(ids))
+
+
+def conditions_data(
+    conditions,
+    updated_since=None,
+    experiment_id=None,
+    relations=None,
+    changed_conditions=True,
+):
+    """
+    Load the given conditions together with their data.
+
+    :param conditions: A query of the conditions to load
+    :param updated_since: Only include measurements created or updated at or
+        after this time, and the samples and conditions which were or contain
+        such measurements (or samples)
+    :param experiment_id: The experiment of the conditions, if they are all of
+        its conditions, to find their measurements by experiment
+    :param relations: The relations to load, see `schemas.data_relations`, or
+        `None` to load all of them; the others are never queried
+    :param changed_conditions: Whether to filter the conditions by
+        `updated_since`, rather than to include all of them
+    :return: A list of proxied conditions to serialize with
+        `schemas.ConditionData`
+    """
+    if relations is None:
+        relations = {"strain", "medium", "compounds", "samples"}
+        relations.update(SAMPLE_MEASUREMENTS)
+    condition_ids = conditions.with_entities(models.Condition.id)
+
+    measurements = defaultdict(lambda: defaultdict(list))
+    sample_ids = db.session.query(models.Sample.id).filter(
+        models.Sample.condition_id.in_(condition_ids)
+    )
+    names = [
+        name
+        for name in SAMPLE_MEASUREMENTS
+        if "samples" in relations and name in relations
+    ]
+
+    def selected(Measurement):
+        if experiment_id is not None:
+            return Measurement.experiment_id == experiment_id
+        return Measurement.sample_id.in_(sample_ids)
+
+    for name in names:
+        Measurement = SAMPLE_MEASUREMENTS[name]
+        for measurement in (
+            Measurement.query.filter(selected(Measurement))
+            .filter(changed_since(Measurement.updated, updated_since))
+            .order_by(Measurement.id)
+        ):
+            measurements[measurement.sample_id][name].append(measurement)
+        if Measurement not in models.PACKED_MODELS:
+            continue
+        for measurement in _unpacked(Measurement, selected, updated_since):
+            measurements[measurement["sample_id"]][name].append(measurement)
+
+    samples = defaultdict(list)
+    if "samples" in relations:
+        for sample in (
+            models.Sample.query.filter(
+                models.Sample.condition_id.in_(condition_ids)
+            )
+            .filter(_changed(models.Sample, updated_since, set(measurements)))
+            .order_by(models.Sample.id)
+        ):
+            sample_measurements = {
+                name: measurements[sample.id][name] for name in names
+            }
+            if "growth_rate" in sample_measurements:
+                growth_rates = sample_measurements["growth_rate"]
+                sample_measurements["growth_rate"] = (
+                    growth_rates[0] if growth_rates else None
+                )
+            samples[sample.condition_id].append(
+                Prefetched(sample, **sample_measurements)
+            )
+
+    if changed_conditions:
+        conditions = conditions.filter(
+            _changed(models.Condition, updated_since, set(samples))
+        )
+    conditions = (
+        conditions.options(
+            *(
+                joinedload(getattr(models.Condition, relation))
+                for relation in ("strain", "medium")
+                if relation in relations
+            )
+        )
+        .order_by(models.Condition.id)
+        .all()
+    )
+
+    compounds = defaultdict(list)
+    if "compounds" in relations:
+        for compound in models.MediumCompound.query.filter(
+            models.MediumCompound.medium_id.in_(
+                {condition.medium_id for condition in conditions}
+            )
+        ).order_by(models.MediumCompound.id):
+            compounds[compound.medium_id].append(compound)
+
+    data = []
+    for condition in conditions:
+        condition_relations = {"samples": samples[condition.id]}
+        if "medium" in relations:
+            condition_relations["medium"] = Prefetched(
+                condition.medium, compounds=compounds[condition.medium_id]
+            )
+        data.append(Prefetched(condition, **condition_relations))
+    return data
@@ -24,6 +24,8 @@ import logging
 import sys
 
 from flask import jsonify
+from psycopg2.errorcodes import CHECK_VIOLATION, UNIQUE_VIOLATION
+from sqlalchemy.exc import IntegrityError
 from werkzeug.exceptions import HTTPException
 from werkzeug.routing import RoutingException
 
@@ -34,6 +36,7 @@ logger = logging.getLogger(__name__)
 def init_app(app):
     app.register_error_handler(422, handle_webargs_error)
     app.register_error_handler(HTTPException, handle_http_error)
+    app.register_error_handler(IntegrityError, handle_integrity_error)
     app.register_error_handler(Exception, handle_uncaught_error)
 
 
@@ -69,6 +72,28 @@ def handle_http_error(error):
         return response
 
 
+def handle_integrity_error(error):
+    """
+    Handle database integrity errors.
+
+    Unique violations are caused by the client submitting an object which
+    already exists, e.g., a measurement with the natural key of an existing
+    one; report them as a conflict. Check violations are caused by invalid
+    relations, e.g., a strain descending from itself; report their message.
+    Anything else is unexpected.
+    """
+    pgcode = getattr(error.orig, "pgcode", None)
+    if pgcode == UNIQUE_VIOLATION:
+        response = jsonify({"message": "Conflicts with an existing object"})
+        response.status_code = 409
+        return response
+    if pgcode == CHECK_VIOLATION:
+        response = jsonify({"message": error.orig.diag.message_primary})
+        response.status_code = 400
+        return response
+    return handle_uncaught_error(error)
+
+
 def handle_uncaught_error(error):
     """
     Handle any uncaught exceptions.
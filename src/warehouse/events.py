@@ -0,0 +1,223 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stream changes of the data to clients as server-sent events.
+
+Triggers in the database notify `models.CHANGES_CHANNEL` of the inserted,
+updated and deleted rows of every statement (see `models`), naming the resource
+and ids of the rows. A single listener per process receives the notifications
+on a dedicated connection, adds the project of the changed rows and queues the
+events for the subscribed streams whose JWT claims include the project.
+
+The queues are bounded: a subscriber which falls `QUEUE_SIZE` events behind is
+dropped, and its stream ends with an `overflow` event, after which the client
+catches up with `updated_since` and subscribes again.
+
+Waiting for notifications and events uses `select` and `queue`, which become
+cooperative once gevent has monkey patched the standard library, such that an
+open stream does not block a gevent worker. The queries looking up the
+projects wait cooperatively as well through the wait callback which
+`gunicorn.py` installs for psycopg2.
+"""
+
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy.orm import Session
+
+from warehouse import models
+from warehouse.app import db
+from warehouse.visibility import OWNER_PATHS, join_owner, owner
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on idle streams.
+KEEP_ALIVE = 15
+# The most events queued for a subscriber before it is dropped.
+QUEUE_SIZE = 1000
+
+_TABLES = {model.__tablename__: model for model in OWNER_PATHS}
+
+
+def resolve_projects(session, notifications):
+    """
+    Add the project to notifications naming the parent of the changed rows.
+
+    Notifications of rows whose parent no longer exists are dropped.
+
+    :param session: The session to look up the parents with
+    :param notifications: The decoded payloads of the notifications
+    :return: A list of events, all of which have a `project_id`
+    """
+    parent_ids = defaultdict(set)
+    for notification in notifications:
+        if "project_id" not in notification:
+            model = _TABLES[notification["resource"]]
+            (foreign_key, parent), *_ = OWNER_PATHS[model]
+            parent_ids[parent].add(notification[foreign_key.key])
+    projects = {}
+    for parent, ids in parent_ids.items():
+        query = join_owner(
+            session.query(parent.id, owner(parent).project_id), parent
+        ).filter(parent.id.in_(ids))
+        projects[parent] = dict(query.all())
+
+    events = []
+    for notification in notifications:
+        if "project_id" not in notification:
+            model = _TABLES[notification["resource"]]
+            (foreign_key, parent), *_ = OWNER_PATHS[model]
+            parent_id = notification[foreign_key.key]
+            if parent_id not in projects[parent]:
+                continue
+            notification["project_id"] = projects[parent][parent_id]
+        events.append(notification)
+    return events
+
+
+class Subscriber(object):
+    """The queue of the events visible to a stream."""
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.events = queue.Queue(maxsize=QUEUE_SIZE)
+        # Set once the subscriber fell behind and missed events.
+        self.dropped = False
+
+    def visible(self, event):
+        return event["project_id"] is None or event["project_id"] in self.claims
+
+
+class Listener(object):
+    """Receive change notifications and distribute them to subscribers."""
+
+    def __init__(self, app, timeout=5):
+        self.app = app
+        self.timeout = timeout
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self, claims):
+        """Return a subscriber to the events visible with the given claims."""
+        subscriber = Subscriber(claims)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        self.ensure_running()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def run(self):
+        """Listen for notifications for as long as there are subscribers."""
+        with self.app.app_context():
+            connection = db.engine.raw_connection()
+            # The connection is in autocommit mode while listening; do not
+            # return it to the pool.
+            connection.detach()
+            try:
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                connection.cursor().execute(f"LISTEN {models.CHANGES_CHANNEL}")
+                while self.subscribers:
+                    self._receive(connection.connection)
+            except Exception:
+                logger.exception("Listening for changes failed")
+            finally:
+                connection.close()
+                with self.lock:
+                    # A stream subscribing while the listener shuts down
+                    # restarts it on its next keep-alive.
+                    if self.thread is threading.current_thread():
+                        self.thread = None
+
+    def _receive(self, connection):
+        readable, _, _ = select.select([connection], [], [], self.timeout)
+        if not readable:
+            return
+        connection.poll()
+        notifications = [
+            json.loads(notification.payload)
+            for notification in connection.notifies
+        ]
+        del connection.notifies[:]
+        # Use a session of its own; the scoped session may be bound elsewhere.
+        session = Session(bind=db.engine)
+        try:
+            events = resolve_projects(session, notifications)
+        finally:
+            session.close()
+        self.publish(events)
+
+    def publish(self, events):
+        """Queue the events for the subscribers which may see them."""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            for event in filter(subscriber.visible, events):
+                try:
+                    subscriber.events.put_nowait(event)
+                except queue.Full:
+                    logger.warning("Dropping a subscriber falling behind")
+                    subscriber.dropped = True
+                    self.unsubscribe(subscriber)
+                    break
+
+    def ensure_running(self):
+        """Start the listener unless it is running."""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def stream(self, claims, expires=None):
+        """
+        Generate the server-sent events visible with the given claims.
+
+        :param claims: The project claims of the subscriber
+        :param expires: The UNIX time at which the stream ends, e.g., the
+            expiry of the subscriber's JWT
+        """
+        subscriber = self.subscribe(claims)
+        try:
+            # Let the client know that it is subscribed.
+            yield ": subscribed\n\n"
+            while expires is None or time.time() < expires:
+                if subscriber.dropped:
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                try:
+                    event = subscriber.events.get(timeout=KEEP_ALIVE)
+                except queue.Empty:
+                    self.ensure_running()
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: change\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def init_app(app):
+    """Add a change listener to the app."""
+    app.extensions["change_listener"] = Listener(app)
@@ -0,0 +1,138 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Replay the responses to retried requests sent with an `Idempotency-Key`.
+
+A client retrying a request, e.g., after its proxy timed out once the batch had
+already been committed, sends the same key as the first time. Keys are scoped to
+the user (the `sub` claim of the JWT), such that users cannot collide with or
+replay each other's requests. The key is claimed and the response recorded
+within the transaction of the request, so all of them are committed together.
+Retries within `IDEMPOTENCY_RETENTION` receive the recorded response without the
+request being handled again, e.g., `begin` and `finish` around the insertion of
+a batch, which `finish` commits::
+
+    replayed = idempotency.begin()
+    if replayed is not None:
+        return replayed
+    ids = insert_measurements(models.Fluxomics, body)
+    return idempotency.finish([{"id": id} for id in ids], 201)
+
+"""
+
+import hashlib
+from datetime import datetime
+
+from flask import abort, current_app, g, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from webargs.flaskparser import abort as webargs_abort
+
+from warehouse import models
+from warehouse.app import db
+
+
+HEADER = "Idempotency-Key"
+
+
+def request_hash():
+    """Return the SHA-256 digest of the method, path and body of a request."""
+    digest = hashlib.sha256()
+    for part in (request.method, request.full_path):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def begin():
+    """
+    Claim the idempotency key of the current request, if it has one.
+
+    Expired keys are removed first. Concurrent requests of a user with the same
+    key wait for the first to be committed, and then receive its response
+    like later retries.
+
+    :return: The recorded response if the key was used before, or `None` when
+        the request is to be handled
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    subject = g.jwt_claims.get("sub")
+    if subject is None:
+        webargs_abort(
+            422,
+            messages={
+                "headers": {HEADER: ["Requires a JWT identifying the user"]}
+            },
+        )
+    subject = str(subject)
+    digest = request_hash()
+    db.session.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.created
+        < datetime.utcnow() - current_app.config["IDEMPOTENCY_RETENTION"]
+    ).delete(synchronize_session=False)
+    record = models.IdempotencyKey.query.get((subject, key))
+    if record is None:
+        record = models.IdempotencyKey(
+            subject=subject, key=key, request_hash=digest
+        )
+        db.session.add(record)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # A concurrent request claimed the key, and was committed first.
+            db.session.rollback()
+            record = models.IdempotencyKey.query.get((subject, key))
+        else:
+            g.idempotency_key = record
+            return None
+    if record is None:
+        abort(409, f"A request with the {HEADER} {key} is in progress")
+    if record.request_hash != digest:
+        webargs_abort(
+            422,
+            messages={
+                "headers": {
+                    HEADER: [f"Was used for a different request: {key}"]
+                }
+            },
+        )
+    if record.status_code is None:
+        abort(409, f"A request with the {HEADER} {key} is in progress")
+    return _response(record.response, record.status_code)
+
+
+def finish(body, status_code):
+    """
+    Commit the request, with its response if its idempotency key was claimed.
+
+    :param body: The serialized body of the response
+    :param status_code: The status code of the response
+    :return: The response, serialized like those replayed to retries
+    """
+    record = g.pop("idempotency_key", None)
+    if record is not None:
+        record.status_code = status_code
+        record.response = body
+    db.session.commit()
+    return _response(body, status_code)
+
+
+def _response(body, status_code):
+    response = jsonify(body)
+    response.status_code = status_code
+    return response
@@ -0,0 +1,425 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run large imports and exports as background jobs.
+
+Requests which would outlast the timeout of the web workers, i.e., large
+batches of measurements and the data of large experiments, are instead
+submitted as a `models.Job`. The job table is the queue: the worker processes
+started with `flask jobs work` claim pending jobs with `SELECT ... FOR UPDATE
+SKIP LOCKED`, such that any number of them share the queue without a broker,
+and wake up on the notification sent on `JOBS_CHANNEL` by each submission.
+
+Handlers process their items in chunks and report the progress after each
+chunk, which clients poll at `/jobs/<id>`. Once finished, the job holds the
+response of the equivalent synchronous request, streamed from the database at
+`/jobs/<id>/result`.
+
+While running a job, a worker refreshes its heartbeat. The job of a worker
+which died, i.e., whose heartbeat is older than `JOB_LEASE`, is claimed again
+and run from the start, with the progress committed by the previous attempt;
+an import upserts the chunks it had committed. Jobs claimed `JOB_MAX_ATTEMPTS`
+times are failed instead.
+"""
+
+import logging
+import multiprocessing
+import select
+import threading
+from datetime import datetime
+
+import click
+from flask import abort, current_app, g, json
+from flask.cli import AppGroup
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import false, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.exceptions import HTTPException
+
+from warehouse import errorhandlers, models, schemas
+from warehouse.app import db
+from warehouse.data import Prefetched, conditions_data
+from warehouse.utils import insert_measurements
+
+
+logger = logging.getLogger(__name__)
+
+# Workers are notified of submitted jobs on this channel with `NOTIFY`.
+JOBS_CHANNEL = "warehouse_jobs"
+
+# Seconds a worker waits for a notification before checking the queue anyway.
+POLL_INTERVAL = 5
+
+# The number of measurements inserted, and committed, at a time.
+IMPORT_CHUNK_SIZE = 1000
+
+# The number of conditions whose data is loaded at a time.
+EXPORT_CHUNK_SIZE = 20
+
+# The number of bytes of a result read from the database at a time.
+RESULT_CHUNK_SIZE = 2 ** 20
+
+# The measurements which can be imported in the background, with the schemas
+# of their batch requests.
+IMPORTS = {
+    "fluxomics": (models.Fluxomics, schemas.FluxomicsBatchRequest),
+    "metabolomics": (models.Metabolomics, schemas.MetabolomicsBatchRequest),
+    "proteomics": (models.Proteomics, schemas.ProteomicsBatchRequest),
+}
+
+
+def visible_jobs():
+    """
+    Return a filter for the jobs visible to the current user.
+
+    Jobs are visible to users with claims to all of their projects. Jobs of no
+    project, e.g., exports of public experiments, are only visible to the user
+    who submitted them.
+    """
+    subject = g.jwt_claims.get("sub")
+    submitted = (
+        models.Job.subject == subject if subject is not None else false()
+    )
+    return models.Job.project_ids.contained_by(list(g.jwt_claims["prj"])) & (
+        submitted | (func.cardinality(models.Job.project_ids) > 0)
+    )
+
+
+def submit(kind, payload, project_ids, total=None):
+    """
+    Queue a job and notify the workers.
+
+    :param kind: The kind of job, one of `HANDLERS`
+    :param payload: The serialized request handed to the handler
+    :param project_ids: The projects of the data read or written by the job
+    :param total: The number of items to process, if known beforehand
+    :return: The pending job, committed by the caller
+    """
+    job = models.Job(
+        kind=kind,
+        payload=payload,
+        project_ids=sorted(id for id in project_ids if id is not None),
+        subject=g.jwt_claims.get("sub"),
+        total=total,
+    )
+    db.session.add(job)
+    # The notification is delivered once the job is committed.
+    db.session.execute(f"NOTIFY {JOBS_CHANNEL}")
+    db.session.flush()
+    return job
+
+
+def submit_import(measurement_type, body, upsert, project_ids):
+    """Queue the insertion of a batch of measurements, see `IMPORTS`."""
+    _, Request = IMPORTS[measurement_type]
+    payload = {
+        "measurement_type": measurement_type,
+        "request": Request().dump({"body": body, "upsert": upsert}),
+    }
+    return submit("import", payload, project_ids, total=len(body))
+
+
+def submit_export(experiment, updated_since, include, only):
+    """Queue the export of the data of an experiment."""
+    payload = {
+        "experiment_id": experiment.id,
+        "request": schemas.ExperimentDataRequest().dump(
+            {"updated_since": updated_since, "include": include, "only": only}
+        ),
+    }
+    return submit("export", payload, {experiment.project_id})
+
+
+def import_measurements(payload, report, progress):
+    """
+    Insert a batch of measurements like the `*Batch` endpoints.
+
+    Each chunk is committed on its own along with the progress, such that the
+    progress counts stored measurements; a failed import is resumed by
+    submitting it with `upsert`. The chunks committed by a previous attempt
+    are upserted, which returns the ids of their measurements again.
+    """
+    ModelClass, Request = IMPORTS[payload["measurement_type"]]
+    request = Request().load(payload["request"])
+    body = request["body"]
+    ids = []
+    for start in range(0, len(body), IMPORT_CHUNK_SIZE):
+        chunk = body[start : start + IMPORT_CHUNK_SIZE]
+        upsert = request["upsert"] or start < progress
+        ids.extend(insert_measurements(ModelClass, chunk, upsert))
+        report(start + len(chunk), session=db.session)
+        db.session.commit()
+    # Chunks may upsert the measurements of previous ones.
+    return ([{"id": id} for id in dict.fromkeys(ids)], 201)
+
+
+def export_experiment(payload, report, progress):
+    """
+    Serialize the data of an experiment like `/experiments/<id>/data`.
+
+    An export starts over on every attempt.
+    """
+    request = schemas.ExperimentDataRequest().load(payload["request"])
+    id = payload["experiment_id"]
+    try:
+        experiment = models.Experiment.query.filter(
+            models.Experiment.id == id
+        ).one()
+    except NoResultFound:
+        abort(404, f"Cannot find object with id {id}")
+    schema = schemas.data_schema(
+        schemas.ExperimentData, request["include"], request["only"]
+    )
+    relations = schemas.data_relations(schema)
+    condition_ids = []
+    if "conditions" in relations:
+        condition_ids = [
+            condition_id
+            for (condition_id,) in db.session.query(models.Condition.id)
+            .filter(models.Condition.experiment_id == id)
+            .order_by(models.Condition.id)
+        ]
+    report(0, len(condition_ids))
+    conditions = []
+    for start in range(0, len(condition_ids), EXPORT_CHUNK_SIZE):
+        chunk = condition_ids[start : start + EXPORT_CHUNK_SIZE]
+        conditions.extend(
+            conditions_data(
+                models.Condition.query.filter(models.Condition.id.in_(chunk)),
+                request["updated_since"],
+                relations=relations,
+            )
+        )
+        report(start + len(chunk))
+    return (schema.dump(Prefetched(experiment, conditions=conditions)), 200)
+
+
+# The handlers of each kind of job. They are called with the payload of the job,
+# a function reporting the progress (and total), and the progress committed by
+# a previous attempt of the job, and return the body and status code of the
+# response to the equivalent synchronous request.
+HANDLERS = {"import": import_measurements, "export": export_experiment}
+
+
+def _error_response(error):
+    """Return the response of the app's error handlers to the given error."""
+    if isinstance(error, HTTPException):
+        return errorhandlers.handle_http_error(error)
+    if isinstance(error, IntegrityError):
+        return errorhandlers.handle_integrity_error(error)
+    return errorhandlers.handle_uncaught_error(error)
+
+
+def claim():
+    """
+    Mark the oldest claimable job as running and return it, if any.
+
+    Jobs are claimable while pending, or while running without a heartbeat
+    within `JOB_LEASE`. Claimable jobs which were claimed `JOB_MAX_ATTEMPTS`
+    times already are failed instead.
+    """
+    now = datetime.utcnow()
+    while True:
+        job = (
+            models.Job.query.filter(
+                (models.Job.status == "pending")
+                | (
+                    (models.Job.status == "running")
+                    & (
+                        models.Job.heartbeat
+                        < now - current_app.config["JOB_LEASE"]
+                    )
+                )
+            )
+            .order_by(models.Job.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            break
+        if job.attempts < current_app.config["JOB_MAX_ATTEMPTS"]:
+            if job.status == "running":
+                logger.warning(f"Job {job.id} was lost by its worker")
+            job.status = "running"
+            job.heartbeat = now
+            job.attempts += 1
+            break
+        logger.error(f"Job {job.id} failed after {job.attempts} attempts")
+        job.status = "failed"
+        job.status_code = 500
+        job.result = _serialize(
+            {"message": f"The job was interrupted {job.attempts} times"}
+        )
+        db.session.commit()
+    db.session.commit()
+    return job
+
+
+def _serialize(result):
+    """Serialize the body of the response of a job like `jsonify`."""
+    return json.dumps(result).encode()
+
+
+def _beat(engine, job_id, stopped, interval):
+    """Refresh the heartbeat of a running job every interval, until stopped."""
+    while not stopped.wait(interval):
+        with engine.begin() as connection:
+            connection.execute(
+                models.Job.__table__.update()
+                .where(models.Job.id == job_id)
+                .values(heartbeat=datetime.utcnow())
+            )
+
+
+def run(job):
+    """Run a claimed job and record its response, or that of its error."""
+    job_id = job.id
+    handler = HANDLERS[job.kind]
+    progress = job.progress
+    # Report the progress in a session of its own, such that it is visible
+    # while the handler's transaction is still open, unless the handler commits
+    # it along with its changes in its own session.
+    progress_session = Session(bind=db.session.get_bind())
+
+    def report(progress, total=None, session=progress_session):
+        values = {"progress": progress}
+        if total is not None:
+            values["total"] = total
+        session.query(models.Job).filter(models.Job.id == job_id).update(
+            values, synchronize_session=False
+        )
+        if session is progress_session:
+            session.commit()
+
+    # Beat in a thread of its own, such that long chunks do not lose the job.
+    stopped = threading.Event()
+    heartbeat = threading.Thread(
+        target=_beat,
+        args=(
+            db.engine,
+            job_id,
+            stopped,
+            current_app.config["JOB_LEASE"].total_seconds() / 4,
+        ),
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        try:
+            result, status_code = handler(job.payload, report, progress)
+            status = "done"
+        except Exception as error:
+            db.session.rollback()
+            response = _error_response(error)
+            result, status_code = response.get_json(), response.status_code
+            status = "failed"
+        models.Job.query.filter(models.Job.id == job_id).update(
+            {
+                "status": status,
+                "status_code": status_code,
+                "result": _serialize(result),
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+    finally:
+        stopped.set()
+        heartbeat.join()
+        progress_session.close()
+    logger.info(f"Job {job_id} {status} with status code {status_code}")
+
+
+def result_chunks(job_id):
+    """
+    Read the result of a finished job in chunks of `RESULT_CHUNK_SIZE` bytes.
+
+    The result is stored uncompressed, such that PostgreSQL reads only the
+    slice of each chunk.
+    """
+    offset = 1
+    while True:
+        chunk = (
+            db.session.query(
+                func.substr(models.Job.result, offset, RESULT_CHUNK_SIZE)
+            )
+            .filter(models.Job.id == job_id)
+            .scalar()
+        )
+        if chunk:
+            yield bytes(chunk)
+        if chunk is None or len(chunk) < RESULT_CHUNK_SIZE:
+            return
+        offset += RESULT_CHUNK_SIZE
+
+
+def work(timeout=POLL_INTERVAL):
+    """Run the submitted jobs one at a time, forever."""
+    connection = db.engine.raw_connection()
+    # The connection is in autocommit mode while listening; do not return it
+    # to the pool.
+    connection.detach()
+    try:
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        connection.cursor().execute(f"LISTEN {JOBS_CHANNEL}")
+        while True:
+            job = claim()
+            if job is not None:
+                run(job)
+                # Drop the rows loaded by the job.
+                db.session.remove()
+                continue
+            select.select([connection.connection], [], [], timeout)
+            connection.connection.poll()
+            del connection.connection.notifies[:]
+    finally:
+        connection.close()
+
+
+def _work(app):
+    with app.app_context():
+        # Do not share the connections of the parent process.
+        db.engine.dispose()
+        work()
+
+
+jobs_cli = AppGroup("jobs", help="Run background jobs.")
+
+
+@jobs_cli.command("work")
+@click.option(
+    "--processes",
+    default=1,
+    show_default=True,
+    help="The number of worker processes.",
+)
+def work_command(processes):
+    """Run the submitted jobs in a pool of worker processes."""
+    app = current_app._get_current_object()
+    workers = [
+        multiprocessing.Process(target=_work, args=(app,), daemon=True)
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def init_app(app):
+    """Add the `flask jobs` commands to the app."""
+    app.cli.add_command(jobs_cli)
@@ -0,0 +1,141 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Resolve the ancestors and descendants of strains.
+
+The lineages are looked up in `models.StrainClosure`. Strains that are not
+visible to the current user hide themselves and every strain beyond them in
+the lineage, such that hidden strains do not reveal their relatives.
+"""
+
+from sqlalchemy.orm import aliased
+
+from warehouse import models
+from warehouse.app import db
+from warehouse.data import Prefetched
+from warehouse.visibility import visible
+
+
+Closure = models.StrainClosure
+
+
+def _reachable(link):
+    """
+    Return a filter for closure links without hidden strains on their path.
+
+    The path of a link consists of the ancestors of its descendant up to and
+    including its ancestor.
+    """
+    path = aliased(Closure)
+    hidden = (
+        db.session.query(path)
+        .join(models.Strain, models.Strain.id == path.ancestor_id)
+        .filter(path.descendant_id == link.descendant_id)
+        .filter(path.depth <= link.depth)
+        .filter(~visible(models.Strain))
+        .correlate(link)
+    )
+    return ~hidden.exists()
+
+
+def _genotypes(*genotypes):
+    return [genotype for genotype in genotypes if genotype]
+
+
+def ancestors(strain, max_depth=None):
+    """
+    Return the visible ancestors of a strain, closest first.
+
+    :param strain: The strain
+    :param max_depth: The number of generations to include, or `None` for all
+    :return: Proxied strains to serialize with `schemas.StrainLineage`
+    """
+    query = (
+        db.session.query(models.Strain, Closure.depth)
+        .join(Closure, Closure.ancestor_id == models.Strain.id)
+        .filter(Closure.descendant_id == strain.id)
+        .filter(Closure.depth > 0)
+        .filter(_reachable(Closure))
+        .order_by(Closure.depth)
+    )
+    if max_depth is not None:
+        query = query.filter(Closure.depth <= max_depth)
+    lineage = []
+    # The genotype changes leading from the ancestor to the strain.
+    changes = _genotypes(strain.genotype)
+    for ancestor, depth in query:
+        lineage.append(Prefetched(ancestor, depth=depth, genotypes=changes))
+        changes = _genotypes(ancestor.genotype) + changes
+    return lineage
+
+
+def descendants(strain, max_depth=None):
+    """
+    Return the visible descendants of a strain, closest first.
+
+    :param strain: The strain
+    :param max_depth: The number of generations to include, or `None` for all
+    :return: Proxied strains to serialize with `schemas.StrainLineage`
+    """
+    query = (
+        db.session.query(models.Strain, Closure.depth)
+        .join(Closure, Closure.descendant_id == models.Strain.id)
+        .filter(Closure.ancestor_id == strain.id)
+        .filter(Closure.depth > 0)
+        .filter(_reachable(Closure))
+        .order_by(Closure.depth, models.Strain.id)
+    )
+    if max_depth is not None:
+        query = query.filter(Closure.depth <= max_depth)
+    lineage = []
+    # The genotype changes leading from the strain to each descendant.
+    changes = {strain.id: []}
+    for descendant, depth in query:
+        changes[descendant.id] = changes[descendant.parent_id] + _genotypes(
+            descendant.genotype
+        )
+        lineage.append(
+            Prefetched(
+                descendant, depth=depth, genotypes=changes[descendant.id]
+            )
+        )
+    return lineage
+
+
+def common_ancestor(strain_ids):
+    """
+    Return the closest visible ancestor shared by the given strains.
+
+    A strain counts as its own ancestor.
+
+    :param strain_ids: The ids of the strains
+    :return: The ancestor, or `None` if the strains are not related
+    """
+    strain_ids = set(strain_ids)
+    shared = (
+        db.session.query(Closure.ancestor_id)
+        .filter(Closure.descendant_id.in_(strain_ids))
+        .filter(_reachable(Closure))
+        .group_by(Closure.ancestor_id)
+        .having(db.func.count() == len(strain_ids))
+        # The closest ancestor has the shortest paths to all of the strains.
+        .order_by(db.func.max(Closure.depth))
+        .limit(1)
+        .subquery()
+    )
+    return models.Strain.query.join(
+        shared, shared.c.ancestor_id == models.Strain.id
+    ).one_or_none()
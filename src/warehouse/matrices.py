@@ -0,0 +1,200 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Arrange the measurements of an experiment as samples × entities matrices.
+
+The measurements are loaded with a single query ordered by sample and pivoted
+in one pass. Besides JSON, matrices are encoded in the NumPy `.npz` format,
+i.e., a zip archive of `.npy` arrays, which `numpy.load` reads directly. The
+format is simple enough to be written without NumPy.
+"""
+
+import io
+import struct
+import zipfile
+
+from warehouse import models
+from warehouse.aggregates import GROUPS
+from warehouse.app import db
+from warehouse.utils import MEASUREMENTS
+
+
+class Matrix(object):
+    """
+    The measurements of samples (rows) of entities (columns).
+
+    :ivar sample_ids: The ids of the samples with measurements
+    :ivar sample_names: The names of the samples
+    :ivar columns: The labels of the columns, as lists by the name of the
+        columns identifying the measured entity, e.g., `reaction_namespace`
+    :ivar entries: The measurements as `(row, column, value)` tuples, ordered
+        by row and column
+    """
+
+    def __init__(self, sample_ids, sample_names, columns, entries):
+        self.sample_ids = sample_ids
+        self.sample_names = sample_names
+        self.columns = columns
+        self.entries = entries
+
+    @property
+    def shape(self):
+        return (len(self.sample_ids), len(next(iter(self.columns.values()))))
+
+    def coordinates(self):
+        """Return the row indices, column indices and values of the entries."""
+        if not self.entries:
+            return (), (), ()
+        return tuple(zip(*self.entries))
+
+    def dense(self):
+        """Return the values as nested lists, with `None` where missing."""
+        rows, columns = self.shape
+        values = [[None] * columns for _ in range(rows)]
+        for row, column, value in self.entries:
+            values[row][column] = value
+        return values
+
+    def to_json(self, sparse=False):
+        matrix = {
+            "sample_ids": self.sample_ids,
+            "sample_names": self.sample_names,
+            "columns": self.columns,
+            "shape": self.shape,
+        }
+        if sparse:
+            rows, columns, values = self.coordinates()
+            matrix.update(
+                row_indices=list(rows),
+                column_indices=list(columns),
+                values=list(values),
+            )
+        else:
+            matrix["values"] = self.dense()
+        return matrix
+
+    def to_npz(self, sparse=False):
+        arrays = {
+            "sample_ids": _npy("<i8", (len(self.sample_ids),), self.sample_ids),
+            "sample_names": _npy_strings(self.sample_names),
+        }
+        for name, labels in self.columns.items():
+            arrays[name] = _npy_strings(labels)
+        if sparse:
+            rows, columns, values = self.coordinates()
+            for name, data, dtype in [
+                ("row_indices", rows, "<i8"),
+                ("column_indices", columns, "<i8"),
+                ("values", values, "<f8"),
+            ]:
+                arrays[name] = _npy(dtype, (len(data),), data)
+        else:
+            # Missing values are NaN.
+            values = [
+                float("nan") if value is None else value
+                for row in self.dense()
+                for value in row
+            ]
+            arrays["values"] = _npy("<f8", self.shape, values)
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, array in arrays.items():
+                archive.writestr(f"{name}.npy", array)
+        return buffer.getvalue()
+
+
+def _npy_header(dtype, shape):
+    """Return the header of an array in the `.npy` format, version 1.0."""
+    if len(shape) == 1:
+        shape_repr = f"({shape[0]},)"
+    else:
+        shape_repr = f"({', '.join(str(size) for size in shape)})"
+    header = (
+        f"{{'descr': '{dtype}', 'fortran_order': False, "
+        f"'shape': {shape_repr}, }}"
+    )
+    # The magic string, version, header length and header are padded to a
+    # multiple of 64 bytes, the header ending with a newline.
+    padding = 63 - (10 + len(header)) % 64
+    header = (header + " " * padding + "\n").encode("latin1")
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header
+
+
+# The `struct` formats of the numeric array types.
+_FORMATS = {"<i8": "q", "<f8": "d"}
+
+
+def _npy(dtype, shape, data):
+    """Encode a numeric array, of the types in `_FORMATS`."""
+    return _npy_header(dtype, shape) + struct.pack(
+        f"<{len(data)}{_FORMATS[dtype]}", *data
+    )
+
+
+def _npy_strings(strings):
+    """Encode strings as an array of fixed width unicode strings."""
+    width = max((len(string) for string in strings), default=1) or 1
+    return _npy_header(f"<U{width}", (len(strings),)) + b"".join(
+        string.ljust(width, "\0").encode("utf-32-le") for string in strings
+    )
+
+
+def measurement_matrix(experiment_id, name):
+    """
+    Load the measurements of one type of an experiment as a matrix.
+
+    :param experiment_id: The id of the experiment
+    :param name: The name of the measurements, one of those with a natural key
+        identifying the measured entity, e.g., `fluxomics`
+    :return: A `Matrix` of the samples with measurements; the columns are
+        ordered by their labels
+    """
+    Measurement = models.with_packed(MEASUREMENTS[name])
+    keys, _ = GROUPS[name]
+    query = (
+        db.session.query(
+            models.Sample.id,
+            models.Sample.name,
+            *(getattr(Measurement, key) for key in keys),
+            Measurement.measurement,
+        )
+        .select_from(models.Sample)
+        .join(Measurement, Measurement.sample_id == models.Sample.id)
+        .filter(Measurement.experiment_id == experiment_id)
+    )
+    rows = (
+        models.join_entities(query, Measurement)
+        .order_by(models.Sample.id)
+        .all()
+    )
+    labels = sorted({tuple(row[2:-1]) for row in rows})
+    column_indices = {label: index for index, label in enumerate(labels)}
+    sample_ids = []
+    sample_names = []
+    entries = []
+    for sample_id, sample_name, *label, value in rows:
+        if not sample_ids or sample_ids[-1] != sample_id:
+            sample_ids.append(sample_id)
+            sample_names.append(sample_name)
+        entries.append(
+            (len(sample_ids) - 1, column_indices[tuple(label)], value)
+        )
+    entries.sort()
+    columns = {
+        key: [label[index] for label in labels]
+        for index, key in enumerate(keys)
+    }
+    return Matrix(sample_ids, sample_names, columns, entries)
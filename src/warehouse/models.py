@@ -12,28 +12,79 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import defaultdict
 from datetime import datetime
-
+from functools import lru_cache
+
+from sqlalchemy import (
+    DDL,
+    Integer,
+    cast,
+    event,
+    func,
+    inspect,
+    literal_column,
+    select,
+    text,
+    union_all,
+)
 from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import Session, aliased, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 
 from warehouse.app import db
 
 
 class TimestampMixin(object):
     created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    updated = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    # Set on creation as well, such that clients can query for changes.
+    updated = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        index=True,
+    )
+
+
+class ExperimentMixin(object):
+    """
+    Denormalize the experiment of the sample of a measurement.
+
+    The measurements of an experiment are thereby found, checked for their
+    project and deleted without going through their samples and conditions.
+    The column is maintained by triggers of the database.
+    """
+
+    @declared_attr
+    def experiment_id(cls):
+        # Measurements are deleted along with their samples, which in turn are
+        # deleted along with their experiment; check the key once they are.
+        return db.Column(
+            db.Integer,
+            db.ForeignKey(
+                "experiment.id",
+                onupdate="CASCADE",
+                deferrable=True,
+                initially="DEFERRED",
+            ),
+            nullable=False,
+            index=True,
+            server_default=db.FetchedValue(),
+            server_onupdate=db.FetchedValue(),
+        )
 
 
 class Organism(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer)
+    project_id = db.Column(db.Integer, index=True)
 
     name = db.Column(db.String(256), nullable=False)
 
 
 class Strain(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer)
+    project_id = db.Column(db.Integer, index=True)
 
     organism_id = db.Column(
         db.Integer,
@@ -46,27 +97,56 @@ class Strain(TimestampMixin, db.Model):
         db.Integer,
         db.ForeignKey("strain.id", onupdate="CASCADE", ondelete="CASCADE"),
     )
-    parent = db.relationship("Strain", uselist=False)
+    # Without `remote_side`, the relationship would be read as one-to-many.
+    parent = db.relationship("Strain", remote_side=[id], uselist=False)
 
     name = db.Column(db.String(256), nullable=False)
     genotype = db.Column(db.Text())
 
 
+class StrainClosure(db.Model):
+    """
+    Link every strain to itself and to each of its descendants.
+
+    The rows are maintained by a trigger on `strain` (see below), such that the
+    lineage of a strain is an indexed lookup instead of a recursive query.
+    """
+
+    ancestor_id = db.Column(
+        db.Integer,
+        db.ForeignKey("strain.id", onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    descendant_id = db.Column(
+        db.Integer,
+        db.ForeignKey("strain.id", onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    # The number of generations between the strains, 0 for the strain itself.
+    depth = db.Column(db.Integer, nullable=False)
+
+
 class Experiment(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer)
+    project_id = db.Column(db.Integer, index=True)
 
     name = db.Column(db.String(256), nullable=False)
     description = db.Column(db.Text(), nullable=False)
 
 
 class Medium(TimestampMixin, db.Model):
-    project_id = db.Column(db.Integer)
+    project_id = db.Column(db.Integer, index=True)
     id = db.Column(db.Integer, primary_key=True)
 
     name = db.Column(db.String(256), nullable=False)
 
 
+# The one-to-many backrefs below use `passive_deletes` such that deleting a
+# parent leaves removing its children to the `ON DELETE CASCADE` foreign keys
+# instead of loading and deleting every child through the session.
+
+
 class MediumCompound(TimestampMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
@@ -74,11 +154,15 @@ class MediumCompound(TimestampMixin, db.Model):
         db.Integer,
         db.ForeignKey("medium.id", onupdate="CASCADE", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     medium = db.relationship(
         Medium,
         backref=db.backref(
-            "compounds", cascade="all, delete-orphan", lazy="dynamic"
+            "compounds",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
@@ -95,11 +179,15 @@ class Condition(TimestampMixin, db.Model):
         db.Integer,
         db.ForeignKey("experiment.id", onupdate="CASCADE", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     experiment = db.relationship(
         Experiment,
         backref=db.backref(
-            "conditions", cascade="all, delete-orphan", lazy="dynamic"
+            "conditions",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
@@ -131,7 +219,10 @@ class Sample(TimestampMixin, db.Model):
     condition = db.relationship(
         Condition,
         backref=db.backref(
-            "samples", cascade="all, delete-orphan", lazy="dynamic"
+            "samples",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
@@ -142,8 +233,104 @@ class Sample(TimestampMixin, db.Model):
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=True)
 
+    # Serves both the samples of a condition and their time series; the
+    # leading column replaces a separate index on `condition_id`.
+    __table_args__ = (
+        db.Index(
+            "ix_sample_condition_id_start_time", "condition_id", "start_time"
+        ),
+    )
+
+
+class Entity(object):
+    """
+    Expose a column of the dictionary entry of a measurement as its own.
+
+    Measurements refer to the measured reaction, compound or protein in a
+    dictionary table instead of repeating its identifier and names in every
+    row. The entries are loaded along with the measurements, such that the
+    measurements read as before. On the class, the attribute is the column of
+    an alias of the dictionary table, see `join_entities`.
+
+    An entry is shared by all measurements of the same values, its `KEY`
+    columns, and is never changed. Assigning a value therefore refers the
+    measurement to a new entry with the other values of the previous one, which
+    is replaced by the stored one with the same values when flushed, see
+    `entry_ids`.
+    """
+
+    def __init__(self, relationship, column):
+        self.relationship = relationship
+        self.column = column
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return getattr(entity_alias(owner, self.relationship), self.column)
+        entry = getattr(instance, self.relationship)
+        return None if entry is None else getattr(entry, self.column)
+
+    def __set__(self, instance, value):
+        entry = getattr(instance, self.relationship)
+        if entry is None or inspect(entry).has_identity:
+            Dictionary = getattr(
+                type(instance), self.relationship
+            ).property.mapper.class_
+            entry = Dictionary(
+                **{
+                    column: getattr(entry, column, None)
+                    for column in Dictionary.KEY
+                }
+            )
+            setattr(instance, self.relationship, entry)
+        setattr(entry, self.column, value)
+
+
+class Reaction(db.Model):
+    """A reaction as identified and named by fluxomics measurements."""
+
+    # The columns identifying the entity, and the unique key of the entries,
+    # which includes the names given to the entity.
+    IDENTITY = ("identifier", "namespace")
+    KEY = IDENTITY + ("name",)
+
+    id = db.Column(db.Integer, primary_key=True)
+    identifier = db.Column(db.Text(), nullable=False)
+    namespace = db.Column(db.Text(), nullable=False)
+    name = db.Column(db.Text(), nullable=False)
+
+    # The identifier leads so that it can be searched in any namespace.
+    __table_args__ = (db.Index("uq_reaction_key", *KEY, unique=True),)
+
+
+class Compound(db.Model):
+    """A compound as identified and named by metabolite measurements."""
+
+    IDENTITY = ("identifier", "namespace")
+    KEY = IDENTITY + ("name",)
 
-class Fluxomics(TimestampMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    identifier = db.Column(db.Text(), nullable=False)
+    namespace = db.Column(db.Text(), nullable=False)
+    name = db.Column(db.Text(), nullable=False)
+
+    __table_args__ = (db.Index("uq_compound_key", *KEY, unique=True),)
+
+
+class Protein(db.Model):
+    """A protein as identified and named by proteomics measurements."""
+
+    IDENTITY = ("identifier",)
+    KEY = IDENTITY + ("name", "full_name")
+
+    id = db.Column(db.Integer, primary_key=True)
+    identifier = db.Column(db.Text(), nullable=False)
+    name = db.Column(db.Text(), nullable=False)
+    full_name = db.Column(db.Text(), nullable=False)
+
+    __table_args__ = (db.Index("uq_protein_key", *KEY, unique=True),)
+
+
+class Fluxomics(TimestampMixin, ExperimentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     sample_id = db.Column(
@@ -154,19 +341,39 @@ class Fluxomics(TimestampMixin, db.Model):
     sample = db.relationship(
         Sample,
         backref=db.backref(
-            "fluxomics", cascade="all, delete-orphan", lazy="dynamic"
+            "fluxomics",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
-    reaction_name = db.Column(db.Text(), nullable=False)
-    reaction_identifier = db.Column(db.Text(), nullable=False)
-    reaction_namespace = db.Column(db.Text(), nullable=False)
+    reaction_id = db.Column(
+        db.Integer,
+        db.ForeignKey("reaction.id", onupdate="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    reaction = db.relationship(Reaction, lazy="joined", innerjoin=True)
+    reaction_name = Entity("reaction", "name")
+    reaction_identifier = Entity("reaction", "identifier")
+    reaction_namespace = Entity("reaction", "namespace")
 
     measurement = db.Column(db.Float, nullable=False)  # unit: mmol/gDW/h
     uncertainty = db.Column(db.Float, nullable=True)  # unit: mmol/gDW/h
 
+    # The natural key used to update measurements when uploaded again.
+    __table_args__ = (
+        db.Index(
+            "uq_fluxomics_sample_reaction",
+            "sample_id",
+            "reaction_id",
+            unique=True,
+        ),
+    )
+
 
-class Metabolomics(TimestampMixin, db.Model):
+class Metabolomics(TimestampMixin, ExperimentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     sample_id = db.Column(
@@ -177,25 +384,45 @@ class Metabolomics(TimestampMixin, db.Model):
     sample = db.relationship(
         Sample,
         backref=db.backref(
-            "metabolomics", cascade="all, delete-orphan", lazy="dynamic"
+            "metabolomics",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
-    compound_name = db.Column(db.Text(), nullable=False)
-    compound_identifier = db.Column(db.Text(), nullable=False)
-    compound_namespace = db.Column(db.Text(), nullable=False)
+    compound_id = db.Column(
+        db.Integer,
+        db.ForeignKey("compound.id", onupdate="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    compound = db.relationship(Compound, lazy="joined", innerjoin=True)
+    compound_name = Entity("compound", "name")
+    compound_identifier = Entity("compound", "identifier")
+    compound_namespace = Entity("compound", "namespace")
 
     measurement = db.Column(db.Float, nullable=False)  # unit: mmol/l
     uncertainty = db.Column(db.Float, nullable=True)  # unit: mmol/l
 
+    __table_args__ = (
+        db.Index(
+            "uq_metabolomics_sample_compound",
+            "sample_id",
+            "compound_id",
+            unique=True,
+        ),
+    )
 
-class UptakeSecretionRates(TimestampMixin, db.Model):
+
+class UptakeSecretionRates(TimestampMixin, ExperimentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     sample_id = db.Column(
         db.Integer,
         db.ForeignKey("sample.id", onupdate="CASCADE", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     sample = db.relationship(
         Sample,
@@ -203,18 +430,26 @@ class UptakeSecretionRates(TimestampMixin, db.Model):
             "uptake_secretion_rates",
             cascade="all, delete-orphan",
             lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
-    compound_name = db.Column(db.Text(), nullable=False)
-    compound_identifier = db.Column(db.Text(), nullable=False)
-    compound_namespace = db.Column(db.Text(), nullable=False)
+    compound_id = db.Column(
+        db.Integer,
+        db.ForeignKey("compound.id", onupdate="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    compound = db.relationship(Compound, lazy="joined", innerjoin=True)
+    compound_name = Entity("compound", "name")
+    compound_identifier = Entity("compound", "identifier")
+    compound_namespace = Entity("compound", "namespace")
 
     measurement = db.Column(db.Float, nullable=False)  # unit: mmol/gDW/h
     uncertainty = db.Column(db.Float, nullable=True)  # unit: mmol/gDW/h
 
 
-class Proteomics(TimestampMixin, db.Model):
+class Proteomics(TimestampMixin, ExperimentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     sample_id = db.Column(
@@ -225,54 +460,98 @@ class Proteomics(TimestampMixin, db.Model):
     sample = db.relationship(
         Sample,
         backref=db.backref(
-            "proteomics", cascade="all, delete-orphan", lazy="dynamic"
+            "proteomics",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
-    identifier = db.Column(db.Text(), nullable=False)
-    name = db.Column(db.Text(), nullable=False)
-    full_name = db.Column(db.Text(), nullable=False)
-    gene = db.Column(postgresql.JSON, nullable=False)
+    protein_id = db.Column(
+        db.Integer,
+        db.ForeignKey("protein.id", onupdate="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    protein = db.relationship(Protein, lazy="joined", innerjoin=True)
+    identifier = Entity("protein", "identifier")
+    name = Entity("protein", "name")
+    full_name = Entity("protein", "full_name")
+    gene = db.Column(postgresql.JSONB, nullable=False)
 
     measurement = db.Column(db.Float, nullable=False)  # unit: mmol/gDW
     uncertainty = db.Column(db.Float, nullable=True)  # unit: mmol/gDW
 
+    __table_args__ = (
+        db.Index(
+            "uq_proteomics_sample_protein",
+            "sample_id",
+            "protein_id",
+            unique=True,
+        ),
+        # Serves containment (`@>`) and key existence (`?&`) queries of genes.
+        db.Index("ix_proteomics_gene", "gene", postgresql_using="gin"),
+    )
+
 
-class MolarYields(TimestampMixin, db.Model):
+class MolarYields(TimestampMixin, ExperimentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     sample_id = db.Column(
         db.Integer,
         db.ForeignKey("sample.id", onupdate="CASCADE", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     sample = db.relationship(
         Sample,
         backref=db.backref(
-            "molar_yields", cascade="all, delete-orphan", lazy="dynamic"
+            "molar_yields",
+            cascade="all, delete-orphan",
+            lazy="dynamic",
+            passive_deletes=True,
         ),
     )
 
-    product_name = db.Column(db.Text(), nullable=False)
-    product_identifier = db.Column(db.Text(), nullable=False)
-    product_namespace = db.Column(db.Text(), nullable=False)
+    product_id = db.Column(
+        db.Integer,
+        db.ForeignKey("compound.id", onupdate="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    product = db.relationship(
+        Compound, lazy="joined", innerjoin=True, foreign_keys=[product_id]
+    )
+    product_name = Entity("product", "name")
+    product_identifier = Entity("product", "identifier")
+    product_namespace = Entity("product", "namespace")
 
-    substrate_name = db.Column(db.Text(), nullable=False)
-    substrate_identifier = db.Column(db.Text(), nullable=False)
-    substrate_namespace = db.Column(db.Text(), nullable=False)
+    substrate_id = db.Column(
+        db.Integer,
+        db.ForeignKey("compound.id", onupdate="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    substrate = db.relationship(
+        Compound, lazy="joined", innerjoin=True, foreign_keys=[substrate_id]
+    )
+    substrate_name = Entity("substrate", "name")
+    substrate_identifier = Entity("substrate", "identifier")
+    substrate_namespace = Entity("substrate", "namespace")
 
     # Both in mmol-product / mmol-substrate
     measurement = db.Column(db.Float, nullable=False)
     uncertainty = db.Column(db.Float, nullable=True)
 
 
-class Growth(TimestampMixin, db.Model):
+class Growth(TimestampMixin, ExperimentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     sample_id = db.Column(
         db.Integer,
         db.ForeignKey("sample.id", onupdate="CASCADE", ondelete="CASCADE"),
         nullable=False,
+        index=True,
     )
     sample = db.relationship(
         Sample,
@@ -281,9 +560,705 @@ class Growth(TimestampMixin, db.Model):
             uselist=False,
             cascade="all, delete-orphan",
             lazy="select",
+            passive_deletes=True,
         ),
     )
 
     measurement = db.Column(db.Float, nullable=False)  # unit: 1/h
     # unit: 1/h; 0 if no uncertainty or unknown
     uncertainty = db.Column(db.Float, nullable=False)
+
+
+class PackedMetabolomics(TimestampMixin, ExperimentMixin, db.Model):
+    """
+    The metabolomics of a sample packed into arrays.
+
+    Dense runs measure thousands of compounds per sample, which take a single
+    row packed instead of one row each. The i-th elements of the arrays are the
+    fields of the i-th measurement, as named by `ARRAYS`, whose id is the i-th
+    of `ids`. The ids are drawn from the sequence of the `UNPACKED` model, such
+    that packed measurements are read as `UNPACKED` ones, see `with_packed`.
+    The measurements of a sample are either stored as rows or packed.
+    """
+
+    UNPACKED = Metabolomics
+    ARRAYS = {
+        "compound_id": "compound_ids",
+        "measurement": "measurements",
+        "uncertainty": "uncertainties",
+    }
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    sample_id = db.Column(
+        db.Integer,
+        db.ForeignKey("sample.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    sample = db.relationship(
+        Sample,
+        backref=db.backref(
+            "packed_metabolomics",
+            uselist=False,
+            cascade="all, delete-orphan",
+            lazy="select",
+            passive_deletes=True,
+        ),
+    )
+
+    # The ids of the measurements, and those of the measured compounds.
+    ids = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    compound_ids = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    # unit: mmol/l
+    measurements = db.Column(postgresql.ARRAY(db.Float), nullable=False)
+    # unit: mmol/l
+    uncertainties = db.Column(postgresql.ARRAY(db.Float), nullable=False)
+
+    __table_args__ = (
+        db.Index("uq_packed_metabolomics_sample", "sample_id", unique=True),
+        # Finds the packed measurements by id with `&&`.
+        db.Index("ix_packed_metabolomics_ids", "ids", postgresql_using="gin"),
+    )
+
+
+class PackedProteomics(TimestampMixin, ExperimentMixin, db.Model):
+    """Proteomics of a sample packed into arrays like `PackedMetabolomics`."""
+
+    UNPACKED = Proteomics
+    ARRAYS = {
+        "protein_id": "protein_ids",
+        "gene": "genes",
+        "measurement": "measurements",
+        "uncertainty": "uncertainties",
+    }
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    sample_id = db.Column(
+        db.Integer,
+        db.ForeignKey("sample.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False,
+    )
+    sample = db.relationship(
+        Sample,
+        backref=db.backref(
+            "packed_proteomics",
+            uselist=False,
+            cascade="all, delete-orphan",
+            lazy="select",
+            passive_deletes=True,
+        ),
+    )
+
+    # The ids of the measurements, and those of the measured proteins.
+    ids = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    protein_ids = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    # A JSON array of the genes of the proteins.
+    genes = db.Column(postgresql.JSONB, nullable=False)
+    # unit: mmol/gDW
+    measurements = db.Column(postgresql.ARRAY(db.Float), nullable=False)
+    # unit: mmol/gDW
+    uncertainties = db.Column(postgresql.ARRAY(db.Float), nullable=False)
+
+    __table_args__ = (
+        db.Index("uq_packed_proteomics_sample", "sample_id", unique=True),
+        # Finds the packed measurements by id with `&&`.
+        db.Index("ix_packed_proteomics_ids", "ids", postgresql_using="gin"),
+    )
+
+
+# The packed models of the measurements which may also be stored packed.
+PACKED_MODELS = {
+    Packed.UNPACKED: Packed for Packed in (PackedMetabolomics, PackedProteomics)
+}
+
+
+class Tombstone(db.Model):
+    """Record deleted rows, such that clients can synchronize deletions."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    # The table the deleted row belonged to.
+    resource = db.Column(db.Text(), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    project_id = db.Column(db.Integer, index=True)
+    deleted = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.Index("ix_tombstone_resource_object_id", "resource", "object_id"),
+    )
+
+
+class Job(TimestampMixin, db.Model):
+    """A long running import or export, run by the workers of `jobs`."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    # The handler of the job, one of `jobs.HANDLERS`.
+    kind = db.Column(db.String(32), nullable=False)
+    # One of `pending`, `running`, `done` and `failed`.
+    status = db.Column(
+        db.String(16), nullable=False, default="pending", index=True
+    )
+    # The projects of the data read or written by the job; it is visible to
+    # users with claims to all of them, see `jobs.visible_jobs`.
+    project_ids = db.Column(postgresql.ARRAY(db.Integer), nullable=False)
+    # The `sub` claim of the JWT of the user who submitted the job, if any.
+    subject = db.Column(db.String(255))
+    # The serialized request of the job.
+    payload = db.Column(postgresql.JSONB, nullable=False)
+    # The number of processed items, e.g., measurements, of the total number,
+    # which is unknown until the job is running for some kinds.
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    # The status code and body of the response to the equivalent synchronous
+    # request, once the job is done or failed. The body is serialized JSON,
+    # which is only loaded in slices, see `jobs.result_chunks`.
+    status_code = db.Column(db.Integer)
+    result = db.deferred(db.Column(db.LargeBinary))
+    # The time the worker running the job last reported being alive, and the
+    # number of times the job was claimed; see `jobs.claim`.
+    heartbeat = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(db.Model):
+    """The response to a request sent with an `Idempotency-Key` header."""
+
+    # The `sub` claim of the JWT of the user who sent the request.
+    subject = db.Column(db.String(255), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    # The SHA-256 hex digest of the method, path and body of the request.
+    request_hash = db.Column(db.String(64), nullable=False)
+    created = db.Column(
+        db.DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+    # The status code and body of the response, committed with the request.
+    status_code = db.Column(db.Integer)
+    response = db.Column(postgresql.JSONB)
+
+
+# Tombstones are recorded by triggers for the rows deleted by a statement, but
+# not for the rows removed along with them by `ON DELETE CASCADE`: clients drop
+# the rows referring to a deleted row themselves, such that deleting a large
+# experiment records a single tombstone. The triggers fire before deletion and
+# look up the project through the parent of the row. Models without a
+# `project_id` are listed with the foreign key to their parent.
+_PARENTS = {
+    MediumCompound: ("medium_id", Medium),
+    Condition: ("experiment_id", Experiment),
+    Sample: ("condition_id", Condition),
+    Fluxomics: ("sample_id", Sample),
+    Metabolomics: ("sample_id", Sample),
+    Proteomics: ("sample_id", Sample),
+    UptakeSecretionRates: ("sample_id", Sample),
+    MolarYields: ("sample_id", Sample),
+    Growth: ("sample_id", Sample),
+    PackedMetabolomics: ("sample_id", Sample),
+    PackedProteomics: ("sample_id", Sample),
+}
+
+
+def _tombstone_trigger(model):
+    """Create the trigger recording a tombstone for deleted rows of a model."""
+    table = model.__tablename__
+    if model in _PARENTS:
+        column, parent = _PARENTS[model]
+        joins = ""
+        owner = parent
+        while owner in _PARENTS:
+            foreign_key, grandparent = _PARENTS[owner]
+            joins += (
+                f" JOIN {grandparent.__tablename__} ON "
+                f"{grandparent.__tablename__}.id = "
+                f"{owner.__tablename__}.{foreign_key}"
+            )
+            owner = grandparent
+        project_id = (
+            f"(SELECT {owner.__tablename__}.project_id "
+            f"FROM {parent.__tablename__}{joins} "
+            f"WHERE {parent.__tablename__}.id = OLD.{column})"
+        )
+    else:
+        project_id = "OLD.project_id"
+    # Cascaded deletions run in the referential integrity triggers, i.e., at a
+    # trigger depth above zero, and are skipped without calling the function.
+    # The clock time orders the tombstones of a long transaction correctly
+    # with the `updated_since` of clients, unlike its start time `now()`.
+    if not hasattr(model, "UNPACKED"):
+        return DDL(
+            f"""
+            CREATE OR REPLACE FUNCTION record_{table}_tombstone()
+            RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO tombstone (resource, object_id, project_id, deleted)
+                VALUES (
+                    '{table}', OLD.id, {project_id},
+                    clock_timestamp() AT TIME ZONE 'utc'
+                );
+                RETURN OLD;
+            END;
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER {table}_tombstone BEFORE DELETE ON {table}
+            FOR EACH ROW WHEN (pg_trigger_depth() = 0)
+            EXECUTE PROCEDURE record_{table}_tombstone();
+            """
+        )
+    # Packed measurements are read as unpacked ones, and so are their
+    # tombstones, which are recorded for each of them when the row is deleted
+    # or packed again without them.
+    return DDL(
+        f"""
+        CREATE OR REPLACE FUNCTION record_{table}_tombstone()
+        RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO tombstone (resource, object_id, project_id, deleted)
+            SELECT
+                '{model.UNPACKED.__tablename__}', dropped.id, {project_id},
+                clock_timestamp() AT TIME ZONE 'utc'
+            FROM unnest(OLD.ids) AS dropped (id)
+            WHERE TG_OP = 'DELETE' OR NOT dropped.id = ANY(NEW.ids);
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER {table}_tombstone BEFORE DELETE ON {table}
+        FOR EACH ROW WHEN (pg_trigger_depth() = 0)
+        EXECUTE PROCEDURE record_{table}_tombstone();
+        CREATE TRIGGER {table}_repack_tombstone AFTER UPDATE OF ids ON {table}
+        FOR EACH ROW WHEN (NOT OLD.ids <@ NEW.ids)
+        EXECUTE PROCEDURE record_{table}_tombstone();
+        """
+    )
+
+
+# Changes are announced on this channel with `NOTIFY`, see `warehouse.events`.
+CHANGES_CHANNEL = "warehouse_changes"
+# The most ids named by a notification, whose payload is limited to 8000 bytes.
+NOTIFICATION_IDS = 500
+
+
+def _notify_changed(resource, action, id, column):
+    """
+    Return the statement announcing the rows of the transition table `changed`.
+
+    A statement sends a notification per resource and value of `column`, naming
+    the ids of the rows in chunks of `NOTIFICATION_IDS`, rather than one per
+    row, which would fill the notification queue on large batches.
+    """
+    return f"""
+        PERFORM pg_notify('{CHANGES_CHANNEL}', json_build_object(
+            'resource', resource,
+            'action', {action},
+            'ids', ids,
+            '{column}', {column}
+        )::text)
+        FROM (
+            SELECT resource, {column}, array_agg(id ORDER BY id) AS ids
+            FROM (
+                SELECT
+                    {resource} AS resource, {id} AS id, {column},
+                    (row_number() OVER (
+                        PARTITION BY {resource}, {column} ORDER BY {id}
+                    ) - 1) / {NOTIFICATION_IDS} AS chunk
+                FROM changed
+            ) AS numbered
+            GROUP BY resource, {column}, chunk
+        ) AS chunks
+        ORDER BY ids[1];
+    """
+
+
+def _change_trigger(model):
+    """
+    Create the triggers announcing inserted and updated rows of a model.
+
+    The notifications name the rows and their project or, to keep the triggers
+    cheap, their parent, whose project is looked up by the listener.
+    """
+    table = model.__tablename__
+    column = _PARENTS[model][0] if model in _PARENTS else "project_id"
+    # Transition tables are only available to triggers of a single event.
+    return DDL(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_{table}_change()
+        RETURNS trigger AS $$
+        BEGIN
+            {_notify_changed("TG_TABLE_NAME", "lower(TG_OP)", "id", column)}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER {table}_insert_change AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_{table}_change();
+        CREATE TRIGGER {table}_update_change AFTER UPDATE ON {table}
+        REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_{table}_change();
+        """
+    )
+
+
+for _model in [Organism, Strain, Experiment, Medium, *_PARENTS]:
+    event.listen(_model.__table__, "after_create", _tombstone_trigger(_model))
+    event.listen(_model.__table__, "after_create", _change_trigger(_model))
+
+# Deletions are announced through their tombstones, which know the project.
+event.listen(
+    Tombstone.__table__,
+    "after_create",
+    DDL(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_deletion() RETURNS trigger AS $$
+        BEGIN
+            {_notify_changed("resource", "'delete'", "object_id", "project_id")}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER tombstone_deletion AFTER INSERT ON tombstone
+        REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_deletion();
+        """
+    ),
+)
+
+# Results of jobs are stored uncompressed, such that slices of them are read
+# without reading all of it.
+event.listen(
+    Job.__table__,
+    "after_create",
+    DDL("ALTER TABLE job ALTER COLUMN result SET STORAGE EXTERNAL"),
+)
+
+# Link new strains to their ancestors and move the links of a strain and its
+# descendants along when its parent changes. Deleted strains lose their links
+# through `ON DELETE CASCADE`. A parent which is a descendant of the strain
+# would create a cycle and is rejected.
+event.listen(
+    StrainClosure.__table__,
+    "after_create",
+    DDL(
+        """
+        CREATE OR REPLACE FUNCTION maintain_strain_closure()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO strain_closure (ancestor_id, descendant_id, depth)
+                VALUES (NEW.id, NEW.id, 0);
+            ELSIF NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id THEN
+                RETURN NULL;
+            ELSE
+                DELETE FROM strain_closure AS link
+                USING strain_closure AS subtree
+                WHERE subtree.ancestor_id = NEW.id
+                AND link.descendant_id = subtree.descendant_id
+                AND link.depth > subtree.depth;
+            END IF;
+            IF EXISTS (
+                SELECT 1 FROM strain_closure
+                WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id
+            ) THEN
+                RAISE EXCEPTION 'A strain can not descend from itself'
+                USING ERRCODE = 'check_violation';
+            END IF;
+            INSERT INTO strain_closure (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, below.descendant_id,
+                   above.depth + below.depth + 1
+            FROM strain_closure AS above, strain_closure AS below
+            WHERE above.descendant_id = NEW.parent_id
+            AND below.ancestor_id = NEW.id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER strain_closure AFTER INSERT OR UPDATE OF parent_id
+        ON strain FOR EACH ROW EXECUTE PROCEDURE maintain_strain_closure();
+        """
+    ),
+)
+
+
+# Assign new measurements and those moved to another sample the experiment of
+# their sample, and move the measurements of a sample moved to another condition
+# or of a condition moved to another experiment along, see `ExperimentMixin`.
+_EXPERIMENT_TABLES = [
+    model.__tablename__
+    for model in _PARENTS
+    if issubclass(model, ExperimentMixin)
+]
+_move_measurements = " ".join(
+    f"UPDATE {table} SET experiment_id = experiment "
+    f"WHERE sample_id = ANY (samples);"
+    for table in _EXPERIMENT_TABLES
+)
+event.listen(
+    Sample.__table__,
+    "after_create",
+    DDL(
+        f"""
+        CREATE OR REPLACE FUNCTION assign_measurement_experiment()
+        RETURNS trigger AS $$
+        BEGIN
+            -- Samples copied in the same statement are not visible yet; the
+            -- copies of their measurements name the experiment themselves.
+            NEW.experiment_id := COALESCE((
+                SELECT condition.experiment_id
+                FROM sample JOIN condition ON condition.id = sample.condition_id
+                WHERE sample.id = NEW.sample_id
+            ), NEW.experiment_id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE OR REPLACE FUNCTION move_measurements_experiment()
+        RETURNS trigger AS $$
+        DECLARE
+            experiment integer;
+            samples integer[];
+        BEGIN
+            IF TG_TABLE_NAME = 'sample' THEN
+                IF NEW.condition_id = OLD.condition_id THEN
+                    RETURN NULL;
+                END IF;
+                SELECT experiment_id INTO experiment FROM condition
+                WHERE id = NEW.condition_id;
+                samples := ARRAY[NEW.id];
+            ELSE
+                IF NEW.experiment_id = OLD.experiment_id THEN
+                    RETURN NULL;
+                END IF;
+                experiment := NEW.experiment_id;
+                samples := ARRAY(
+                    SELECT id FROM sample WHERE condition_id = NEW.id
+                );
+            END IF;
+            {_move_measurements}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER sample_experiment AFTER UPDATE OF condition_id
+        ON sample FOR EACH ROW EXECUTE PROCEDURE move_measurements_experiment();
+        CREATE TRIGGER condition_experiment AFTER UPDATE OF experiment_id
+        ON condition FOR EACH ROW
+        EXECUTE PROCEDURE move_measurements_experiment();
+        """
+    ),
+)
+for _table in _EXPERIMENT_TABLES:
+    event.listen(
+        db.metadata.tables[_table],
+        "after_create",
+        DDL(
+            f"""
+            CREATE TRIGGER {_table}_experiment
+            BEFORE INSERT OR UPDATE OF sample_id ON {_table}
+            FOR EACH ROW EXECUTE PROCEDURE assign_measurement_experiment();
+            """
+        ),
+    )
+
+
+def search_document(*columns):
+    """
+    Return the full-text search document of the given text columns.
+
+    The `simple` configuration neither stems words nor drops stop words, as
+    names and genotypes are not natural language. Queries must repeat the
+    exact expression to be served by the indexes below.
+    """
+    document = columns[0]
+    for column in columns[1:]:
+        document = (
+            func.coalesce(document, literal_column("''"))
+            + literal_column("' '")
+            + func.coalesce(column, literal_column("''"))
+        )
+    return func.to_tsvector(literal_column("'simple'"), document)
+
+
+# The text searched by name per model. Proteins are searched in their
+# dictionary, see `join_entities`.
+_SEARCHED_COLUMNS = [
+    (Organism, [Organism.name]),
+    (Strain, [Strain.name, Strain.genotype]),
+    (Experiment, [Experiment.name, Experiment.description]),
+    (Sample, [Sample.name]),
+    (MediumCompound, [MediumCompound.compound_name]),
+    (Proteomics, [Protein.full_name]),
+]
+SEARCH_DOCUMENTS = {
+    model: search_document(*columns) for model, columns in _SEARCHED_COLUMNS
+}
+# Index the documents in GIN expression indexes of the searched tables.
+for _model, _columns in _SEARCHED_COLUMNS:
+    db.Index(
+        f"ix_{_columns[0].class_.__tablename__}_search",
+        SEARCH_DOCUMENTS[_model],
+        postgresql_using="gin",
+    )
+
+
+# The relationships of the measurements to their dictionary entries.
+ENTITIES = {
+    Fluxomics: ("reaction",),
+    Metabolomics: ("compound",),
+    UptakeSecretionRates: ("compound",),
+    Proteomics: ("protein",),
+    MolarYields: ("product", "substrate"),
+}
+
+
+@lru_cache(maxsize=None)
+def entity_alias(model, relationship):
+    """
+    Return the dictionary model to query the entries of a relationship with.
+
+    Relationships named after their dictionary table refer to the table itself.
+    Others, like the product and substrate of molar yields, refer to an alias
+    named after the relationship, such that both can be joined.
+    """
+    Dictionary = getattr(model, relationship).property.mapper.class_
+    if relationship == Dictionary.__tablename__:
+        return Dictionary
+    return aliased(Dictionary, name=relationship)
+
+
+def join_entities(query, model):
+    """Join the given query to the dictionary entries of the given model."""
+    # Aliases, see `with_packed`, share the dictionaries of their model.
+    mapped = inspect(model).class_
+    for relationship in ENTITIES.get(mapped, ()):
+        alias = entity_alias(mapped, relationship)
+        query = query.join(
+            alias, getattr(model, f"{relationship}_id") == alias.id
+        )
+    return query
+
+
+def unpack(Packed, ids=None):
+    """
+    Select packed measurements unpacked into the columns of their model.
+
+    :param Packed: The packed measurement model class, see `PACKED_MODELS`
+    :param ids: If given, only unpack the rows packing any of these ids, which
+        are found in the GIN index of the ids
+    :return: A select of the columns of the table of `Packed.UNPACKED`
+    """
+    table = Packed.__table__
+    arrays = {"id": "ids"}
+    arrays.update(
+        (field, array)
+        for field, array in Packed.ARRAYS.items()
+        if isinstance(table.c[array].type, postgresql.ARRAY)
+    )
+    # The arrays are unnested side by side, along with the position in them.
+    names = ", ".join(f"{table.name}.{array}" for array in arrays.values())
+    unnested = text(
+        f"unnest({names}) "
+        f"WITH ORDINALITY AS arrays ({', '.join(arrays)}, position)"
+    )
+    position = literal_column("arrays.position", Integer)
+    columns = []
+    for column in Packed.UNPACKED.__table__.columns:
+        if column.name in arrays:
+            value = literal_column(f"arrays.{column.name}", column.type)
+        elif column.name in Packed.ARRAYS:
+            # JSON arrays are indexed from 0.
+            value = table.c[Packed.ARRAYS[column.name]][
+                cast(position - 1, Integer)
+            ]
+        else:
+            value = table.c[column.name]
+        columns.append(value.label(column.name))
+    query = select(columns).select_from(table).select_from(unnested)
+    if ids is not None:
+        query = query.where(table.c.ids.overlap(sorted(ids)))
+    return query
+
+
+def with_packed(Measurement, ids=None):
+    """
+    Return the model to query the measurements stored as rows and packed with.
+
+    Every read of measurements which may be packed, see `PACKED_MODELS`, goes
+    through an alias of the union of the rows and the unpacked measurements,
+    which is queried like the model itself, e.g.::
+
+        Metabolomics = with_packed(models.Metabolomics)
+        db.session.query(Metabolomics).filter(Metabolomics.sample_id == id)
+
+    :param Measurement: The measurement model class
+    :param ids: If given, only unpack the packed measurements of rows packing
+        any of these ids, e.g., when querying them by id
+    :return: An alias of the model, or the model itself if it is never packed
+    """
+    Packed = PACKED_MODELS.get(Measurement)
+    if Packed is None:
+        return Measurement
+    table = Measurement.__table__
+    measurements = union_all(select([table]), unpack(Packed, ids))
+    return aliased(Measurement, measurements.alias(f"all_{table.name}"))
+
+
+def entry_ids(session, Dictionary, entries):
+    """
+    Return the ids of the given dictionary entries, inserting missing ones.
+
+    :param session: The database session
+    :param Dictionary: The dictionary model, e.g., `Reaction`
+    :param entries: Tuples of the values of the `KEY` columns of the entries
+    :return: A dictionary of the ids by the tuples
+    """
+    if not entries:
+        return {}
+    table = Dictionary.__table__
+    key = ", ".join(Dictionary.KEY)
+    parameters = {}
+    values = []
+    # Sorted, concurrent requests lock the entries in the same order.
+    for index, entry in enumerate(sorted(set(entries))):
+        placeholders = []
+        for name, value in zip(Dictionary.KEY, entry):
+            parameters[f"{name}_{index}"] = value
+            placeholders.append(f"CAST(:{name}_{index} AS text)")
+        values.append(f"({', '.join(placeholders)})")
+    # The no-op update returns the existing entries as well, including those
+    # committed by a concurrent request after this statement began, but
+    # changes none of their values.
+    first = Dictionary.KEY[0]
+    statement = text(
+        f"INSERT INTO {table.name} ({key}) "
+        f"VALUES {', '.join(values)} "
+        f"ON CONFLICT ({key}) DO UPDATE SET {first} = EXCLUDED.{first} "
+        f"RETURNING id, {key}"
+    )
+    return {
+        tuple(entry): id
+        for id, *entry in session.execute(statement, parameters)
+    }
+
+
+@event.listens_for(Session, "before_flush")
+def _resolve_entries(session, flush_context, instances):
+    """Replace the new dictionary entries of measurements by stored ones."""
+    new_entries = defaultdict(list)
+    for instance in [*session.new, *session.dirty]:
+        for relationship in ENTITIES.get(type(instance), ()):
+            entry = getattr(instance, relationship)
+            if entry is not None and not inspect(entry).has_identity:
+                new_entries[type(entry)].append((instance, relationship, entry))
+    for Dictionary, references in new_entries.items():
+        ids = entry_ids(
+            session,
+            Dictionary,
+            [
+                tuple(getattr(entry, name) for name in Dictionary.KEY)
+                for _, _, entry in references
+            ],
+        )
+        for instance, relationship, entry in references:
+            values = {name: getattr(entry, name) for name in Dictionary.KEY}
+            id = ids[tuple(values.values())]
+            stored = session.identity_map.get(identity_key(Dictionary, id))
+            if stored is None:
+                # Refer to the stored entry without loading it again.
+                stored = Dictionary(id=id, **values)
+                make_transient_to_detached(stored)
+                session.add(stored)
+            setattr(instance, relationship, stored)
+            if entry in session:
+                session.expunge(entry)
@@ -17,14 +17,46 @@
 
 import warnings
 
-from flask import abort, g, make_response
+from flask import (
+    Response,
+    abort,
+    current_app,
+    g,
+    jsonify,
+    make_response,
+    stream_with_context,
+)
 from flask_apispec import FlaskApiSpec, MethodResource, marshal_with, use_kwargs
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm.exc import NoResultFound
 
-from warehouse import models, schemas
+from warehouse import (
+    aggregates,
+    idempotency,
+    jobs,
+    lineage,
+    matrices,
+    models,
+    schemas,
+    search,
+    timeseries,
+)
 from warehouse.app import db
+from warehouse.data import Prefetched, conditions_data
 from warehouse.jwt import jwt_require_claim, jwt_required
-from warehouse.utils import verify_relation
+from warehouse.utils import (
+    changed_since,
+    clone_experiment,
+    delete_measurements,
+    filter_ids,
+    insert_measurements,
+    pack_measurements,
+    update_measurements,
+    verify_relation,
+    verify_storage,
+    verify_unpacked,
+)
+from warehouse.visibility import project_visible, visible, with_project
 
 
 def init_app(app):
@@ -41,9 +73,17 @@ def init_app(app):
     register("/organisms/<int:id>", Organism)
     register("/strains", Strains)
     register("/strains/<int:id>", Strain)
+    register("/strains/common-ancestor", StrainCommonAncestor)
+    register("/strains/<int:id>/ancestors", StrainAncestors)
+    register("/strains/<int:id>/descendants", StrainDescendants)
     register("/experiments", Experiments)
     register("/experiments/<int:id>", Experiment)
     register("/experiments/<int:id>/data", ExperimentData)
+    register("/experiments/<int:id>/export", ExperimentExport)
+    register("/experiments/<int:id>/clone", ExperimentClone)
+    register("/experiments/<int:id>/statistics", ExperimentStatistics)
+    register("/experiments/<int:id>/matrix", ExperimentMatrix)
+    register("/experiments/<int:id>/measurements", ExperimentMeasurements)
     register("/media", Media)
     register("/media/<int:id>", Medium)
     register("/media/compounds", MediumCompounds)
@@ -51,32 +91,48 @@ def init_app(app):
     register("/conditions", Conditions)
     register("/conditions/<int:id>", Condition)
     register("/conditions/<int:id>/data", ConditionData)
+    register("/conditions/<int:id>/statistics", ConditionStatistics)
+    register("/conditions/<int:id>/time-series", ConditionTimeSeries)
+    register("/conditions/<int:id>/measurements", ConditionMeasurements)
     register("/samples", Samples)
     register("/samples/<int:id>", Sample)
+    register("/samples/<int:id>/measurements", SampleMeasurements)
     register("/fluxomics", Fluxomics)
     register("/fluxomics/batch", FluxomicsBatch)
     register("/fluxomics/<int:id>", Fluxomic)
     register("/metabolomics", Metabolomics)
     register("/metabolomics/batch", MetabolomicsBatch)
+    register("/metabolomics/packed", MetabolomicsPacked)
     register("/metabolomics/<int:id>", Metabolomic)
     register("/proteomics", Proteomics)
     register("/proteomics/batch", ProteomicsBatch)
+    register("/proteomics/packed", ProteomicsPacked)
     register("/proteomics/<int:id>", Proteomic)
     register("/uptake-secretion-rates", UptakeSecretionRates)
+    register("/uptake-secretion-rates/batch", UptakeSecretionRatesBatch)
     register("/uptake-secretion-rates/<int:id>", UptakeSecretionRate)
     register("/molar-yields", MolarYields)
+    register("/molar-yields/batch", MolarYieldsBatch)
     register("/molar-yields/<int:id>", MolarYield)
     register("/growth-rates", GrowthRates)
+    register("/growth-rates/batch", GrowthRatesBatch)
     register("/growth-rates/<int:id>", GrowthRate)
+    register("/search", Search)
+    register("/measurements/search", MeasurementSearch)
+    register("/tombstones", Tombstones)
+    register("/jobs/<int:id>", Job)
+    register("/jobs/<int:id>/result", JobResult)
+    register("/changes", Changes)
 
 
 class Organisms(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Organism(many=True), 200)
-    def get(self):
-        return models.Organism.query.filter(
-            models.Organism.project_id.in_(g.jwt_claims["prj"])
-            | models.Organism.project_id.is_(None)
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Organism.query.filter(visible(models.Organism)).filter(
+            changed_since(models.Organism.updated, updated_since)
+        )
+        return filter_ids(query, models.Organism, ids)
 
     @jwt_required
     @use_kwargs(schemas.Organism(exclude=("id",)))
@@ -95,10 +151,7 @@ class Organism(MethodResource):
         try:
             return (
                 models.Organism.query.filter(models.Organism.id == id)
-                .filter(
-                    models.Organism.project_id.in_(g.jwt_claims["prj"])
-                    | models.Organism.project_id.is_(None)
-                )
+                .filter(visible(models.Organism))
                 .one()
             )
         except NoResultFound:
@@ -111,7 +164,7 @@ class Organism(MethodResource):
         try:
             organism = (
                 models.Organism.query.filter(models.Organism.id == id)
-                .filter(models.Organism.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Organism, public=False))
                 .one()
             )
         except NoResultFound:
@@ -133,7 +186,7 @@ class Organism(MethodResource):
         try:
             organism = (
                 models.Organism.query.filter(models.Organism.id == id)
-                .filter(models.Organism.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Organism, public=False))
                 .one()
             )
         except NoResultFound:
@@ -146,12 +199,13 @@ class Organism(MethodResource):
 
 
 class Strains(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Strain(many=True), 200)
-    def get(self):
-        return models.Strain.query.filter(
-            models.Strain.project_id.in_(g.jwt_claims["prj"])
-            | models.Strain.project_id.is_(None)
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Strain.query.filter(visible(models.Strain)).filter(
+            changed_since(models.Strain.updated, updated_since)
+        )
+        return filter_ids(query, models.Strain, ids)
 
     @jwt_required
     @use_kwargs(schemas.Strain(exclude=("id",)))
@@ -182,10 +236,7 @@ class Strain(MethodResource):
         try:
             return (
                 models.Strain.query.filter(models.Strain.id == id)
-                .filter(
-                    models.Strain.project_id.in_(g.jwt_claims["prj"])
-                    | models.Strain.project_id.is_(None)
-                )
+                .filter(visible(models.Strain))
                 .one()
             )
         except NoResultFound:
@@ -198,7 +249,7 @@ class Strain(MethodResource):
         try:
             strain = (
                 models.Strain.query.filter(models.Strain.id == id)
-                .filter(models.Strain.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Strain, public=False))
                 .one()
             )
         except NoResultFound:
@@ -220,7 +271,7 @@ class Strain(MethodResource):
         try:
             strain = (
                 models.Strain.query.filter(models.Strain.id == id)
-                .filter(models.Strain.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Strain, public=False))
                 .one()
             )
         except NoResultFound:
@@ -232,13 +283,68 @@ class Strain(MethodResource):
             return make_response("", 204)
 
 
+class StrainAncestors(MethodResource):
+    @use_kwargs(schemas.LineageDepth, locations=("query",))
+    @marshal_with(schemas.StrainLineage(many=True), 200)
+    def get(self, id, max_depth):
+        try:
+            strain = (
+                models.Strain.query.filter(models.Strain.id == id)
+                .filter(visible(models.Strain))
+                .one()
+            )
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        return lineage.ancestors(strain, max_depth)
+
+
+class StrainDescendants(MethodResource):
+    @use_kwargs(schemas.LineageDepth, locations=("query",))
+    @marshal_with(schemas.StrainLineage(many=True), 200)
+    def get(self, id, max_depth):
+        try:
+            strain = (
+                models.Strain.query.filter(models.Strain.id == id)
+                .filter(visible(models.Strain))
+                .one()
+            )
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        return lineage.descendants(strain, max_depth)
+
+
+class StrainCommonAncestor(MethodResource):
+    @use_kwargs(schemas.StrainIds, locations=("query",))
+    @marshal_with(schemas.Strain, 200)
+    def get(self, ids):
+        ids = set(ids)
+        strain_ids = {
+            id
+            for (id,) in db.session.query(models.Strain.id)
+            .filter(models.Strain.id.in_(ids))
+            .filter(visible(models.Strain))
+        }
+        missing_ids = ids.difference(strain_ids)
+        if missing_ids:
+            abort(
+                404,
+                f"Cannot find objects with ids "
+                f"{', '.join(str(id) for id in sorted(missing_ids))}",
+            )
+        ancestor = lineage.common_ancestor(strain_ids)
+        if ancestor is None:
+            abort(404, "The strains do not have a common ancestor")
+        return ancestor
+
+
 class Experiments(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Experiment(many=True), 200)
-    def get(self):
-        return models.Experiment.query.filter(
-            models.Experiment.project_id.in_(g.jwt_claims["prj"])
-            | models.Experiment.project_id.is_(None)
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Experiment.query.filter(
+            visible(models.Experiment)
+        ).filter(changed_since(models.Experiment.updated, updated_since))
+        return filter_ids(query, models.Experiment, ids)
 
     @jwt_required
     @use_kwargs(schemas.Experiment(exclude=("id",)))
@@ -259,10 +365,7 @@ class Experiment(MethodResource):
         try:
             return (
                 models.Experiment.query.filter(models.Experiment.id == id)
-                .filter(
-                    models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    | models.Experiment.project_id.is_(None)
-                )
+                .filter(visible(models.Experiment))
                 .one()
             )
         except NoResultFound:
@@ -275,7 +378,7 @@ class Experiment(MethodResource):
         try:
             experiment = (
                 models.Experiment.query.filter(models.Experiment.id == id)
-                .filter(models.Experiment.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Experiment, public=False))
                 .one()
             )
         except NoResultFound:
@@ -297,7 +400,7 @@ class Experiment(MethodResource):
         try:
             experiment = (
                 models.Experiment.query.filter(models.Experiment.id == id)
-                .filter(models.Experiment.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Experiment, public=False))
                 .one()
             )
         except NoResultFound:
@@ -309,29 +412,145 @@ class Experiment(MethodResource):
             return make_response("", 204)
 
 
+class ExperimentClone(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.ExperimentClone)
+    @marshal_with(schemas.Experiment(only=("id",)), 201)
+    def post(self, id, project_id, name):
+        """
+        Copy an experiment with its data, to its own or another project.
+
+        A copy in another project refers to copies of the strains and media of
+        other projects, see `utils.clone_experiment`.
+        """
+        try:
+            experiment = (
+                models.Experiment.query.filter(models.Experiment.id == id)
+                .filter(visible(models.Experiment))
+                .one()
+            )
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        if project_id is None:
+            project_id = experiment.project_id
+        jwt_require_claim(project_id, "write")
+        clone_id = clone_experiment(
+            experiment, project_id, name or experiment.name
+        )
+        return ({"id": clone_id}, 201)
+
+
 class ExperimentData(MethodResource):
+    @use_kwargs(schemas.ExperimentDataRequest, locations=("query",))
     @marshal_with(schemas.ExperimentData, 200)
-    def get(self, id):
+    def get(self, id, updated_since, include, only):
         try:
-            return (
+            experiment = (
                 models.Experiment.query.filter(models.Experiment.id == id)
-                .filter(
-                    models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    | models.Experiment.project_id.is_(None)
-                )
+                .filter(visible(models.Experiment))
+                .one()
+            )
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        # Only the relations serialized by the projected schema are loaded.
+        schema = schemas.data_schema(schemas.ExperimentData, include, only)
+        relations = schemas.data_relations(schema)
+        conditions = []
+        if "conditions" in relations:
+            conditions = conditions_data(
+                models.Condition.query.filter(
+                    models.Condition.experiment_id == id
+                ),
+                updated_since,
+                experiment_id=id,
+                relations=relations,
+            )
+        return jsonify(
+            schema.dump(Prefetched(experiment, conditions=conditions))
+        )
+
+
+class ExperimentExport(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.ExperimentDataRequest)
+    @marshal_with(schemas.Job, 202)
+    def post(self, id, updated_since, include, only):
+        """Export the data of the experiment in a background job."""
+        try:
+            experiment = (
+                models.Experiment.query.filter(models.Experiment.id == id)
+                .filter(visible(models.Experiment))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
+        job = jobs.submit_export(experiment, updated_since, include, only)
+        db.session.commit()
+        return (job, 202)
+
+
+class ExperimentStatistics(MethodResource):
+    @use_kwargs(schemas.MeasurementTypes, locations=("query",))
+    @marshal_with(schemas.ExperimentStatistics, 200)
+    def get(self, id, types):
+        try:
+            models.Experiment.query.filter(models.Experiment.id == id).filter(
+                visible(models.Experiment)
+            ).one()
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        condition_ids = [
+            condition_id
+            for (condition_id,) in db.session.query(models.Condition.id)
+            .filter(models.Condition.experiment_id == id)
+            .order_by(models.Condition.id)
+        ]
+        return {
+            "experiment_id": id,
+            **aggregates.experiment_statistics(condition_ids, types),
+        }
+
+
+class ExperimentMatrix(MethodResource):
+    @use_kwargs(schemas.MeasurementMatrix, locations=("query",))
+    def get(self, id, measurement_type, sparse, encoding):
+        """Return the measurements of a type as a samples × entities matrix."""
+        try:
+            models.Experiment.query.filter(models.Experiment.id == id).filter(
+                visible(models.Experiment)
+            ).one()
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        matrix = matrices.measurement_matrix(id, measurement_type)
+        if encoding == "npz":
+            return Response(
+                matrix.to_npz(sparse),
+                mimetype="application/octet-stream",
+                headers={
+                    "Content-Disposition": (
+                        f"attachment; filename={measurement_type}-{id}.npz"
+                    )
+                },
+            )
+        return jsonify(matrix.to_json(sparse))
+
+
+class ExperimentMeasurements(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.MeasurementTypes, locations=("query",))
+    @marshal_with(schemas.MeasurementCounts, 200)
+    def delete(self, id, types):
+        return delete_measurements(models.Experiment, id, types)
 
 
 class Media(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Medium(many=True), 200)
-    def get(self):
-        return models.Medium.query.filter(
-            models.Medium.project_id.in_(g.jwt_claims["prj"])
-            | models.Medium.project_id.is_(None)
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Medium.query.filter(visible(models.Medium)).filter(
+            changed_since(models.Medium.updated, updated_since)
+        )
+        return filter_ids(query, models.Medium, ids)
 
     @jwt_required
     @use_kwargs(schemas.Medium(exclude=("id",)))
@@ -350,10 +569,7 @@ class Medium(MethodResource):
         try:
             return (
                 models.Medium.query.filter(models.Medium.id == id)
-                .filter(
-                    models.Medium.project_id.in_(g.jwt_claims["prj"])
-                    | models.Medium.project_id.is_(None)
-                )
+                .filter(visible(models.Medium))
                 .one()
             )
         except NoResultFound:
@@ -366,7 +582,7 @@ class Medium(MethodResource):
         try:
             medium = (
                 models.Medium.query.filter(models.Medium.id == id)
-                .filter(models.Medium.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Medium, public=False))
                 .one()
             )
         except NoResultFound:
@@ -388,7 +604,7 @@ class Medium(MethodResource):
         try:
             medium = (
                 models.Medium.query.filter(models.Medium.id == id)
-                .filter(models.Medium.project_id.in_(g.jwt_claims["prj"]))
+                .filter(visible(models.Medium, public=False))
                 .one()
             )
         except NoResultFound:
@@ -401,16 +617,13 @@ class Medium(MethodResource):
 
 
 class MediumCompounds(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.MediumCompound(many=True), 200)
-    def get(self):
-        return models.MediumCompound.query.filter(
-            models.MediumCompound.medium.has(
-                models.Medium.project_id.in_(g.jwt_claims["prj"])
-            )
-            | models.MediumCompound.medium.has(
-                models.Medium.project_id.is_(None)
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.MediumCompound.query.filter(
+            visible(models.MediumCompound)
+        ).filter(changed_since(models.MediumCompound.updated, updated_since))
+        return filter_ids(query, models.MediumCompound, ids)
 
     @jwt_required
     @use_kwargs(schemas.MediumCompound(exclude=("id",)))
@@ -445,14 +658,7 @@ class MediumCompound(MethodResource):
                 models.MediumCompound.query.filter(
                     models.MediumCompound.id == id
                 )
-                .filter(
-                    models.MediumCompound.medium.has(
-                        models.Medium.project_id.in_(g.jwt_claims["prj"])
-                    )
-                    | models.MediumCompound.medium.has(
-                        models.Medium.project_id.is_(None)
-                    )
-                )
+                .filter(visible(models.MediumCompound))
                 .one()
             )
         except NoResultFound:
@@ -463,21 +669,16 @@ class MediumCompound(MethodResource):
     @marshal_with(schemas.MediumCompound(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            medium_compound = (
-                models.MediumCompound.query.filter(
-                    models.MediumCompound.id == id
-                )
-                .filter(
-                    models.MediumCompound.medium.has(
-                        models.Medium.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
+            medium_compound, project_id = (
+                with_project(models.MediumCompound)
+                .filter(models.MediumCompound.id == id)
+                .filter(project_visible(models.MediumCompound, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(medium_compound.medium.project_id, "write")
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(medium_compound, field, value)
             db.session.add(medium_compound)
@@ -487,37 +688,29 @@ class MediumCompound(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            medium_compound = (
-                models.MediumCompound.query.filter(
-                    models.MediumCompound.id == id
-                )
-                .filter(
-                    models.MediumCompound.medium.has(
-                        models.Medium.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
+            medium_compound, project_id = (
+                with_project(models.MediumCompound)
+                .filter(models.MediumCompound.id == id)
+                .filter(project_visible(models.MediumCompound, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(medium_compound.medium.project_id, "admin")
+            jwt_require_claim(project_id, "admin")
             db.session.delete(medium_compound)
             db.session.commit()
             return make_response("", 204)
 
 
 class Conditions(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Condition(many=True), 200)
-    def get(self):
-        return models.Condition.query.filter(
-            models.Condition.experiment.has(
-                models.Experiment.project_id.in_(g.jwt_claims["prj"])
-            )
-            | models.Condition.experiment.has(
-                models.Experiment.project_id.is_(None)
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Condition.query.filter(visible(models.Condition)).filter(
+            changed_since(models.Condition.updated, updated_since)
+        )
+        return filter_ids(query, models.Condition, ids)
 
     @jwt_required
     @use_kwargs(schemas.Condition(exclude=("id",)))
@@ -541,14 +734,7 @@ class Condition(MethodResource):
         try:
             return (
                 models.Condition.query.filter(models.Condition.id == id)
-                .filter(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                    | models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
+                .filter(visible(models.Condition))
                 .one()
             )
         except NoResultFound:
@@ -559,19 +745,16 @@ class Condition(MethodResource):
     @marshal_with(schemas.Condition(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            condition = (
-                models.Condition.query.filter(models.Condition.id == id)
-                .filter(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
+            condition, project_id = (
+                with_project(models.Condition)
+                .filter(models.Condition.id == id)
+                .filter(project_visible(models.Condition, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(condition.experiment.project_id, "write")
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(condition, field, value)
             db.session.add(condition)
@@ -581,45 +764,41 @@ class Condition(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            condition = (
-                models.Condition.query.filter(models.Condition.id == id)
-                .filter(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
+            condition, project_id = (
+                with_project(models.Condition)
+                .filter(models.Condition.id == id)
+                .filter(project_visible(models.Condition, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(condition.experiment.project_id, "admin")
+            jwt_require_claim(project_id, "admin")
             db.session.delete(condition)
             db.session.commit()
             return make_response("", 204)
 
 
 class Samples(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Sample(many=True), 200)
-    def get(self):
-        return models.Sample.query.filter(
-            models.Sample.condition.has(
-                models.Experiment.project_id.in_(g.jwt_claims["prj"])
-            )
-            | models.Sample.condition.has(
-                models.Experiment.project_id.is_(None)
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Sample.query.filter(visible(models.Sample)).filter(
+            changed_since(models.Sample.updated, updated_since)
+        )
+        return filter_ids(query, models.Sample, ids)
 
     @jwt_required
     @use_kwargs(schemas.Sample(exclude=("id",)))
     @marshal_with(schemas.Sample(only=("id",)), 201)
     def post(self, condition_id, name, start_time, end_time):
         try:
-            condition = models.Condition.query.filter(
-                models.Condition.id == condition_id
-            ).one()
-            jwt_require_claim(condition.experiment.project_id, "write")
+            condition, project_id = (
+                with_project(models.Condition)
+                .filter(models.Condition.id == condition_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {condition_id} does not exist")
         sample = models.Sample(
@@ -634,23 +813,60 @@ class Samples(MethodResource):
 
 
 class ConditionData(MethodResource):
+    @use_kwargs(schemas.ConditionDataRequest, locations=("query",))
     @marshal_with(schemas.ConditionData)
-    def get(self, id):
+    def get(self, id, updated_since, include, only):
+        conditions = models.Condition.query.filter(
+            models.Condition.id == id
+        ).filter(visible(models.Condition))
+        # Only the relations serialized by the projected schema are loaded.
+        schema = schemas.data_schema(schemas.ConditionData, include, only)
         try:
-            return (
-                models.Condition.query.filter(models.Condition.id == id)
-                .filter(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                    | models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
-                .one()
+            (condition,) = conditions_data(
+                conditions,
+                updated_since,
+                relations=schemas.data_relations(schema),
+                changed_conditions=False,
             )
+        except ValueError:
+            abort(404, f"Cannot find object with id {id}")
+        return jsonify(schema.dump(condition))
+
+
+class ConditionStatistics(MethodResource):
+    @use_kwargs(schemas.MeasurementTypes, locations=("query",))
+    @marshal_with(schemas.ConditionStatistics, 200)
+    def get(self, id, types):
+        try:
+            models.Condition.query.filter(models.Condition.id == id).filter(
+                visible(models.Condition)
+            ).one()
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
+        (statistics,) = aggregates.condition_statistics([id], types)
+        return statistics
+
+
+class ConditionTimeSeries(MethodResource):
+    @use_kwargs(schemas.TimeSeriesRequest, locations=("query",))
+    @marshal_with(schemas.TimeSeriesPoint(many=True), 200)
+    def get(self, id, measurement_type, **kwargs):
+        """Return the measurements of an entity ordered by sample time."""
+        try:
+            models.Condition.query.filter(models.Condition.id == id).filter(
+                visible(models.Condition)
+            ).one()
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        return timeseries.time_series(id, measurement_type, **kwargs)
+
+
+class ConditionMeasurements(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.MeasurementTypes, locations=("query",))
+    @marshal_with(schemas.MeasurementCounts, 200)
+    def delete(self, id, types):
+        return delete_measurements(models.Condition, id, types)
 
 
 class Sample(MethodResource):
@@ -659,14 +875,7 @@ class Sample(MethodResource):
         try:
             return (
                 models.Sample.query.filter(models.Sample.id == id)
-                .filter(
-                    models.Sample.condition.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                    | models.Sample.condition.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
+                .filter(visible(models.Sample))
                 .one()
             )
         except NoResultFound:
@@ -677,19 +886,16 @@ class Sample(MethodResource):
     @marshal_with(schemas.Sample(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            sample = (
-                models.Sample.query.filter(models.Sample.id == id)
-                .filter(
-                    models.Sample.condition.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == id)
+                .filter(project_visible(models.Sample, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(sample, field, value)
             db.session.add(sample)
@@ -699,43 +905,37 @@ class Sample(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            sample = (
-                models.Sample.query.filter(models.Sample.id == id)
-                .filter(
-                    models.Sample.condition.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == id)
+                .filter(project_visible(models.Sample, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(sample.condition.experiment.project_id, "admin")
+            jwt_require_claim(project_id, "admin")
             db.session.delete(sample)
             db.session.commit()
             return make_response("", 204)
 
 
+class SampleMeasurements(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.MeasurementTypes, locations=("query",))
+    @marshal_with(schemas.MeasurementCounts, 200)
+    def delete(self, id, types):
+        return delete_measurements(models.Sample, id, types)
+
+
 class Fluxomics(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Fluxomics(many=True), 200)
-    def get(self):
-        return models.Fluxomics.query.filter(
-            models.Fluxomics.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
-            )
-            | models.Fluxomics.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Fluxomics.query.filter(visible(models.Fluxomics)).filter(
+            changed_since(models.Fluxomics.updated, updated_since)
+        )
+        return filter_ids(query, models.Fluxomics, ids)
 
     @jwt_required
     @use_kwargs(schemas.Fluxomics(exclude=("id",)))
@@ -750,10 +950,12 @@ class Fluxomics(MethodResource):
         uncertainty,
     ):
         try:
-            sample = models.Sample.query.filter(
-                models.Sample.id == sample_id
-            ).one()
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == sample_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {sample_id} does not exist")
         fluxomics = models.Fluxomics(
@@ -773,15 +975,18 @@ class FluxomicsBatch(MethodResource):
     @jwt_required
     @use_kwargs(schemas.FluxomicsBatchRequest)
     @marshal_with(schemas.Fluxomics(only=("id",), many=True), 201)
-    def post(self, body):
+    @marshal_with(schemas.Job, 202)
+    def post(self, body, upsert, background):
         sample_ids = set(fluxomics_item["sample_id"] for fluxomics_item in body)
-        samples = models.Sample.query.filter(
-            models.Sample.id.in_(sample_ids)
-        ).all()
+        samples = (
+            with_project(models.Sample)
+            .filter(models.Sample.id.in_(sample_ids))
+            .all()
+        )
 
         if len(sample_ids) != len(samples):
             missing_sample_ids = sample_ids.difference(
-                set([sample.id for sample in samples])
+                set([sample.id for sample, _ in samples])
             )
             abort(
                 404,
@@ -790,23 +995,30 @@ class FluxomicsBatch(MethodResource):
                 f"do not exist",
             )
 
-        for sample in samples:
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+        for _, project_id in samples:
+            jwt_require_claim(project_id, "write")
 
-        fluxomics = [
-            models.Fluxomics(
-                sample_id=fluxomics_item["sample_id"],
-                reaction_name=fluxomics_item["reaction_name"],
-                reaction_identifier=fluxomics_item["reaction_identifier"],
-                reaction_namespace=fluxomics_item["reaction_namespace"],
-                measurement=fluxomics_item["measurement"],
-                uncertainty=fluxomics_item["uncertainty"],
+        replayed = idempotency.begin()
+        if replayed is not None:
+            return replayed
+        if background:
+            job = jobs.submit_import(
+                "fluxomics",
+                body,
+                upsert,
+                {project_id for _, project_id in samples},
             )
-            for fluxomics_item in body
-        ]
-        db.session.add_all(fluxomics)
-        db.session.commit()
-        return (fluxomics, 201)
+            return idempotency.finish(schemas.Job().dump(job), 202)
+
+        ids = insert_measurements(models.Fluxomics, body, upsert)
+        return idempotency.finish([{"id": id} for id in ids], 201)
+
+    @jwt_required
+    @use_kwargs(schemas.FluxomicsBatchUpdateRequest)
+    @marshal_with(schemas.Fluxomics(only=("id",), many=True), 200)
+    def patch(self, body):
+        ids = update_measurements(models.Fluxomics, body)
+        return ([{"id": id} for id in ids], 200)
 
 
 class Fluxomic(MethodResource):
@@ -815,24 +1027,7 @@ class Fluxomic(MethodResource):
         try:
             return (
                 models.Fluxomics.query.filter(models.Fluxomics.id == id)
-                .filter(
-                    models.Fluxomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                    | models.Fluxomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.is_(None)
-                            )
-                        )
-                    )
-                )
+                .filter(visible(models.Fluxomics))
                 .one()
             )
         except NoResultFound:
@@ -843,27 +1038,16 @@ class Fluxomic(MethodResource):
     @marshal_with(schemas.Fluxomics(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            fluxomics = (
-                models.Fluxomics.query.filter(models.Fluxomics.id == id)
-                .filter(
-                    models.Fluxomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            fluxomics, project_id = (
+                with_project(models.Fluxomics)
+                .filter(models.Fluxomics.id == id)
+                .filter(project_visible(models.Fluxomics, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                fluxomics.sample.condition.experiment.project_id, "write"
-            )
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(fluxomics, field, value)
             db.session.add(fluxomics)
@@ -873,51 +1057,32 @@ class Fluxomic(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            fluxomics = (
-                models.Fluxomics.query.filter(models.Fluxomics.id == id)
-                .filter(
-                    models.Fluxomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            fluxomics, project_id = (
+                with_project(models.Fluxomics)
+                .filter(models.Fluxomics.id == id)
+                .filter(project_visible(models.Fluxomics, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                fluxomics.sample.condition.experiment.project_id, "admin"
-            )
+            jwt_require_claim(project_id, "admin")
             db.session.delete(fluxomics)
             db.session.commit()
             return make_response("", 204)
 
 
 class Metabolomics(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.Metabolomics(many=True), 200)
-    def get(self):
-        return models.Metabolomics.query.filter(
-            models.Metabolomics.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
-            )
-            | models.Metabolomics.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        Measurement = models.with_packed(models.Metabolomics, ids)
+        query = (
+            db.session.query(Measurement)
+            .filter(visible(Measurement))
+            .filter(changed_since(Measurement.updated, updated_since))
+        )
+        return filter_ids(query, Measurement, ids)
 
     @jwt_required
     @use_kwargs(schemas.Metabolomics(exclude=("id",)))
@@ -932,12 +1097,15 @@ class Metabolomics(MethodResource):
         uncertainty,
     ):
         try:
-            sample = models.Sample.query.filter(
-                models.Sample.id == sample_id
-            ).one()
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == sample_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {sample_id} does not exist")
+        verify_storage(models.Metabolomics, [sample_id])
         metabolomics = models.Metabolomics(
             sample=sample,
             compound_name=compound_name,
@@ -955,17 +1123,20 @@ class MetabolomicsBatch(MethodResource):
     @jwt_required
     @use_kwargs(schemas.MetabolomicsBatchRequest)
     @marshal_with(schemas.Metabolomics(only=("id",), many=True), 201)
-    def post(self, body):
+    @marshal_with(schemas.Job, 202)
+    def post(self, body, upsert, background):
         sample_ids = set(
             metabolomics_item["sample_id"] for metabolomics_item in body
         )
-        samples = models.Sample.query.filter(
-            models.Sample.id.in_(sample_ids)
-        ).all()
+        samples = (
+            with_project(models.Sample)
+            .filter(models.Sample.id.in_(sample_ids))
+            .all()
+        )
 
         if len(sample_ids) != len(samples):
             missing_sample_ids = sample_ids.difference(
-                set([sample.id for sample in samples])
+                set([sample.id for sample, _ in samples])
             )
             abort(
                 404,
@@ -974,49 +1145,74 @@ class MetabolomicsBatch(MethodResource):
                 f"do not exist",
             )
 
-        for sample in samples:
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+        for _, project_id in samples:
+            jwt_require_claim(project_id, "write")
 
-        metabolomics = [
-            models.Metabolomics(
-                sample_id=metabolomics_item["sample_id"],
-                compound_name=metabolomics_item["compound_name"],
-                compound_identifier=metabolomics_item["compound_identifier"],
-                compound_namespace=metabolomics_item["compound_namespace"],
-                measurement=metabolomics_item["measurement"],
-                uncertainty=metabolomics_item["uncertainty"],
+        replayed = idempotency.begin()
+        if replayed is not None:
+            return replayed
+        if background:
+            job = jobs.submit_import(
+                "metabolomics",
+                body,
+                upsert,
+                {project_id for _, project_id in samples},
+            )
+            return idempotency.finish(schemas.Job().dump(job), 202)
+
+        ids = insert_measurements(models.Metabolomics, body, upsert)
+        return idempotency.finish([{"id": id} for id in ids], 201)
+
+    @jwt_required
+    @use_kwargs(schemas.MetabolomicsBatchUpdateRequest)
+    @marshal_with(schemas.Metabolomics(only=("id",), many=True), 200)
+    def patch(self, body):
+        ids = update_measurements(models.Metabolomics, body)
+        return ([{"id": id} for id in ids], 200)
+
+
+class MetabolomicsPacked(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.MetabolomicsPackRequest)
+    @marshal_with(schemas.Metabolomics(only=("sample_id",), many=True), 201)
+    def post(self, body):
+        """Replace the metabolomics packed for the samples in the request."""
+        sample_ids = set(
+            metabolomics_item["sample_id"] for metabolomics_item in body
+        )
+        samples = (
+            with_project(models.Sample)
+            .filter(models.Sample.id.in_(sample_ids))
+            .all()
+        )
+
+        if len(sample_ids) != len(samples):
+            missing_sample_ids = sample_ids.difference(
+                set([sample.id for sample, _ in samples])
+            )
+            abort(
+                404,
+                f"Related objects: "
+                f"{', '.join(str(sid) for sid in missing_sample_ids)} "
+                f"do not exist",
             )
-            for metabolomics_item in body
-        ]
-        db.session.add_all(metabolomics)
-        db.session.commit()
-        return (metabolomics, 201)
+
+        for _, project_id in samples:
+            jwt_require_claim(project_id, "write")
+
+        sample_ids = pack_measurements(models.PackedMetabolomics, body)
+        return ([{"sample_id": id} for id in sample_ids], 201)
 
 
 class Metabolomic(MethodResource):
     @marshal_with(schemas.Metabolomics, 200)
     def get(self, id):
+        Measurement = models.with_packed(models.Metabolomics, [id])
         try:
             return (
-                models.Metabolomics.query.filter(models.Metabolomics.id == id)
-                .filter(
-                    models.Metabolomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                    | models.Metabolomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.is_(None)
-                            )
-                        )
-                    )
-                )
+                db.session.query(Measurement)
+                .filter(Measurement.id == id)
+                .filter(visible(Measurement))
                 .one()
             )
         except NoResultFound:
@@ -1027,27 +1223,19 @@ class Metabolomic(MethodResource):
     @marshal_with(schemas.Metabolomics(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            metabolomics = (
-                models.Metabolomics.query.filter(models.Metabolomics.id == id)
-                .filter(
-                    models.Metabolomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            metabolomics, project_id = (
+                with_project(models.Metabolomics)
+                .filter(models.Metabolomics.id == id)
+                .filter(project_visible(models.Metabolomics, public=False))
                 .one()
             )
         except NoResultFound:
+            verify_unpacked(models.Metabolomics, id)
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                metabolomics.sample.condition.experiment.project_id, "write"
-            )
+            jwt_require_claim(project_id, "write")
+            if "sample_id" in payload:
+                verify_storage(models.Metabolomics, [payload["sample_id"]])
             for field, value in payload.items():
                 setattr(metabolomics, field, value)
             db.session.add(metabolomics)
@@ -1057,51 +1245,40 @@ class Metabolomic(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            metabolomics = (
-                models.Metabolomics.query.filter(models.Metabolomics.id == id)
-                .filter(
-                    models.Metabolomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            metabolomics, project_id = (
+                with_project(models.Metabolomics)
+                .filter(models.Metabolomics.id == id)
+                .filter(project_visible(models.Metabolomics, public=False))
                 .one()
             )
         except NoResultFound:
+            verify_unpacked(models.Metabolomics, id)
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                metabolomics.sample.condition.experiment.project_id, "admin"
-            )
+            jwt_require_claim(project_id, "admin")
             db.session.delete(metabolomics)
             db.session.commit()
             return make_response("", 204)
 
 
 class Proteomics(MethodResource):
+    @use_kwargs(schemas.ProteomicsFilter, locations=("query",))
     @marshal_with(schemas.Proteomics(many=True), 200)
-    def get(self):
-        return models.Proteomics.query.filter(
-            models.Proteomics.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
-            )
-            | models.Proteomics.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
+    def get(self, updated_since, ids, gene, gene_keys):
+        Measurement = models.with_packed(models.Proteomics, ids)
+        query = (
+            db.session.query(Measurement)
+            .filter(visible(Measurement))
+            .filter(changed_since(Measurement.updated, updated_since))
+        )
+        # Both filters are served by the GIN index of the genes.
+        if gene:
+            query = query.filter(Measurement.gene.contains(dict(gene)))
+        if gene_keys:
+            query = query.filter(
+                Measurement.gene.has_all(postgresql.array(gene_keys))
             )
-        ).all()
+        return filter_ids(query, Measurement, ids)
 
     @jwt_required
     @use_kwargs(schemas.Proteomics(exclude=("id",)))
@@ -1117,12 +1294,15 @@ class Proteomics(MethodResource):
         uncertainty,
     ):
         try:
-            sample = models.Sample.query.filter(
-                models.Sample.id == sample_id
-            ).one()
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == sample_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {sample_id} does not exist")
+        verify_storage(models.Proteomics, [sample_id])
         proteomics = models.Proteomics(
             sample=sample,
             identifier=identifier,
@@ -1141,17 +1321,20 @@ class ProteomicsBatch(MethodResource):
     @jwt_required
     @use_kwargs(schemas.ProteomicsBatchRequest)
     @marshal_with(schemas.Proteomics(only=("id",), many=True), 201)
-    def post(self, body):
+    @marshal_with(schemas.Job, 202)
+    def post(self, body, upsert, background):
         sample_ids = set(
             proteomics_item["sample_id"] for proteomics_item in body
         )
-        samples = models.Sample.query.filter(
-            models.Sample.id.in_(sample_ids)
-        ).all()
+        samples = (
+            with_project(models.Sample)
+            .filter(models.Sample.id.in_(sample_ids))
+            .all()
+        )
 
         if len(sample_ids) != len(samples):
             missing_sample_ids = sample_ids.difference(
-                set([sample.id for sample in samples])
+                set([sample.id for sample, _ in samples])
             )
             abort(
                 404,
@@ -1160,50 +1343,74 @@ class ProteomicsBatch(MethodResource):
                 f"do not exist",
             )
 
-        for sample in samples:
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+        for _, project_id in samples:
+            jwt_require_claim(project_id, "write")
 
-        proteomics = [
-            models.Proteomics(
-                sample_id=proteomics_item["sample_id"],
-                identifier=proteomics_item["identifier"],
-                name=proteomics_item["name"],
-                full_name=proteomics_item["full_name"],
-                gene=proteomics_item["gene"],
-                measurement=proteomics_item["measurement"],
-                uncertainty=proteomics_item["uncertainty"],
+        replayed = idempotency.begin()
+        if replayed is not None:
+            return replayed
+        if background:
+            job = jobs.submit_import(
+                "proteomics",
+                body,
+                upsert,
+                {project_id for _, project_id in samples},
             )
-            for proteomics_item in body
-        ]
-        db.session.add_all(proteomics)
-        db.session.commit()
-        return (proteomics, 201)
+            return idempotency.finish(schemas.Job().dump(job), 202)
+
+        ids = insert_measurements(models.Proteomics, body, upsert)
+        return idempotency.finish([{"id": id} for id in ids], 201)
+
+    @jwt_required
+    @use_kwargs(schemas.ProteomicsBatchUpdateRequest)
+    @marshal_with(schemas.Proteomics(only=("id",), many=True), 200)
+    def patch(self, body):
+        ids = update_measurements(models.Proteomics, body)
+        return ([{"id": id} for id in ids], 200)
+
+
+class ProteomicsPacked(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.ProteomicsPackRequest)
+    @marshal_with(schemas.Proteomics(only=("sample_id",), many=True), 201)
+    def post(self, body):
+        """Replace the proteomics packed for the samples in the request."""
+        sample_ids = set(
+            proteomics_item["sample_id"] for proteomics_item in body
+        )
+        samples = (
+            with_project(models.Sample)
+            .filter(models.Sample.id.in_(sample_ids))
+            .all()
+        )
+
+        if len(sample_ids) != len(samples):
+            missing_sample_ids = sample_ids.difference(
+                set([sample.id for sample, _ in samples])
+            )
+            abort(
+                404,
+                f"Related objects: "
+                f"{', '.join(str(sid) for sid in missing_sample_ids)} "
+                f"do not exist",
+            )
+
+        for _, project_id in samples:
+            jwt_require_claim(project_id, "write")
+
+        sample_ids = pack_measurements(models.PackedProteomics, body)
+        return ([{"sample_id": id} for id in sample_ids], 201)
 
 
 class Proteomic(MethodResource):
     @marshal_with(schemas.Proteomics, 200)
     def get(self, id):
+        Measurement = models.with_packed(models.Proteomics, [id])
         try:
             return (
-                models.Proteomics.query.filter(models.Proteomics.id == id)
-                .filter(
-                    models.Proteomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                    | models.Proteomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.is_(None)
-                            )
-                        )
-                    )
-                )
+                db.session.query(Measurement)
+                .filter(Measurement.id == id)
+                .filter(visible(Measurement))
                 .one()
             )
         except NoResultFound:
@@ -1214,27 +1421,19 @@ class Proteomic(MethodResource):
     @marshal_with(schemas.Proteomics(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            proteomics = (
-                models.Proteomics.query.filter(models.Proteomics.id == id)
-                .filter(
-                    models.Proteomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            proteomics, project_id = (
+                with_project(models.Proteomics)
+                .filter(models.Proteomics.id == id)
+                .filter(project_visible(models.Proteomics, public=False))
                 .one()
             )
         except NoResultFound:
+            verify_unpacked(models.Proteomics, id)
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                proteomics.sample.condition.experiment.project_id, "write"
-            )
+            jwt_require_claim(project_id, "write")
+            if "sample_id" in payload:
+                verify_storage(models.Proteomics, [payload["sample_id"]])
             for field, value in payload.items():
                 setattr(proteomics, field, value)
             db.session.add(proteomics)
@@ -1244,51 +1443,32 @@ class Proteomic(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            proteomics = (
-                models.Proteomics.query.filter(models.Proteomics.id == id)
-                .filter(
-                    models.Proteomics.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            proteomics, project_id = (
+                with_project(models.Proteomics)
+                .filter(models.Proteomics.id == id)
+                .filter(project_visible(models.Proteomics, public=False))
                 .one()
             )
         except NoResultFound:
+            verify_unpacked(models.Proteomics, id)
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                proteomics.sample.condition.experiment.project_id, "admin"
-            )
+            jwt_require_claim(project_id, "admin")
             db.session.delete(proteomics)
             db.session.commit()
             return make_response("", 204)
 
 
 class UptakeSecretionRates(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.UptakeSecretionRates(many=True), 200)
-    def get(self):
-        return models.UptakeSecretionRates.query.filter(
-            models.UptakeSecretionRates.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
-            )
-            | models.UptakeSecretionRates.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.UptakeSecretionRates.query.filter(
+            visible(models.UptakeSecretionRates)
+        ).filter(
+            changed_since(models.UptakeSecretionRates.updated, updated_since)
+        )
+        return filter_ids(query, models.UptakeSecretionRates, ids)
 
     @jwt_required
     @use_kwargs(schemas.UptakeSecretionRates(exclude=("id",)))
@@ -1303,10 +1483,12 @@ class UptakeSecretionRates(MethodResource):
         uncertainty,
     ):
         try:
-            sample = models.Sample.query.filter(
-                models.Sample.id == sample_id
-            ).one()
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == sample_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {sample_id} does not exist")
         uptake_secretion_rate = models.UptakeSecretionRates(
@@ -1322,6 +1504,15 @@ class UptakeSecretionRates(MethodResource):
         return (uptake_secretion_rate, 201)
 
 
+class UptakeSecretionRatesBatch(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.UptakeSecretionRatesBatchUpdateRequest)
+    @marshal_with(schemas.UptakeSecretionRates(only=("id",), many=True), 200)
+    def patch(self, body):
+        ids = update_measurements(models.UptakeSecretionRates, body)
+        return ([{"id": id} for id in ids], 200)
+
+
 class UptakeSecretionRate(MethodResource):
     @marshal_with(schemas.UptakeSecretionRates, 200)
     def get(self, id):
@@ -1330,24 +1521,7 @@ class UptakeSecretionRate(MethodResource):
                 models.UptakeSecretionRates.query.filter(
                     models.UptakeSecretionRates.id == id
                 )
-                .filter(
-                    models.UptakeSecretionRates.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                    | models.UptakeSecretionRates.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.is_(None)
-                            )
-                        )
-                    )
-                )
+                .filter(visible(models.UptakeSecretionRates))
                 .one()
             )
         except NoResultFound:
@@ -1358,30 +1532,18 @@ class UptakeSecretionRate(MethodResource):
     @marshal_with(schemas.UptakeSecretionRates(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            uptake_secretion_rate = (
-                models.UptakeSecretionRates.query.filter(
-                    models.UptakeSecretionRates.id == id
-                )
+            uptake_secretion_rate, project_id = (
+                with_project(models.UptakeSecretionRates)
+                .filter(models.UptakeSecretionRates.id == id)
                 .filter(
-                    models.UptakeSecretionRates.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
+                    project_visible(models.UptakeSecretionRates, public=False)
                 )
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                uptake_secretion_rate.sample.condition.experiment.project_id,
-                "write",
-            )
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(uptake_secretion_rate, field, value)
             db.session.add(uptake_secretion_rate)
@@ -1391,54 +1553,31 @@ class UptakeSecretionRate(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            uptake_secretion_rate = (
-                models.UptakeSecretionRates.query.filter(
-                    models.UptakeSecretionRates.id == id
-                )
+            uptake_secretion_rate, project_id = (
+                with_project(models.UptakeSecretionRates)
+                .filter(models.UptakeSecretionRates.id == id)
                 .filter(
-                    models.UptakeSecretionRates.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
+                    project_visible(models.UptakeSecretionRates, public=False)
                 )
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                uptake_secretion_rate.sample.condition.experiment.project_id,
-                "admin",
-            )
+            jwt_require_claim(project_id, "admin")
             db.session.delete(uptake_secretion_rate)
             db.session.commit()
             return make_response("", 204)
 
 
 class MolarYields(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.MolarYields(many=True), 200)
-    def get(self):
-        return models.MolarYields.query.filter(
-            models.MolarYields.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
-            )
-            | models.MolarYields.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.MolarYields.query.filter(
+            visible(models.MolarYields)
+        ).filter(changed_since(models.MolarYields.updated, updated_since))
+        return filter_ids(query, models.MolarYields, ids)
 
     @jwt_required
     @use_kwargs(schemas.MolarYields(exclude=("id",)))
@@ -1456,10 +1595,12 @@ class MolarYields(MethodResource):
         uncertainty,
     ):
         try:
-            sample = models.Sample.query.filter(
-                models.Sample.id == sample_id
-            ).one()
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == sample_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {sample_id} does not exist")
         molar_yield = models.MolarYields(
@@ -1478,30 +1619,22 @@ class MolarYields(MethodResource):
         return (molar_yield, 201)
 
 
+class MolarYieldsBatch(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.MolarYieldsBatchUpdateRequest)
+    @marshal_with(schemas.MolarYields(only=("id",), many=True), 200)
+    def patch(self, body):
+        ids = update_measurements(models.MolarYields, body)
+        return ([{"id": id} for id in ids], 200)
+
+
 class MolarYield(MethodResource):
     @marshal_with(schemas.MolarYields, 200)
     def get(self, id):
         try:
             return (
                 models.MolarYields.query.filter(models.MolarYields.id == id)
-                .filter(
-                    models.MolarYields.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                    | models.MolarYields.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.is_(None)
-                            )
-                        )
-                    )
-                )
+                .filter(visible(models.MolarYields))
                 .one()
             )
         except NoResultFound:
@@ -1512,27 +1645,16 @@ class MolarYield(MethodResource):
     @marshal_with(schemas.MolarYields(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            molar_yield = (
-                models.MolarYields.query.filter(models.MolarYields.id == id)
-                .filter(
-                    models.MolarYields.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            molar_yield, project_id = (
+                with_project(models.MolarYields)
+                .filter(models.MolarYields.id == id)
+                .filter(project_visible(models.MolarYields, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                molar_yield.sample.condition.experiment.project_id, "write"
-            )
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(molar_yield, field, value)
             db.session.add(molar_yield)
@@ -1542,61 +1664,41 @@ class MolarYield(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            molar_yield = (
-                models.MolarYields.query.filter(models.MolarYields.id == id)
-                .filter(
-                    models.MolarYields.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            molar_yield, project_id = (
+                with_project(models.MolarYields)
+                .filter(models.MolarYields.id == id)
+                .filter(project_visible(models.MolarYields, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                molar_yield.sample.condition.experiment.project_id, "admin"
-            )
+            jwt_require_claim(project_id, "admin")
             db.session.delete(molar_yield)
             db.session.commit()
             return make_response("", 204)
 
 
 class GrowthRates(MethodResource):
+    @use_kwargs(schemas.CollectionFilter, locations=("query",))
     @marshal_with(schemas.GrowthRate(many=True), 200)
-    def get(self):
-        return models.Growth.query.filter(
-            models.Growth.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.in_(g.jwt_claims["prj"])
-                    )
-                )
-            )
-            | models.Growth.sample.has(
-                models.Sample.condition.has(
-                    models.Condition.experiment.has(
-                        models.Experiment.project_id.is_(None)
-                    )
-                )
-            )
-        ).all()
+    def get(self, updated_since, ids):
+        query = models.Growth.query.filter(visible(models.Growth)).filter(
+            changed_since(models.Growth.updated, updated_since)
+        )
+        return filter_ids(query, models.Growth, ids)
 
     @jwt_required
     @use_kwargs(schemas.GrowthRate(exclude=("id",)))
     @marshal_with(schemas.GrowthRate(only=("id",)), 201)
     def post(self, sample_id, measurement, uncertainty):
         try:
-            sample = models.Sample.query.filter(
-                models.Sample.id == sample_id
-            ).one()
-            jwt_require_claim(sample.condition.experiment.project_id, "write")
+            sample, project_id = (
+                with_project(models.Sample)
+                .filter(models.Sample.id == sample_id)
+                .one()
+            )
+            jwt_require_claim(project_id, "write")
         except NoResultFound:
             abort(404, f"Related object {sample_id} does not exist")
         growth_rate = models.Growth(
@@ -1607,30 +1709,22 @@ class GrowthRates(MethodResource):
         return (growth_rate, 201)
 
 
+class GrowthRatesBatch(MethodResource):
+    @jwt_required
+    @use_kwargs(schemas.GrowthRateBatchUpdateRequest)
+    @marshal_with(schemas.GrowthRate(only=("id",), many=True), 200)
+    def patch(self, body):
+        ids = update_measurements(models.Growth, body)
+        return ([{"id": id} for id in ids], 200)
+
+
 class GrowthRate(MethodResource):
     @marshal_with(schemas.GrowthRate, 200)
     def get(self, id):
         try:
             return (
                 models.Growth.query.filter(models.Growth.id == id)
-                .filter(
-                    models.Growth.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                    | models.Growth.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.is_(None)
-                            )
-                        )
-                    )
-                )
+                .filter(visible(models.Growth))
                 .one()
             )
         except NoResultFound:
@@ -1641,27 +1735,16 @@ class GrowthRate(MethodResource):
     @marshal_with(schemas.GrowthRate(only=("id",)), 200)
     def put(self, id, **payload):
         try:
-            growth_rate = (
-                models.Growth.query.filter(models.Growth.id == id)
-                .filter(
-                    models.Growth.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            growth_rate, project_id = (
+                with_project(models.Growth)
+                .filter(models.Growth.id == id)
+                .filter(project_visible(models.Growth, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                growth_rate.sample.condition.experiment.project_id, "write"
-            )
+            jwt_require_claim(project_id, "write")
             for field, value in payload.items():
                 setattr(growth_rate, field, value)
             db.session.add(growth_rate)
@@ -1671,27 +1754,96 @@ class GrowthRate(MethodResource):
     @jwt_required
     def delete(self, id):
         try:
-            growth_rate = (
-                models.Growth.query.filter(models.Growth.id == id)
-                .filter(
-                    models.Growth.sample.has(
-                        models.Sample.condition.has(
-                            models.Condition.experiment.has(
-                                models.Experiment.project_id.in_(
-                                    g.jwt_claims["prj"]
-                                )
-                            )
-                        )
-                    )
-                )
+            growth_rate, project_id = (
+                with_project(models.Growth)
+                .filter(models.Growth.id == id)
+                .filter(project_visible(models.Growth, public=False))
                 .one()
             )
         except NoResultFound:
             abort(404, f"Cannot find object with id {id}")
         else:
-            jwt_require_claim(
-                growth_rate.sample.condition.experiment.project_id, "admin"
-            )
+            jwt_require_claim(project_id, "admin")
             db.session.delete(growth_rate)
             db.session.commit()
             return make_response("", 204)
+
+
+class Search(MethodResource):
+    @use_kwargs(schemas.TextSearch, locations=("query",))
+    @marshal_with(schemas.SearchHit(many=True), 200)
+    def get(self, q, types, limit):
+        """Return the objects with names, genotypes or descriptions matching."""
+        return search.search_text(q, types, limit)
+
+
+class MeasurementSearch(MethodResource):
+    @use_kwargs(schemas.MeasurementSearch, locations=("query",))
+    @marshal_with(schemas.MeasurementSearchPage, 200)
+    def get(self, types, **kwargs):
+        """Return the measurements of an entity across experiments."""
+        return search.search_measurements(types, **kwargs)
+
+
+class Tombstones(MethodResource):
+    @use_kwargs(schemas.TombstoneRequest, locations=("query",))
+    @marshal_with(schemas.TombstonePage, 200)
+    def get(self, updated_since, after, limit):
+        query = models.Tombstone.query.filter(visible(models.Tombstone)).filter(
+            changed_since(models.Tombstone.deleted, updated_since)
+        )
+        if after is not None:
+            query = query.filter(models.Tombstone.id > after)
+        # Fetch one more tombstone to tell whether there is another page.
+        page = query.order_by(models.Tombstone.id).limit(limit + 1).all()
+        next_after = page[limit - 1].id if len(page) > limit else None
+        return {"tombstones": page[:limit], "next": next_after}
+
+
+class Job(MethodResource):
+    @marshal_with(schemas.Job, 200)
+    def get(self, id):
+        try:
+            return (
+                models.Job.query.filter(models.Job.id == id)
+                .filter(jobs.visible_jobs())
+                .one()
+            )
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+
+
+class JobResult(MethodResource):
+    def get(self, id):
+        """Respond like the request run by the job, once it is finished."""
+        try:
+            job = (
+                models.Job.query.filter(models.Job.id == id)
+                .filter(jobs.visible_jobs())
+                .one()
+            )
+        except NoResultFound:
+            abort(404, f"Cannot find object with id {id}")
+        if job.status_code is None:
+            abort(404, f"Job {id} is {job.status} and has no result yet")
+        # The result may be large; it is streamed as stored.
+        return Response(
+            stream_with_context(jobs.result_chunks(id)),
+            status=job.status_code,
+            mimetype="application/json",
+        )
+
+
+class Changes(MethodResource):
+    def get(self):
+        """Stream the changes visible to the caller as server-sent events."""
+        listener = current_app.extensions["change_listener"]
+        # The stream outlives the request context; read the claims now.
+        stream = listener.stream(
+            claims=set(g.jwt_claims["prj"]), expires=g.jwt_claims.get("exp")
+        )
+        return Response(
+            stream,
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
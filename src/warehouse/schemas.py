@@ -13,10 +13,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from marshmallow import Schema, fields
+from copy import copy
+
+from marshmallow import (
+    Schema,
+    ValidationError,
+    fields,
+    validate,
+    validates_schema,
+)
 from webargs.fields import DelimitedList
 
 
+def _updates(schema_class):
+    """Nest a list of partial measurement updates identified by their id."""
+    # The `partial` option of nested schemas is overridden by the parent
+    # schema's, so create a schema with optional fields instead.
+    update_fields = {"id": fields.Integer(required=True)}
+    for name, field in schema_class._declared_fields.items():
+        if name not in ("id", "sample_id"):
+            update_fields[name] = copy(field)
+            update_fields[name].required = False
+    update_schema = Schema.from_dict(
+        update_fields, name=f"{schema_class.__name__}Update"
+    )
+    return DelimitedList(fields.Nested(update_schema))
+
+
 class Organism(Schema):
     id = fields.Integer(required=True)
     project_id = fields.Integer(required=True)
@@ -39,6 +62,29 @@ class Experiment(Schema):
     description = fields.String(required=True)
 
 
+class StrainLineage(Strain):
+    # The number of generations between this and the requested strain.
+    depth = fields.Integer(required=True)
+    # The genotypes of the strains leading from the older to the younger of
+    # the two strains, i.e., the accumulated genotype changes, oldest first.
+    genotypes = fields.List(fields.String(), required=True)
+
+
+class LineageDepth(Schema):
+    # Limit the lineage to the given number of generations.
+    max_depth = fields.Integer(missing=None, validate=validate.Range(min=1))
+
+
+class StrainIds(Schema):
+    ids = DelimitedList(fields.Integer(), required=True)
+
+
+class ExperimentClone(Schema):
+    # The clone is placed in the project of the experiment by default.
+    project_id = fields.Integer(missing=None)
+    name = fields.String(missing=None)
+
+
 class Medium(Schema):
     id = fields.Integer(required=True)
     project_id = fields.Integer(required=True)
@@ -86,6 +132,14 @@ class Fluxomics(Schema):
 
 class FluxomicsBatchRequest(Schema):
     body = DelimitedList(fields.Nested(Fluxomics(exclude=("id",))))
+    # Update existing measurements with the same natural key instead of failing.
+    upsert = fields.Boolean(missing=False)
+    # Insert the measurements in a background job, see `Job`.
+    background = fields.Boolean(missing=False)
+
+
+class FluxomicsBatchUpdateRequest(Schema):
+    body = _updates(Fluxomics)
 
 
 class Metabolomics(Schema):
@@ -100,6 +154,18 @@ class Metabolomics(Schema):
 
 class MetabolomicsBatchRequest(Schema):
     body = DelimitedList(fields.Nested(Metabolomics(exclude=("id",))))
+    # Update existing measurements with the same natural key instead of failing.
+    upsert = fields.Boolean(missing=False)
+    # Insert the measurements in a background job, see `Job`.
+    background = fields.Boolean(missing=False)
+
+
+class MetabolomicsBatchUpdateRequest(Schema):
+    body = _updates(Metabolomics)
+
+
+class MetabolomicsPackRequest(Schema):
+    body = DelimitedList(fields.Nested(Metabolomics(exclude=("id",))))
 
 
 class Proteomics(Schema):
@@ -115,6 +181,18 @@ class Proteomics(Schema):
 
 class ProteomicsBatchRequest(Schema):
     body = DelimitedList(fields.Nested(Proteomics(exclude=("id",))))
+    # Update existing measurements with the same natural key instead of failing.
+    upsert = fields.Boolean(missing=False)
+    # Insert the measurements in a background job, see `Job`.
+    background = fields.Boolean(missing=False)
+
+
+class ProteomicsBatchUpdateRequest(Schema):
+    body = _updates(Proteomics)
+
+
+class ProteomicsPackRequest(Schema):
+    body = DelimitedList(fields.Nested(Proteomics(exclude=("id",))))
 
 
 class UptakeSecretionRates(Schema):
@@ -129,6 +207,10 @@ class UptakeSecretionRates(Schema):
     )  # unit: mmol/gDW/h
 
 
+class UptakeSecretionRatesBatchUpdateRequest(Schema):
+    body = _updates(UptakeSecretionRates)
+
+
 class MolarYields(Schema):
     id = fields.Integer(required=True)
     sample_id = fields.Integer(required=True)
@@ -143,6 +225,10 @@ class MolarYields(Schema):
     uncertainty = fields.Float(required=True, allow_none=True)
 
 
+class MolarYieldsBatchUpdateRequest(Schema):
+    body = _updates(MolarYields)
+
+
 class GrowthRate(Schema):
     id = fields.Integer(required=True)
     sample_id = fields.Integer(required=True)
@@ -151,6 +237,279 @@ class GrowthRate(Schema):
     uncertainty = fields.Float(required=True)
 
 
+class GrowthRateBatchUpdateRequest(Schema):
+    body = _updates(GrowthRate)
+
+
+class UpdatedSince(Schema):
+    # Only include objects created, updated or deleted since the given time.
+    # The times are taken when rows are written rather than committed; see the
+    # margin to subtract in the README.
+    updated_since = fields.DateTime(missing=None)
+
+
+class CollectionFilter(UpdatedSince):
+    # Only include the objects with the given ids, e.g., `ids=1,2,3`.
+    ids = DelimitedList(fields.Integer(), missing=None)
+
+
+class KeyValue(fields.String):
+    """A `key:value` pair, deserialized to a tuple."""
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        key, separator, value = (
+            super()._deserialize(value, attr, data, **kwargs).partition(":")
+        )
+        if not separator:
+            raise ValidationError("Expected a pair of the form `key:value`.")
+        return key, value
+
+
+class ProteomicsFilter(CollectionFilter):
+    # Only include proteomics of genes with all of the given properties, e.g.,
+    # `gene=locus_tag:b0001`, and with all of the given keys.
+    gene = DelimitedList(KeyValue(), missing=[])
+    gene_keys = DelimitedList(fields.String(), missing=[])
+
+
+class Tombstone(Schema):
+    id = fields.Integer(required=True)
+    resource = fields.String(required=True)
+    object_id = fields.Integer(required=True)
+    deleted = fields.DateTime(required=True)
+
+
+class TombstoneRequest(UpdatedSince):
+    # The `next` value of the previous page.
+    after = fields.Integer(missing=None)
+    # The number of tombstones per page.
+    limit = fields.Integer(
+        missing=1000, validate=validate.Range(min=1, max=10000)
+    )
+
+
+class TombstonePage(Schema):
+    # The tombstones of the directly deleted objects; the objects deleted
+    # along with them, e.g., the samples of an experiment, are not recorded.
+    tombstones = fields.Nested(Tombstone, many=True, required=True)
+    # Pass as `after` to request the next page; absent on the last page.
+    next = fields.Integer(required=True, allow_none=True)
+
+
+class Job(Schema):
+    id = fields.Integer(required=True)
+    kind = fields.String(required=True)
+    # One of `pending`, `running`, `done` and `failed`; the response of a
+    # finished job is at `/jobs/<id>/result`.
+    status = fields.String(required=True)
+    progress = fields.Integer(required=True)
+    total = fields.Integer(required=True, allow_none=True)
+    created = fields.DateTime(required=True)
+    updated = fields.DateTime(required=True)
+
+
+MEASUREMENT_TYPES = [
+    "fluxomics",
+    "metabolomics",
+    "proteomics",
+    "uptake_secretion_rates",
+    "molar_yields",
+    "growth_rates",
+]
+
+
+class MeasurementTypes(Schema):
+    types = DelimitedList(
+        fields.String(validate=validate.OneOf(MEASUREMENT_TYPES)),
+        missing=MEASUREMENT_TYPES,
+    )
+
+
+class MeasurementMatrix(Schema):
+    measurement_type = fields.String(
+        data_key="type",
+        required=True,
+        validate=validate.OneOf(["fluxomics", "metabolomics", "proteomics"]),
+    )
+    # Return the coordinates and values of the measurements instead of a
+    # dense matrix.
+    sparse = fields.Boolean(missing=False)
+    encoding = fields.String(
+        data_key="format",
+        missing="json",
+        validate=validate.OneOf(["json", "npz"]),
+    )
+
+
+class TimeSeriesRequest(Schema):
+    measurement_type = fields.String(
+        data_key="type",
+        required=True,
+        validate=validate.OneOf(
+            [
+                "fluxomics",
+                "metabolomics",
+                "proteomics",
+                "uptake_secretion_rates",
+                "growth_rates",
+            ]
+        ),
+    )
+    # The measured entity; proteins are identified without a namespace and
+    # growth rates do not measure an entity.
+    namespace = fields.String(missing=None)
+    identifier = fields.String(missing=None)
+    # Only include samples started within the given time window.
+    start = fields.DateTime(missing=None)
+    end = fields.DateTime(missing=None)
+    # Average the measurements within at most this many equal time intervals.
+    buckets = fields.Integer(missing=None, validate=validate.Range(min=1))
+
+    @validates_schema
+    def validate_entity(self, data, **kwargs):
+        measurement_type = data["measurement_type"]
+        if measurement_type != "growth_rates" and data["identifier"] is None:
+            raise ValidationError(
+                f"An identifier is required for {measurement_type}.",
+                "identifier",
+            )
+        if (
+            measurement_type not in ("proteomics", "growth_rates")
+            and data["namespace"] is None
+        ):
+            raise ValidationError(
+                f"A namespace is required for {measurement_type}.", "namespace",
+            )
+
+
+class TimeSeriesPoint(Schema):
+    start_time = fields.DateTime(required=True)
+    end_time = fields.DateTime(required=True, allow_none=True)
+    measurement = fields.Float(required=True)
+    uncertainty = fields.Float(required=True, allow_none=True)
+    # The number of measurements averaged in the point.
+    count = fields.Integer(required=True)
+
+
+SEARCHABLE_TYPES = [
+    "fluxomics",
+    "metabolomics",
+    "proteomics",
+    "uptake_secretion_rates",
+    "molar_yields",
+]
+
+
+class MeasurementSearch(Schema):
+    identifier = fields.String(required=True)
+    # Match the identifier in any namespace if omitted.
+    namespace = fields.String(missing=None)
+    types = DelimitedList(
+        fields.String(validate=validate.OneOf(SEARCHABLE_TYPES)),
+        missing=SEARCHABLE_TYPES,
+    )
+    # The `next` value of the previous page.
+    after = fields.Integer(missing=None)
+    # The number of conditions per page.
+    limit = fields.Integer(missing=20, validate=validate.Range(min=1, max=100))
+
+
+DOCUMENT_TYPES = [
+    "organism",
+    "strain",
+    "experiment",
+    "sample",
+    "medium_compound",
+    "proteomics",
+]
+
+
+class TextSearch(Schema):
+    # Words to find by prefix in names, genotypes and descriptions.
+    q = fields.String(required=True)
+    types = DelimitedList(
+        fields.String(validate=validate.OneOf(DOCUMENT_TYPES)),
+        missing=DOCUMENT_TYPES,
+    )
+    limit = fields.Integer(missing=20, validate=validate.Range(min=1, max=100))
+
+
+class SearchHit(Schema):
+    type = fields.String(required=True)
+    id = fields.Integer(required=True)
+    rank = fields.Float(required=True)
+
+
+class MeasurementCounts(Schema):
+    fluxomics = fields.Integer()
+    metabolomics = fields.Integer()
+    proteomics = fields.Integer()
+    uptake_secretion_rates = fields.Integer()
+    molar_yields = fields.Integer()
+    growth_rates = fields.Integer()
+
+
+class Statistics(Schema):
+    # Aggregates of the values of the grouped measurements.
+    count = fields.Integer(required=True)
+    mean = fields.Float(required=True)
+    # The sample standard deviation; undefined for a single measurement.
+    stddev = fields.Float(required=True, allow_none=True)
+    min = fields.Float(required=True)
+    max = fields.Float(required=True)
+    # The uncertainty of the mean, propagated from those of the measurements.
+    uncertainty = fields.Float(required=True, allow_none=True)
+
+
+def _statistics(schema_class, names):
+    """Nest statistics grouped by the given fields of a measurement schema."""
+    group_fields = {
+        name: copy(schema_class._declared_fields[name]) for name in names
+    }
+    statistics_schema = Statistics.from_dict(
+        group_fields, name=f"{schema_class.__name__}Statistics"
+    )
+    return fields.Nested(statistics_schema, many=True)
+
+
+class MeasurementStatistics(Schema):
+    fluxomics = _statistics(
+        Fluxomics,
+        ("reaction_name", "reaction_identifier", "reaction_namespace"),
+    )
+    metabolomics = _statistics(
+        Metabolomics,
+        ("compound_name", "compound_identifier", "compound_namespace"),
+    )
+    proteomics = _statistics(Proteomics, ("identifier", "name", "full_name"))
+    uptake_secretion_rates = _statistics(
+        UptakeSecretionRates,
+        ("compound_name", "compound_identifier", "compound_namespace"),
+    )
+    molar_yields = _statistics(
+        MolarYields,
+        (
+            "product_name",
+            "product_identifier",
+            "product_namespace",
+            "substrate_name",
+            "substrate_identifier",
+            "substrate_namespace",
+        ),
+    )
+    growth_rates = _statistics(GrowthRate, ())
+
+
+class ConditionStatistics(MeasurementStatistics):
+    condition_id = fields.Integer(required=True)
+
+
+class ExperimentStatistics(MeasurementStatistics):
+    # The statistics of the measurements of all conditions of the experiment.
+    experiment_id = fields.Integer(required=True)
+    conditions = fields.Nested(ConditionStatistics, many=True, required=True)
+
+
 # Schemas below include full relation objects across foreign keys in the models.
 
 
@@ -165,6 +524,22 @@ class SampleData(Sample):
     growth_rate = fields.Nested(GrowthRate, required=True)
 
 
+class ConditionMatches(Schema):
+    condition_id = fields.Integer(required=True)
+    experiment_id = fields.Integer(required=True)
+    fluxomics = fields.Nested(Fluxomics, many=True)
+    metabolomics = fields.Nested(Metabolomics, many=True)
+    proteomics = fields.Nested(Proteomics, many=True)
+    uptake_secretion_rates = fields.Nested(UptakeSecretionRates, many=True)
+    molar_yields = fields.Nested(MolarYields, many=True)
+
+
+class MeasurementSearchPage(Schema):
+    conditions = fields.Nested(ConditionMatches, many=True, required=True)
+    # Pass as `after` to request the next page; absent on the last page.
+    next = fields.Integer(required=True, allow_none=True)
+
+
 class MediumData(Medium):
     compounds = fields.Nested(MediumCompound, many=True, required=True)
 
@@ -177,3 +552,108 @@ class ConditionData(Condition):
 
 class ExperimentData(Experiment):
     conditions = fields.Nested(ConditionData, many=True, required=True)
+
+
+# The relations of conditions and of their samples which may be left out of
+# their data.
+CONDITION_RELATIONS = ["strain", "medium"]
+SAMPLE_RELATIONS = [
+    "fluxomics",
+    "metabolomics",
+    "proteomics",
+    "uptake_secretion_rates",
+    "molar_yields",
+    "growth_rate",
+]
+
+
+def data_schema(schema_class, include, only=None):
+    """
+    Create a schema serializing part of the data of experiments or conditions.
+
+    :param schema_class: `ExperimentData` or `ConditionData`
+    :param include: The relations of conditions and samples to include, see
+        `CONDITION_RELATIONS` and `SAMPLE_RELATIONS`
+    :param only: The fields to include as dotted paths, e.g.,
+        `samples.growth_rate.measurement`, or `None` to include all fields
+    """
+    prefix = "conditions." if schema_class is ExperimentData else ""
+    exclude = [
+        f"{prefix}{relation}"
+        for relation in CONDITION_RELATIONS
+        if relation not in include
+    ] + [
+        f"{prefix}samples.{relation}"
+        for relation in SAMPLE_RELATIONS
+        if relation not in include
+    ]
+    return schema_class(only=only, exclude=exclude)
+
+
+def data_relations(schema):
+    """
+    Return the relations serialized by a schema created with `data_schema`.
+
+    :raises ValueError: If the schema names fields its nested schemas lack,
+        which marshmallow only checks once they are bound
+    :return: A set of the names of the relations, i.e., `conditions` for
+        experiments, `samples`, `compounds` of media and those of
+        `CONDITION_RELATIONS` and `SAMPLE_RELATIONS`
+    """
+    relations = set()
+    if isinstance(schema, ExperimentData):
+        if "conditions" not in schema.fields:
+            return relations
+        relations.add("conditions")
+        schema = schema.fields["conditions"].schema
+    relations.update(
+        relation
+        for relation in CONDITION_RELATIONS
+        if relation in schema.fields
+    )
+    if "medium" in relations and (
+        "compounds" in schema.fields["medium"].schema.fields
+    ):
+        relations.add("compounds")
+    if "samples" in schema.fields:
+        relations.add("samples")
+        sample_fields = schema.fields["samples"].schema.fields
+        relations.update(
+            relation
+            for relation in SAMPLE_RELATIONS
+            if relation in sample_fields
+        )
+    return relations
+
+
+class DataRequest(UpdatedSince):
+    # The schema of the requested data, see `data_schema`.
+    DATA = None
+
+    # Only include the given relations of conditions and samples, e.g.,
+    # `include=fluxomics,growth_rate`; all of them by default.
+    include = DelimitedList(
+        fields.String(
+            validate=validate.OneOf(CONDITION_RELATIONS + SAMPLE_RELATIONS)
+        ),
+        missing=CONDITION_RELATIONS + SAMPLE_RELATIONS,
+    )
+    # Only include the given fields, e.g., `fields=id,samples.growth_rate`.
+    only = DelimitedList(fields.String(), data_key="fields", missing=None)
+
+    @validates_schema
+    def validate_only(self, data, **kwargs):
+        try:
+            data_relations(
+                data_schema(self.DATA, data["include"], data["only"])
+            )
+        except ValueError as error:
+            raise ValidationError(str(error), "fields")
+
+
+class ExperimentDataRequest(DataRequest):
+    DATA = ExperimentData
+
+
+class ConditionDataRequest(DataRequest):
+    DATA = ConditionData
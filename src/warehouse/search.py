@@ -0,0 +1,191 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Search the warehouse server-side instead of filtering whole collections.
+
+Measurements of an entity are looked up across all visible experiments through
+the dictionary entries of the entity and grouped by the condition of their
+sample. Pages hold a number of conditions and continue after
+the id of the last condition of the previous page, so that deep pages are as
+cheap as the first one.
+
+Names, descriptions and genotypes are matched by prefix with PostgreSQL's
+full-text search in the GIN indexes of `models.SEARCH_DOCUMENTS`, ranked in a
+single query over all searched models.
+"""
+
+import re
+
+from sqlalchemy import func, literal, literal_column, or_, union_all
+
+from warehouse import models
+from warehouse.app import db
+from warehouse.utils import MEASUREMENTS
+from warehouse.visibility import visible
+
+
+# The columns holding the namespace and the identifier of the measured entities,
+# by measurement name. Molar yields match both their product and substrate.
+IDENTIFIERS = {
+    "fluxomics": [("reaction_namespace", "reaction_identifier")],
+    "metabolomics": [("compound_namespace", "compound_identifier")],
+    "proteomics": [(None, "identifier")],
+    "uptake_secretion_rates": [("compound_namespace", "compound_identifier")],
+    "molar_yields": [
+        ("product_namespace", "product_identifier"),
+        ("substrate_namespace", "substrate_identifier"),
+    ],
+}
+
+
+def _matching(query, Measurement, name, namespace, identifier):
+    """Filter a query of measurements by the given entity."""
+    matches = []
+    for namespace_column, identifier_column in IDENTIFIERS[name]:
+        match = getattr(Measurement, identifier_column) == identifier
+        if namespace is not None and namespace_column is not None:
+            match &= getattr(Measurement, namespace_column) == namespace
+        matches.append(match)
+    # The entities are looked up in their dictionaries.
+    return models.join_entities(query, Measurement).filter(or_(*matches))
+
+
+def search_measurements(
+    types, identifier, namespace=None, after=None, limit=20
+):
+    """
+    Return the visible measurements of an entity grouped by condition.
+
+    :param types: The names of the measurements to search, see `IDENTIFIERS`
+    :param identifier: The identifier of the entity
+    :param namespace: The namespace of the entity; any namespace matches if
+        omitted, as do proteins, which are identified without one
+    :param after: Continue after the condition with this id
+    :param limit: The maximum number of conditions to return
+    :return: A dictionary with the `conditions` of the page, each with its
+        `condition_id`, `experiment_id` and a list of measurements by name,
+        and the `next` value of `after`, or `None` on the last page
+    """
+    # Packed measurements are searched along with the others.
+    measurements = {
+        name: models.with_packed(MEASUREMENTS[name]) for name in types
+    }
+    first, *rest = [
+        _matching(
+            db.session.query(models.Sample.condition_id.label("condition_id"))
+            .select_from(models.Sample)
+            .join(
+                measurements[name],
+                measurements[name].sample_id == models.Sample.id,
+            ),
+            measurements[name],
+            name,
+            namespace,
+            identifier,
+        ).filter(visible(measurements[name]))
+        for name in types
+    ]
+    conditions = first.union(*rest).subquery("matching")
+    query = db.session.query(
+        models.Condition.id, models.Condition.experiment_id
+    ).join(conditions, conditions.c.condition_id == models.Condition.id)
+    if after is not None:
+        query = query.filter(models.Condition.id > after)
+    # Fetch one more condition to tell whether there is another page.
+    page = query.order_by(models.Condition.id).limit(limit + 1).all()
+    next_after = page[limit - 1].id if len(page) > limit else None
+    groups = {
+        condition_id: {
+            "condition_id": condition_id,
+            "experiment_id": experiment_id,
+            **{name: [] for name in types},
+        }
+        for condition_id, experiment_id in page[:limit]
+    }
+    if not groups:
+        return {"conditions": [], "next": None}
+    for name in types:
+        Measurement = measurements[name]
+        # The conditions of the page are visible; so are their measurements.
+        rows = _matching(
+            db.session.query(Measurement, models.Sample.condition_id)
+            .join(models.Sample, models.Sample.id == Measurement.sample_id)
+            .filter(models.Sample.condition_id.in_(groups)),
+            Measurement,
+            name,
+            namespace,
+            identifier,
+        ).order_by(Measurement.sample_id, Measurement.id)
+        for measurement, condition_id in rows:
+            groups[condition_id][name].append(measurement)
+    return {"conditions": list(groups.values()), "next": next_after}
+
+
+# The models searched by text, by the type of their hits.
+DOCUMENT_TYPES = {
+    model.__tablename__: model for model in models.SEARCH_DOCUMENTS
+}
+
+
+def _prefix_query(text):
+    """Return a query for words starting with those of the given text."""
+    # Only keep letters and digits, which are never part of the query syntax.
+    terms = re.findall(r"[^\W_]+", text)
+    if not terms:
+        return None
+    return func.to_tsquery(
+        literal_column("'simple'"), " & ".join(f"{term}:*" for term in terms)
+    )
+
+
+def search_text(text, types, limit=20):
+    """
+    Return the visible objects with names matching the given text.
+
+    :param text: The words to find; every word must start a word of the name,
+        genotype or description of the object
+    :param types: The types of the objects to search, see `DOCUMENT_TYPES`
+    :param limit: The maximum number of hits
+    :return: A list of hits with the `type` and `id` of the object and the
+        `rank` of the match, best matches first
+    """
+    query = _prefix_query(text)
+    if query is None:
+        return []
+    selects = []
+    for name in types:
+        model = DOCUMENT_TYPES[name]
+        document = models.SEARCH_DOCUMENTS[model]
+        selects.append(
+            models.join_entities(
+                db.session.query(
+                    literal(name).label("type"),
+                    model.id.label("id"),
+                    func.ts_rank(document, query).label("rank"),
+                ).select_from(model),
+                model,
+            )
+            .filter(document.op("@@")(query))
+            .filter(visible(model))
+            .statement
+        )
+    hits = union_all(*selects).alias("hits")
+    return [
+        row._asdict()
+        for row in db.session.query(hits)
+        .order_by(hits.c.rank.desc(), hits.c.type, hits.c.id)
+        .limit(limit)
+    ]
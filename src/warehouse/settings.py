@@ -16,6 +16,7 @@
 """Provide settings for different deployment scenarios."""
 
 import os
+from datetime import timedelta
 
 import requests
 
@@ -85,6 +86,14 @@ class Default(object):
         )
         self.SQLALCHEMY_TRACK_MODIFICATIONS = False
         self.JWT_ACCESS_TOKEN_EXPIRES = False
+        # The time for which the responses to requests with an idempotency key
+        # are replayed to retries, see `warehouse.idempotency`.
+        self.IDEMPOTENCY_RETENTION = timedelta(days=1)
+        # The time after which the running job of a worker which stopped
+        # sending heartbeats is claimed again, and the number of times a job
+        # is claimed before it is failed, see `warehouse.jobs`.
+        self.JOB_LEASE = timedelta(minutes=5)
+        self.JOB_MAX_ATTEMPTS = 3
         self.BASIC_AUTH_USERNAME = os.environ["BASIC_AUTH_USERNAME"]
         self.BASIC_AUTH_PASSWORD = os.environ["BASIC_AUTH_PASSWORD"]
         self.JWT_PUBLIC_KEY = requests.get(
@@ -0,0 +1,148 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Follow the measurements of an entity over the samples of a condition.
+
+The samples are read in time order from the `(condition_id, start_time)` index
+of the sample table. Long cultivations are downsampled in the database by
+averaging the measurements within equal time intervals.
+"""
+
+from sqlalchemy import case, func, literal
+
+from warehouse import models
+from warehouse.app import db
+from warehouse.utils import MEASUREMENTS
+
+
+# The columns holding the namespace and the identifier of the measured entity,
+# by measurement name.
+ENTITIES = {
+    "fluxomics": ("reaction_namespace", "reaction_identifier"),
+    "metabolomics": ("compound_namespace", "compound_identifier"),
+    "proteomics": (None, "identifier"),
+    "uptake_secretion_rates": ("compound_namespace", "compound_identifier"),
+    "growth_rates": (None, None),
+}
+
+
+def _measurements(name, condition_id, namespace, identifier, start, end):
+    """Query the measurements of an entity in the samples of a condition."""
+    Measurement = models.with_packed(MEASUREMENTS[name])
+    namespace_column, identifier_column = ENTITIES[name]
+    query = (
+        db.session.query(
+            models.Sample.start_time,
+            models.Sample.end_time,
+            Measurement.measurement,
+            Measurement.uncertainty,
+        )
+        .select_from(models.Sample)
+        .join(Measurement, Measurement.sample_id == models.Sample.id)
+        .filter(models.Sample.condition_id == condition_id)
+    )
+    query = models.join_entities(query, Measurement)
+    if namespace_column is not None:
+        query = query.filter(
+            getattr(Measurement, namespace_column) == namespace
+        )
+    if identifier_column is not None:
+        query = query.filter(
+            getattr(Measurement, identifier_column) == identifier
+        )
+    if start is not None:
+        query = query.filter(models.Sample.start_time >= start)
+    if end is not None:
+        query = query.filter(models.Sample.start_time < end)
+    return query
+
+
+def _downsampled(measurements, buckets):
+    """Average the measurements within equal intervals of their start times."""
+    points = measurements.add_columns(
+        func.extract("epoch", models.Sample.start_time).label("epoch")
+    ).subquery()
+    first = func.min(points.c.epoch).over()
+    last = func.max(points.c.epoch).over()
+    # `width_bucket` assigns the last start time to an additional interval.
+    bucketed = db.session.query(
+        points,
+        case(
+            [(first == last, literal(1))],
+            else_=func.least(
+                func.width_bucket(points.c.epoch, first, last, buckets),
+                buckets,
+            ),
+        ).label("bucket"),
+    ).subquery()
+    return (
+        db.session.query(
+            func.min(bucketed.c.start_time).label("start_time"),
+            func.max(bucketed.c.end_time).label("end_time"),
+            func.avg(bucketed.c.measurement).label("measurement"),
+            # The uncertainty of the mean of the independent measurements
+            # which have one, like `aggregates._aggregates`.
+            (
+                func.sqrt(
+                    func.sum(bucketed.c.uncertainty * bucketed.c.uncertainty)
+                )
+                / func.count(bucketed.c.uncertainty)
+            ).label("uncertainty"),
+            func.count().label("count"),
+        )
+        .group_by(bucketed.c.bucket)
+        .order_by(bucketed.c.bucket)
+    )
+
+
+def time_series(
+    condition_id,
+    name,
+    namespace=None,
+    identifier=None,
+    start=None,
+    end=None,
+    buckets=None,
+):
+    """
+    Return the measurements of an entity in a condition ordered by time.
+
+    :param condition_id: The id of the condition
+    :param name: The name of the measurements, e.g., `fluxomics`
+    :param namespace: The namespace of the measured entity, unless the
+        measurements do not identify the entity with one
+    :param identifier: The identifier of the measured entity, unless the
+        measurements are not of an entity
+    :param start: Only include samples started at or after this time
+    :param end: Only include samples started before this time
+    :param buckets: If given, average the measurements within at most this
+        many intervals of equal length between the first and the last start
+        time
+    :return: A list of points with the keys `start_time`, `end_time`,
+        `measurement`, `uncertainty` and `count`, the number of averaged
+        measurements
+    """
+    measurements = _measurements(
+        name, condition_id, namespace, identifier, start, end
+    )
+    if buckets is not None:
+        return [row._asdict() for row in _downsampled(measurements, buckets)]
+    return [
+        {**row._asdict(), "count": 1}
+        for row in measurements.order_by(
+            models.Sample.start_time, models.Sample.id
+        )
+    ]
@@ -13,19 +13,756 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from flask import abort, g
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from flask import abort
+from sqlalchemy import bindparam, func, text, true
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm.exc import NoResultFound
 
+from warehouse import models
+from warehouse.app import db
+from warehouse.jwt import jwt_require_claim
+from warehouse.visibility import (
+    OWNER_PATHS,
+    join_owner,
+    owner,
+    project_visible,
+    visible,
+    with_project,
+)
+
+
+# The measurement models by the name used in requests and responses.
+MEASUREMENTS = {
+    "fluxomics": models.Fluxomics,
+    "metabolomics": models.Metabolomics,
+    "proteomics": models.Proteomics,
+    "uptake_secretion_rates": models.UptakeSecretionRates,
+    "molar_yields": models.MolarYields,
+    "growth_rates": models.Growth,
+}
+
+# The response headers listing the requested ids of objects which do not exist,
+# and of those which are not visible, see `filter_ids`.
+MISSING_IDS_HEADER = "X-Missing-Ids"
+FORBIDDEN_IDS_HEADER = "X-Forbidden-Ids"
+
+# The models of measurements which may also be stored packed, by the same names.
+PACKED = {
+    "metabolomics": models.PackedMetabolomics,
+    "proteomics": models.PackedProteomics,
+}
+
 
 def verify_relation(ModelClass, object_id):
     try:
         return (
             ModelClass.query.filter(ModelClass.id == object_id)
-            .filter(
-                ModelClass.project_id.in_(g.jwt_claims["prj"])
-                | ModelClass.project_id.is_(None)
-            )
+            .filter(visible(ModelClass))
             .one()
         )
     except NoResultFound:
         abort(404, f"Related object {object_id} does not exist")
+
+
+def verify_storage(ModelClass, sample_ids):
+    """
+    Abort if measurements of the given samples are stored the other way.
+
+    The measurements of a type are either stored as rows or packed for each
+    sample, such that none is read twice.
+
+    :param ModelClass: The model class of the measurements to store, either a
+        measurement or a packed measurement model class
+    :param sample_ids: The ids of the samples to store measurements of
+    """
+    if ModelClass in models.PACKED_MODELS:
+        Stored, layout = models.PACKED_MODELS[ModelClass], "packed"
+    elif hasattr(ModelClass, "UNPACKED"):
+        Stored, layout = ModelClass.UNPACKED, "as rows"
+    else:
+        return
+    sample_ids = set(sample_ids)
+    if not sample_ids:
+        return
+    conflicting = sorted(
+        sample_id
+        for (sample_id,) in db.session.query(Stored.sample_id)
+        .filter(Stored.sample_id.in_(sample_ids))
+        .distinct()
+    )
+    if conflicting:
+        abort(
+            409,
+            f"The measurements of samples "
+            f"{', '.join(str(id) for id in conflicting)} are stored {layout}",
+        )
+
+
+def verify_unpacked(ModelClass, id):
+    """
+    Abort if the measurement of the given id is stored packed.
+
+    Packed measurements are read like the others, but are only replaced along
+    with the other measurements of their sample, see `pack_measurements`.
+
+    :param ModelClass: The measurement model class, e.g., `models.Metabolomics`
+    :param id: The id of the measurement
+    """
+    Packed = models.PACKED_MODELS[ModelClass]
+    packed = (
+        with_project(Packed)
+        .filter(Packed.ids.contains([id]))
+        .filter(project_visible(Packed, public=False))
+        .first()
+    )
+    if packed is not None:
+        abort(
+            409,
+            f"The measurement {id} is stored packed with those of sample "
+            f"{packed[0].sample_id}, which are replaced together",
+        )
+
+
+def changed_since(column, timestamp):
+    """
+    Return a filter for rows with a timestamp column at or after the given time.
+
+    :param column: The timestamp column, e.g., `updated`
+    :param timestamp: The time to compare to, or `None` to not filter at all
+    """
+    if timestamp is None:
+        return true()
+    # The timestamps are stored in UTC, without time zone.
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return column >= timestamp
+
+
+def filter_ids(query, ModelClass, ids):
+    """
+    Return the objects of a query, or only those with the given ids.
+
+    The objects are loaded with a single `IN` query. The requested ids which
+    are not returned are listed in the headers of the response, those of
+    objects which do not exist in `MISSING_IDS_HEADER` and those of objects
+    which are not visible in `FORBIDDEN_IDS_HEADER`. Objects excluded by the
+    other filters of the query, e.g., `updated_since`, are not listed. Only if
+    some objects are not found, another query tells these apart.
+
+    :param query: A query of the visible objects of the model
+    :param ModelClass: The model class, or an alias of it
+    :param ids: The ids of the objects to return, or `None` to return all
+    :return: The objects, the status code and the headers of the response
+    """
+    if ids is None:
+        return (query.all(), 200, {})
+    ids = set(ids)
+    objects = query.filter(ModelClass.id.in_(ids)).all()
+    missing_ids = ids.difference(instance.id for instance in objects)
+    forbidden_ids = set()
+    if missing_ids:
+        for id, is_visible in db.session.query(
+            ModelClass.id, visible(ModelClass)
+        ).filter(ModelClass.id.in_(missing_ids)):
+            missing_ids.discard(id)
+            if not is_visible:
+                forbidden_ids.add(id)
+    headers = {
+        header: ",".join(str(id) for id in sorted(header_ids))
+        for header, header_ids in [
+            (MISSING_IDS_HEADER, missing_ids),
+            (FORBIDDEN_IDS_HEADER, forbidden_ids),
+        ]
+        if header_ids
+    }
+    return (objects, 200, headers)
+
+
+def _sample_ids(ModelClass, object_id):
+    """Select the ids of the samples belonging to the given object."""
+    query = db.session.query(models.Sample.id)
+    if ModelClass is models.Sample:
+        return query.filter(models.Sample.id == object_id)
+    for foreign_key, parent in OWNER_PATHS[models.Sample]:
+        if parent is ModelClass:
+            return query.filter(foreign_key == object_id)
+        query = query.join(parent, foreign_key == parent.id)
+    raise ValueError(f"{ModelClass.__name__} does not contain samples")
+
+
+def delete_measurements(ModelClass, object_id, types):
+    """
+    Delete all measurements of a sample, condition or experiment.
+
+    The claims are checked once for the given object, after which every
+    measurement table is cleared with a single `DELETE ... WHERE` statement.
+
+    :param ModelClass: One of `Sample`, `Condition` or `Experiment`
+    :param object_id: The id of the object to delete the measurements of
+    :param types: The names of the measurements to delete, see `MEASUREMENTS`
+    :return: The number of deleted measurements by measurement name
+    """
+    try:
+        _, project_id = (
+            with_project(ModelClass)
+            .filter(ModelClass.id == object_id)
+            .filter(project_visible(ModelClass, public=False))
+            .one()
+        )
+    except NoResultFound:
+        abort(404, f"Cannot find object with id {object_id}")
+    jwt_require_claim(project_id, "admin")
+    sample_ids = _sample_ids(ModelClass, object_id)
+
+    def selected(Measurement):
+        # Measurements refer to their experiment directly.
+        if ModelClass is models.Experiment:
+            return Measurement.experiment_id == object_id
+        return Measurement.sample_id.in_(sample_ids)
+
+    counts = {}
+    for name in types:
+        Measurement = MEASUREMENTS[name]
+        counts[name] = Measurement.query.filter(selected(Measurement)).delete(
+            synchronize_session=False
+        )
+        if name in PACKED:
+            # Count the packed measurements rather than their rows.
+            Packed = PACKED[name]
+            counts[name] += sum(
+                count
+                for (count,) in db.session.execute(
+                    Packed.__table__.delete()
+                    .where(selected(Packed))
+                    .returning(func.cardinality(Packed.measurements))
+                )
+            )
+    db.session.commit()
+    return counts
+
+
+def entity_fields(ModelClass):
+    """Return the fields of a model exposing the columns of its entries."""
+    fields = defaultdict(dict)
+    for name, attribute in vars(ModelClass).items():
+        if isinstance(attribute, models.Entity):
+            fields[attribute.relationship][attribute.column] = name
+    return fields
+
+
+def _refer_entries(ModelClass, rows, current=None):
+    """
+    Replace the entity fields of rows by the ids of their dictionary entries.
+
+    :param ModelClass: The measurement model class
+    :param rows: Dictionaries of column values, which are not modified
+    :param current: The current values of the fields by the ids of the rows,
+        completing those of partial rows
+    :return: The rows, with the ids of the entries instead of their values
+    """
+    rows = [dict(row) for row in rows]
+    for relationship, fields in entity_fields(ModelClass).items():
+        Dictionary = getattr(ModelClass, relationship).property.mapper.class_
+        changed = [row for row in rows if row.keys() & set(fields.values())]
+        entries = [
+            tuple(
+                row.pop(fields[column])
+                if fields[column] in row
+                else current[row["id"]][fields[column]]
+                for column in Dictionary.KEY
+            )
+            for row in changed
+        ]
+        ids = models.entry_ids(db.session, Dictionary, entries)
+        for row, entry in zip(changed, entries):
+            row[f"{relationship}_id"] = ids[entry]
+    return rows
+
+
+def _identity_fields(ModelClass, natural_key):
+    """
+    Return the relationships to the entries in the natural key of a model, and
+    the fields identifying their entities, by relationship.
+    """
+    return {
+        relationship: [
+            fields[column]
+            for column in getattr(
+                ModelClass, relationship
+            ).property.mapper.class_.IDENTITY
+        ]
+        for relationship, fields in entity_fields(ModelClass).items()
+        if f"{relationship}_id" in natural_key
+    }
+
+
+def _refer_to_given_names(ModelClass, rows, relationships):
+    """
+    Refer measurements to the entries of the entities they are upserted with.
+
+    Entries include the names given to their entity, such that a measurement
+    upserted with other names would not conflict with the stored one of its
+    entity. The stored one is referred to the entry of the new names instead,
+    unless the sample has a measurement of those already, and is then updated
+    by the upsert. The entries themselves are shared and left as they are.
+    """
+    table = ModelClass.__table__
+    for relationship in relationships:
+        Dictionary = getattr(ModelClass, relationship).property.mapper.class_
+        entity = " AND ".join(
+            f"stored.{column} = given.{column}"
+            for column in Dictionary.IDENTITY
+        )
+        db.session.execute(
+            text(
+                f"UPDATE {table.name} AS measurement "
+                f"SET {relationship}_id = given.id "
+                f"FROM unnest("
+                f"CAST(:sample_ids AS integer[]), "
+                f"CAST(:entry_ids AS integer[])"
+                f") AS upserted (sample_id, entry_id) "
+                f"JOIN {Dictionary.__tablename__} AS given "
+                f"ON given.id = upserted.entry_id "
+                f"JOIN {Dictionary.__tablename__} AS stored "
+                f"ON {entity} AND stored.id <> given.id "
+                f"WHERE measurement.sample_id = upserted.sample_id "
+                f"AND measurement.{relationship}_id = stored.id "
+                f"AND NOT EXISTS ("
+                f"SELECT 1 FROM {table.name} AS named "
+                f"WHERE named.sample_id = upserted.sample_id "
+                f"AND named.{relationship}_id = given.id"
+                f")"
+            ),
+            {
+                "sample_ids": [row["sample_id"] for row in rows],
+                "entry_ids": [row[f"{relationship}_id"] for row in rows],
+            },
+        )
+
+
+def insert_measurements(ModelClass, rows, upsert=False):
+    """
+    Insert measurements with a single statement and return their ids.
+
+    The measurements are committed by the caller.
+
+    :param ModelClass: The measurement model class
+    :param rows: The column values of the measurements as dictionaries
+    :param upsert: Whether to update measurements sharing the natural key (the
+        unique index of the table) of an existing one instead of failing. Of
+        several rows sharing a natural key in the request, the last one wins.
+    """
+    if not rows:
+        return []
+    verify_storage(ModelClass, (row["sample_id"] for row in rows))
+    table = ModelClass.__table__
+    statement = insert(table)
+    if upsert:
+        (natural_key,) = [index for index in table.indexes if index.unique]
+        key = [column.name for column in natural_key.columns]
+        identities = _identity_fields(ModelClass, key)
+        # A statement must not update the same row twice. Measurements of the
+        # same entity share their natural key, whatever names they give it.
+        identity = [
+            name for name in key if name[: -len("_id")] not in identities
+        ] + [name for fields in identities.values() for name in fields]
+        rows = list(
+            {
+                tuple(row[name] for name in identity): row for row in rows
+            }.values()
+        )
+    rows = _refer_entries(ModelClass, rows)
+    if upsert:
+        _refer_to_given_names(ModelClass, rows, identities)
+        updated = {
+            name: statement.excluded[name]
+            for name in rows[0]
+            if name not in key
+        }
+        statement = statement.on_conflict_do_update(
+            index_elements=key, set_={**updated, "updated": datetime.utcnow()}
+        )
+    result = db.session.execute(statement.values(rows).returning(table.c.id))
+    return [id for (id,) in result]
+
+
+def pack_measurements(Packed, rows):
+    """
+    Store the measurements of each sample packed into a single row.
+
+    The packed measurements of a sample replace those packed before, with a
+    single statement for all samples. Measurements of the entities packed
+    before keep their ids; the others draw theirs from the sequence of the
+    unpacked model. Tombstones of the measurements packed before but not again
+    are recorded by a trigger.
+
+    :param Packed: The packed measurement model class, e.g.,
+        `models.PackedMetabolomics`
+    :param rows: The column values of the unpacked measurements as
+        dictionaries. Of several rows measuring the same entity of a sample,
+        the last one wins.
+    :return: The ids of the samples
+    """
+    if not rows:
+        return []
+    verify_storage(Packed, (row["sample_id"] for row in rows))
+    table = Packed.__table__
+    # Measurements are identified by the natural key of the unpacked model.
+    (natural_key,) = [
+        index for index in Packed.UNPACKED.__table__.indexes if index.unique
+    ]
+    key = [column.name for column in natural_key.columns]
+    samples = defaultdict(dict)
+    for row in _refer_entries(Packed.UNPACKED, rows):
+        samples[row["sample_id"]][tuple(row[name] for name in key)] = row
+    packed = models.unpack(Packed).alias("packed")
+    ids = {
+        tuple(row[1:]): row[0]
+        for row in db.session.query(
+            packed.c.id, *(packed.c[name] for name in key)
+        ).filter(packed.c.sample_id.in_(samples))
+    }
+    new_keys = [
+        measurement_key
+        for measurements in samples.values()
+        for measurement_key in measurements
+        if measurement_key not in ids
+    ]
+    if new_keys:
+        drawn = db.session.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"table": Packed.UNPACKED.__tablename__, "count": len(new_keys)},
+        )
+        ids.update(zip(new_keys, (id for (id,) in drawn)))
+    values = [
+        {
+            "sample_id": sample_id,
+            "ids": [ids[measurement_key] for measurement_key in measurements],
+            **{
+                array: [row[field] for row in measurements.values()]
+                for field, array in Packed.ARRAYS.items()
+            },
+        }
+        for sample_id, measurements in samples.items()
+    ]
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=["sample_id"],
+        set_={
+            **{
+                array: statement.excluded[array]
+                for array in ["ids", *Packed.ARRAYS.values()]
+            },
+            "updated": datetime.utcnow(),
+        },
+    )
+    result = db.session.execute(
+        statement.values(values).returning(table.c.sample_id)
+    )
+    sample_ids = [sample_id for (sample_id,) in result]
+    db.session.commit()
+    return sample_ids
+
+
+def _update_from_values(table, columns, rows):
+    """Update the given columns of rows by id with a single statement."""
+    names = ("id",) + columns
+    parameters = []
+    values = []
+    for index, row in enumerate(rows):
+        placeholders = []
+        for name in names:
+            key = f"{name}_{index}"
+            column_type = table.c[name].type
+            parameters.append(bindparam(key, row[name], type_=column_type))
+            # Without the casts, PostgreSQL can not infer the type of NULLs.
+            placeholders.append(
+                f"CAST(:{key} AS "
+                f"{column_type.compile(dialect=postgresql.dialect())})"
+            )
+        values.append(f"({', '.join(placeholders)})")
+    statement = text(
+        f"UPDATE {table.name} "
+        f"SET {', '.join(f'{name} = v.{name}' for name in columns)}, "
+        f"updated = :updated "
+        f"FROM (VALUES {', '.join(values)}) AS v ({', '.join(names)}) "
+        f"WHERE {table.name}.id = v.id "
+        f"RETURNING {table.name}.id"
+    ).bindparams(*parameters, updated=datetime.utcnow())
+    return [id for (id,) in db.session.execute(statement)]
+
+
+def update_measurements(ModelClass, rows):
+    """
+    Update measurements in bulk and return the ids of the updated ones.
+
+    The claims for all rows are checked with one query. Rows changing the same
+    columns are then updated with one `UPDATE ... FROM (VALUES ...)` statement.
+
+    :param ModelClass: The measurement model class
+    :param rows: Dictionaries of the `id` and the new values of the columns to
+        change
+    """
+    ids = {row["id"] for row in rows}
+    projects = (
+        join_owner(
+            db.session.query(ModelClass.id, owner(ModelClass).project_id),
+            ModelClass,
+        )
+        .filter(ModelClass.id.in_(ids))
+        .filter(project_visible(ModelClass, public=False))
+        .all()
+    )
+    missing_ids = ids.difference(id for id, _ in projects)
+    if missing_ids:
+        abort(
+            404,
+            f"Cannot find objects with ids "
+            f"{', '.join(str(id) for id in sorted(missing_ids))}",
+        )
+    for project_id in {project_id for _, project_id in projects}:
+        jwt_require_claim(project_id, "write")
+    verify_storage(
+        ModelClass, (row["sample_id"] for row in rows if "sample_id" in row)
+    )
+
+    # Changing a field of an entry refers to another entry with the unchanged
+    # fields of the current one.
+    fields = [
+        name
+        for names in entity_fields(ModelClass).values()
+        for name in names.values()
+    ]
+    current = {}
+    if any(name in row for row in rows for name in fields):
+        current = {
+            row.id: row._asdict()
+            for row in models.join_entities(
+                db.session.query(
+                    ModelClass.id,
+                    *(getattr(ModelClass, name).label(name) for name in fields),
+                ).select_from(ModelClass),
+                ModelClass,
+            ).filter(ModelClass.id.in_(ids))
+        }
+    rows = _refer_entries(ModelClass, rows, current)
+
+    # Group the rows by the changed columns; of several rows updating the same
+    # id, the last one wins.
+    groups = defaultdict(dict)
+    for row in rows:
+        columns = tuple(sorted(name for name in row if name != "id"))
+        if columns:
+            groups[columns][row["id"]] = row
+    updated = []
+    for columns, group in groups.items():
+        updated.extend(
+            _update_from_values(ModelClass.__table__, columns, group.values())
+        )
+    db.session.commit()
+    return updated
+
+
+def _copied_columns(ModelClass, parent_column):
+    """Return the names of the columns copied as they are when cloning."""
+    return [
+        column.name
+        for column in ModelClass.__table__.columns
+        if column.name
+        not in ("id", parent_column, "experiment_id", "created", "updated")
+    ]
+
+
+# The tables of the objects which the conditions of an experiment refer to.
+_SHARED = ("organism", "strain", "medium")
+
+
+def _shared(table):
+    """
+    Return a query of the ids of the objects referred to by the conditions of
+    the experiment `:experiment_id` which belong to other projects than
+    `:project_id`: their strains with their ancestors, the organisms of these,
+    and their media.
+    """
+    if table == "strain":
+        ids = (
+            "SELECT link.ancestor_id FROM strain_closure AS link "
+            "JOIN condition ON condition.strain_id = link.descendant_id "
+            "WHERE condition.experiment_id = :experiment_id"
+        )
+    elif table == "organism":
+        ids = (
+            f"SELECT organism_id FROM strain WHERE id IN ({_shared('strain')})"
+        )
+    else:
+        ids = (
+            "SELECT medium_id FROM condition "
+            "WHERE experiment_id = :experiment_id"
+        )
+    return (
+        f"SELECT shared.id FROM {table} AS shared "
+        f"WHERE shared.project_id <> :project_id AND shared.id IN ({ids})"
+    )
+
+
+def clone_experiment(experiment, project_id, name):
+    """
+    Copy an experiment with its conditions, samples and measurements.
+
+    The whole tree is copied with a single statement of `INSERT ... SELECT`
+    common table expressions. The ids of the copied conditions and samples are
+    drawn from their sequences up front, mapping each original to its copy,
+    such that the copies of their children can refer to them. The strains and
+    media are shared with the original in its project. A clone in another
+    project refers to copies of the strains (with their ancestors and
+    organisms) and media of other projects instead, which the caller must be
+    allowed to read, such that its readers can read them and they are not
+    removed along with the originals. Public ones are shared.
+
+    :param experiment: The experiment to clone
+    :param project_id: The project of the clone
+    :param name: The name of the clone
+    :return: The id of the clone
+    """
+    parameters = {
+        "experiment_id": experiment.id,
+        "project_id": project_id,
+        "name": name,
+        "now": datetime.utcnow(),
+    }
+    copy_shared = project_id != experiment.project_id
+    if copy_shared:
+        shared_projects = db.session.execute(
+            text(
+                " UNION ".join(
+                    f"SELECT project_id FROM {table} "
+                    f"WHERE id IN ({_shared(table)})"
+                    for table in _SHARED
+                )
+            ),
+            parameters,
+        )
+        for (shared_project_id,) in shared_projects:
+            jwt_require_claim(shared_project_id, "read")
+    queries = [
+        "clone AS ("
+        "INSERT INTO experiment "
+        "(project_id, name, description, created, updated) "
+        "SELECT :project_id, :name, description, :now, :now "
+        "FROM experiment WHERE id = :experiment_id "
+        "RETURNING id)",
+        "experiment_ids AS ("
+        "SELECT CAST(:experiment_id AS integer) AS old_id, id AS new_id "
+        "FROM clone)",
+    ]
+    # Map the conditions and samples to the ids of their copies, along with
+    # the ids of the copies of their parents.
+    for table, parent_column, parent_ids in [
+        ("condition", "experiment_id", "experiment_ids"),
+        ("sample", "condition_id", "condition_ids"),
+    ]:
+        queries.append(
+            f"{table}_ids AS ("
+            f"SELECT original.id AS old_id, "
+            f"nextval(pg_get_serial_sequence('{table}', 'id')) AS new_id, "
+            f"parent.new_id AS parent_id "
+            f"FROM {table} AS original JOIN {parent_ids} AS parent "
+            f"ON parent.old_id = original.{parent_column})"
+        )
+    # The copies of the conditions refer to the copies of these, if any.
+    references = {}
+    copies = []
+    if copy_shared:
+        # The copies of shared objects are "children" of the project.
+        for table in _SHARED:
+            queries.append(
+                f"{table}_ids AS ("
+                f"SELECT original.id AS old_id, "
+                f"nextval(pg_get_serial_sequence('{table}', 'id')) AS new_id, "
+                f"CAST(:project_id AS integer) AS parent_id "
+                f"FROM {table} AS original WHERE original.id IN "
+                f"({_shared(table)}))"
+            )
+        references = {
+            "organism_id": "organism_ids",
+            "parent_id": "strain_ids",
+            "strain_id": "strain_ids",
+            "medium_id": "medium_ids",
+        }
+        copies = [
+            (models.Organism, "project_id", "organism_ids", True),
+            (models.Strain, "project_id", "strain_ids", True),
+            (models.Medium, "project_id", "medium_ids", True),
+            (models.MediumCompound, "medium_id", "medium_ids", False),
+        ]
+    copies += [
+        (models.Condition, "experiment_id", "condition_ids", True),
+        (models.Sample, "condition_id", "sample_ids", True),
+        *(
+            (Measurement, "sample_id", "sample_ids", False)
+            for Measurement in [*MEASUREMENTS.values(), *PACKED.values()]
+        ),
+    ]
+    for ModelClass, parent_column, ids, mapped in copies:
+        table = ModelClass.__tablename__
+        columns = _copied_columns(ModelClass, parent_column)
+        if mapped:
+            # The copy takes the id drawn for it, and refers to the parent
+            # mapped alongside.
+            names = ["id", parent_column]
+            values = ["ids.new_id", "ids.parent_id"]
+            join = "ids.old_id = original.id"
+        else:
+            names = [parent_column]
+            values = ["ids.new_id"]
+            join = f"ids.old_id = original.{parent_column}"
+        if issubclass(ModelClass, models.ExperimentMixin):
+            names.append("experiment_id")
+            values.append("(SELECT id FROM clone)")
+        names.extend(["created", "updated", *columns])
+        values.extend([":now", ":now"])
+        for column in columns:
+            if column == "ids":
+                # The copies of packed measurements draw ids of their own.
+                values.append(
+                    f"ARRAY(SELECT nextval(pg_get_serial_sequence("
+                    f"'{ModelClass.UNPACKED.__tablename__}', 'id')) "
+                    f"FROM unnest(original.ids))"
+                )
+            elif column in references:
+                values.append(
+                    f"COALESCE({column}_copy.new_id, original.{column})"
+                )
+                join += (
+                    f" LEFT JOIN {references[column]} AS {column}_copy "
+                    f"ON {column}_copy.old_id = original.{column}"
+                )
+            else:
+                values.append(f"original.{column}")
+        order = ""
+        if ModelClass is models.Strain:
+            # The closure of a copy is linked to that of its parent's copy,
+            # which is inserted first.
+            order = (
+                " ORDER BY (SELECT count(*) FROM strain_closure "
+                "WHERE descendant_id = original.id)"
+            )
+        queries.append(
+            f"{table}_copies AS ("
+            f"INSERT INTO {table} ({', '.join(names)}) "
+            f"SELECT {', '.join(values)} "
+            f"FROM {table} AS original JOIN {ids} AS ids ON {join}{order})"
+        )
+    statement = text(
+        f"WITH {', '.join(queries)} SELECT id FROM clone"
+    ).bindparams(**parameters)
+    clone_id = db.session.execute(statement).scalar()
+    db.session.commit()
+    return clone_id
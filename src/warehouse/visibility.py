@@ -0,0 +1,134 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Build the project visibility predicates for all models.
+
+A row is visible when the project owning it is included in the user's JWT
+claims or, for reading, when it is public (has no project). Only organisms,
+strains, experiments, media and tombstones carry a `project_id`; every other
+model is owned through a chain of foreign keys leading to one of them, as
+declared in `OWNER_PATHS`.
+
+The predicates are generated as a single semi-join on the first foreign key of
+the chain (`fluxomics.sample_id IN (SELECT sample.id FROM sample JOIN condition
+... JOIN experiment ... WHERE experiment.project_id ...)`), which PostgreSQL
+plans as one hash semi-join instead of nested, correlated EXISTS subqueries.
+"""
+
+from flask import g
+from sqlalchemy import inspect
+
+from warehouse import models
+from warehouse.app import db
+
+
+_SAMPLE_PATH = (
+    (models.Sample.condition_id, models.Condition),
+    (models.Condition.experiment_id, models.Experiment),
+)
+
+
+def _measurement_path(model):
+    return ((model.sample_id, models.Sample),) + _SAMPLE_PATH
+
+
+# The foreign keys (and the models they refer to) leading from each model to
+# the model holding its `project_id`.
+OWNER_PATHS = {
+    models.Organism: (),
+    models.Strain: (),
+    models.Experiment: (),
+    models.Medium: (),
+    models.MediumCompound: ((models.MediumCompound.medium_id, models.Medium),),
+    models.Condition: _SAMPLE_PATH[1:],
+    models.Sample: _SAMPLE_PATH,
+    models.Fluxomics: _measurement_path(models.Fluxomics),
+    models.Metabolomics: _measurement_path(models.Metabolomics),
+    models.Proteomics: _measurement_path(models.Proteomics),
+    models.UptakeSecretionRates: _measurement_path(models.UptakeSecretionRates),
+    models.MolarYields: _measurement_path(models.MolarYields),
+    models.Growth: _measurement_path(models.Growth),
+    models.PackedMetabolomics: _measurement_path(models.PackedMetabolomics),
+    models.PackedProteomics: _measurement_path(models.PackedProteomics),
+    models.Tombstone: (),
+}
+
+
+def owner(model):
+    """Return the model holding the `project_id` of the given model."""
+    path = OWNER_PATHS[inspect(model).class_]
+    return path[-1][1] if path else model
+
+
+def join_owner(query, model):
+    """Join the given query along the foreign keys to the owning model."""
+    for foreign_key, parent in OWNER_PATHS[model]:
+        query = query.join(parent, foreign_key == parent.id)
+    return query
+
+
+def project_visible(model, public=True):
+    """
+    Return a filter on the `project_id` of the model owning the given model.
+
+    The owning model must be part of the filtered query, see `with_project`.
+
+    :param model: The model class to filter
+    :param public: Whether to include rows without a project
+    """
+    project_id = owner(model).project_id
+    visible = project_id.in_(g.jwt_claims["prj"])
+    if public:
+        visible |= project_id.is_(None)
+    return visible
+
+
+def visible(model, public=True):
+    """
+    Return a filter for rows of the given model visible to the current user.
+
+    :param model: The model class to filter, or an alias of it, see
+        `models.with_packed`
+    :param public: Whether to include rows without a project, i.e., `False`
+        when the rows are to be modified
+    """
+    path = OWNER_PATHS[inspect(model).class_]
+    if not path:
+        return project_visible(model, public)
+    (foreign_key, parent), *_ = path
+    owned = join_owner(db.session.query(parent.id), parent)
+    # The foreign key of an alias is a column of the alias.
+    return getattr(model, foreign_key.key).in_(
+        owned.filter(project_visible(model, public))
+    )
+
+
+def with_project(model):
+    """
+    Query the given model together with the `project_id` of its owner.
+
+    Use this to check the JWT claims for a row without lazily loading the
+    relationships leading to its owner, e.g.::
+
+        fluxomics, project_id = (
+            with_project(models.Fluxomics)
+            .filter(models.Fluxomics.id == id)
+            .filter(project_visible(models.Fluxomics, public=False))
+            .one()
+        )
+
+    """
+    return join_owner(db.session.query(model, owner(model).project_id), model)
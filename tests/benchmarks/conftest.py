@@ -0,0 +1,108 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Provide fixtures for the database benchmarks.
+
+Benchmarks are skipped unless pytest is run with `--benchmark`, e.g.,
+`pytest --benchmark -s tests/benchmarks` to also see the reported timings. The
+generated data lives in the per-test transaction and is rolled back afterwards.
+"""
+
+import statistics
+import time
+
+import pytest
+
+
+# Dimensions of the generated dataset; the number of fluxomics rows is the
+# product of all of them.
+EXPERIMENTS = 200
+CONDITIONS_PER_EXPERIMENT = 5
+SAMPLES_PER_CONDITION = 4
+FLUXOMICS_PER_SAMPLE = 50
+PROJECTS = 20
+
+
+@pytest.fixture(scope="function")
+def benchmark_data(session, data_fixtures):
+    """
+    Generate experiments spread over many projects, down to fluxomics.
+
+    Every tenth experiment is public; the others are distributed over
+    `PROJECTS` projects numbered from 1.
+    """
+    parameters = {
+        "experiments": EXPERIMENTS,
+        "conditions": CONDITIONS_PER_EXPERIMENT,
+        "samples": SAMPLES_PER_CONDITION,
+        "fluxomics": FLUXOMICS_PER_SAMPLE,
+        "projects": PROJECTS,
+        "strain_id": data_fixtures["strain"].id,
+        "medium_id": data_fixtures["medium"].id,
+    }
+    for statement in [
+        """
+        INSERT INTO experiment (created, project_id, name, description)
+        SELECT now(),
+               CASE WHEN i % 10 = 0 THEN NULL ELSE i % :projects + 1 END,
+               'Benchmark experiment ' || i,
+               ''
+        FROM generate_series(1, :experiments) AS i
+        """,
+        """
+        INSERT INTO condition (
+            created, experiment_id, strain_id, medium_id, name
+        )
+        SELECT now(), experiment.id, :strain_id, :medium_id, 'Condition'
+        FROM experiment, generate_series(1, :conditions)
+        """,
+        """
+        INSERT INTO sample (created, condition_id, name, start_time)
+        SELECT now(), condition.id, 'Sample', now()
+        FROM condition, generate_series(1, :samples)
+        """,
+        """
+        INSERT INTO reaction (identifier, namespace, name)
+        SELECT 'R' || i, 'bigg.reaction', 'Reaction ' || i
+        FROM generate_series(1, :fluxomics) AS i
+        """,
+        """
+        INSERT INTO fluxomics (
+            created, sample_id, reaction_id, measurement, uncertainty
+        )
+        SELECT now(), sample.id, reaction.id, random(), 0
+        FROM sample, reaction
+        WHERE reaction.namespace = 'bigg.reaction'
+        """,
+    ]:
+        session.execute(statement, parameters)
+    session.execute("ANALYZE")
+    return data_fixtures
+
+
+@pytest.fixture(scope="session")
+def timeit():
+    """Provide a function returning the median wall time of a callable."""
+
+    def timeit(function, repeat=5):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    return timeit
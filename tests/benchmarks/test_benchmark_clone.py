@@ -0,0 +1,82 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark cloning experiments with all their data."""
+
+import time
+
+import pytest
+
+from warehouse import models
+
+
+def _copy(instance, **values):
+    """Copy a model instance through the session, without id and timestamps."""
+    columns = {
+        column.name: getattr(instance, column.name)
+        for column in instance.__table__.columns
+        if column.name not in ("id", "created", "updated")
+    }
+    return type(instance)(**{**columns, **values})
+
+
+@pytest.mark.benchmark
+def test_clone_experiment(client, tokens, session, benchmark_data):
+    """Compare copying through the session with copying in the database."""
+    # The generated experiments of project 1 are public; clone them into it.
+    experiments = (
+        models.Experiment.query.filter(models.Experiment.project_id.is_(None))
+        .order_by(models.Experiment.id)
+        .limit(2)
+        .all()
+    )
+    rows = (
+        models.Fluxomics.query.join(models.Sample)
+        .join(models.Condition)
+        .filter(models.Condition.experiment_id == experiments[0].id)
+        .count()
+    )
+
+    start = time.perf_counter()
+    experiment = experiments[0]
+    clone = _copy(experiment, project_id=1)
+    session.add(clone)
+    for condition in experiment.conditions:
+        condition_clone = _copy(condition, experiment=clone)
+        session.add(condition_clone)
+        for sample in condition.samples:
+            sample_clone = _copy(sample, condition=condition_clone)
+            session.add(sample_clone)
+            for fluxomics in sample.fluxomics:
+                session.add(_copy(fluxomics, sample=sample_clone))
+    session.flush()
+    session_time = time.perf_counter() - start
+
+    path = f"/experiments/{experiments[1].id}/clone"
+    start = time.perf_counter()
+    response = client.post(
+        path,
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"project_id": 1},
+    )
+    database_time = time.perf_counter() - start
+    assert response.status_code == 201
+
+    print(
+        f"\n{rows} fluxomics per experiment"
+        f"\nsession copy: {session_time * 1000:.1f} ms"
+        f"\ndatabase copy: {database_time * 1000:.1f} ms"
+    )
+    assert database_time < session_time
@@ -0,0 +1,75 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark deleting experiments with all their data."""
+
+import time
+
+import pytest
+
+from warehouse import models
+
+
+@pytest.mark.benchmark
+def test_delete_experiment(
+    client, tokens, session, benchmark_data, query_counter
+):
+    """Compare the session cascade with the database cascade."""
+    # The generated experiments of project 1 are all public; take over two
+    # experiments of project 2 instead.
+    experiments = (
+        models.Experiment.query.filter(models.Experiment.project_id == 2)
+        .order_by(models.Experiment.id)
+        .limit(2)
+        .all()
+    )
+    for experiment in experiments:
+        experiment.project_id = 1
+    session.commit()
+
+    # Emulate the previous behaviour: every child is loaded into the session
+    # and deleted with a separate statement.
+    start = time.perf_counter()
+    with query_counter as queries:
+        experiment = experiments[0]
+        for condition in experiment.conditions:
+            for sample in condition.samples:
+                for fluxomics in sample.fluxomics:
+                    session.delete(fluxomics)
+                session.delete(sample)
+            session.delete(condition)
+        session.delete(experiment)
+        session.flush()
+    loaded_time = time.perf_counter() - start
+    loaded = len(queries)
+
+    path = f"/experiments/{experiments[1].id}"
+    start = time.perf_counter()
+    with query_counter as queries:
+        response = client.delete(
+            path, headers={"Authorization": f"Bearer {tokens['admin']}"},
+        )
+    passive_time = time.perf_counter() - start
+    passive = len(queries)
+    assert response.status_code == 204
+
+    print(
+        f"\nsession cascade: {loaded} statements, "
+        f"{loaded_time * 1000:.1f} ms"
+        f"\ndatabase cascade: {passive} statements, "
+        f"{passive_time * 1000:.1f} ms"
+    )
+    assert passive <= 2
+    assert passive_time < loaded_time
@@ -0,0 +1,101 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the storage of measured entities in dictionary tables."""
+
+import pytest
+
+
+def _size(session, table):
+    """Return the size of a table with its indexes in bytes."""
+    return session.execute(
+        "SELECT pg_total_relation_size(CAST(:table AS regclass))",
+        {"table": table},
+    ).scalar()
+
+
+# Copies of the fluxomics in the current and in the previous layout, with the
+# indexes of each. Copies are measured, as the generated tables of previous
+# benchmarks in the session are bloated by their rolled back rows.
+LAYOUTS = {
+    "dictionary": [
+        """
+        CREATE TEMPORARY TABLE dictionary_fluxomics AS
+        SELECT created, updated, id, sample_id, reaction_id, measurement,
+               uncertainty
+        FROM fluxomics
+        """,
+        "ALTER TABLE dictionary_fluxomics ADD PRIMARY KEY (id)",
+        "CREATE UNIQUE INDEX ON dictionary_fluxomics (sample_id, reaction_id)",
+        "CREATE INDEX ON dictionary_fluxomics (reaction_id)",
+        "CREATE INDEX ON dictionary_fluxomics (updated)",
+        """
+        CREATE TEMPORARY TABLE dictionary_reaction AS
+        SELECT * FROM reaction
+        """,
+        "ALTER TABLE dictionary_reaction ADD PRIMARY KEY (id)",
+        """
+        CREATE UNIQUE INDEX ON dictionary_reaction (
+            identifier, namespace, name
+        )
+        """,
+    ],
+    "repeated": [
+        """
+        CREATE TEMPORARY TABLE repeated_fluxomics AS
+        SELECT fluxomics.created, fluxomics.updated, fluxomics.id,
+               fluxomics.sample_id, reaction.name AS reaction_name,
+               reaction.identifier AS reaction_identifier,
+               reaction.namespace AS reaction_namespace,
+               fluxomics.measurement, fluxomics.uncertainty
+        FROM fluxomics JOIN reaction ON reaction.id = fluxomics.reaction_id
+        """,
+        "ALTER TABLE repeated_fluxomics ADD PRIMARY KEY (id)",
+        """
+        CREATE UNIQUE INDEX ON repeated_fluxomics (
+            sample_id, reaction_namespace, reaction_identifier
+        )
+        """,
+        """
+        CREATE INDEX ON repeated_fluxomics (
+            reaction_identifier, reaction_namespace
+        )
+        """,
+        "CREATE INDEX ON repeated_fluxomics (updated)",
+    ],
+}
+
+# The tables of each layout.
+TABLES = {
+    "dictionary": ["dictionary_fluxomics", "dictionary_reaction"],
+    "repeated": ["repeated_fluxomics"],
+}
+
+
+@pytest.mark.benchmark
+def test_dictionary_storage(session, benchmark_data):
+    """Compare the dictionary with the names repeated in every row."""
+    sizes = {}
+    for layout, statements in LAYOUTS.items():
+        for statement in statements:
+            session.execute(statement)
+        sizes[layout] = sum(_size(session, table) for table in TABLES[layout])
+    rows = session.execute("SELECT count(*) FROM fluxomics").scalar()
+    print(
+        f"\n{rows} fluxomics rows"
+        f"\ndictionary: {sizes['dictionary'] / 2 ** 20:.1f} MiB"
+        f"\nrepeated names: {sizes['repeated'] / 2 ** 20:.1f} MiB"
+    )
+    assert sizes["dictionary"] < sizes["repeated"]
@@ -0,0 +1,161 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark strain lineages in the closure table against recursive queries."""
+
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import text
+
+from warehouse import lineage, models
+
+
+STRAINS = 100000
+# The strains form a tree in which every strain has this many children.
+CHILDREN = 4
+# Keep clear of the ids of the fixtures.
+OFFSET = 1000000
+
+
+def _recursive_descendants(session, strain_id):
+    """Return the descendants and depths with a recursive query."""
+    return session.execute(
+        text(
+            """
+            WITH RECURSIVE lineage (id, depth) AS (
+                SELECT id, 0 FROM strain WHERE id = :id
+                UNION ALL
+                SELECT strain.id, lineage.depth + 1
+                FROM strain JOIN lineage ON strain.parent_id = lineage.id
+                WHERE strain.project_id IN (1) OR strain.project_id IS NULL
+            )
+            SELECT strain.*, lineage.depth
+            FROM strain JOIN lineage ON lineage.id = strain.id
+            WHERE lineage.depth > 0
+            ORDER BY lineage.depth, strain.id
+            """
+        ),
+        {"id": strain_id},
+    ).fetchall()
+
+
+def _recursive_depth(session, strain_id):
+    """Return the number of ancestors with a recursive query."""
+    return session.execute(
+        text(
+            """
+            WITH RECURSIVE lineage (parent_id, depth) AS (
+                SELECT parent_id, 0 FROM strain WHERE id = :id
+                UNION ALL
+                SELECT strain.parent_id, lineage.depth + 1
+                FROM strain JOIN lineage ON strain.id = lineage.parent_id
+            )
+            SELECT max(depth) FROM lineage
+            """
+        ),
+        {"id": strain_id},
+    ).scalar()
+
+
+def _closure_descendants(session, strain_id):
+    """Return the descendants and depths from the closure table."""
+    Closure = models.StrainClosure
+    return session.execute(
+        session.query(models.Strain, Closure.depth)
+        .join(Closure, Closure.descendant_id == models.Strain.id)
+        .filter(Closure.ancestor_id == strain_id)
+        .filter(Closure.depth > 0)
+        .filter(lineage._reachable(Closure))
+        .order_by(Closure.depth, models.Strain.id)
+        .statement
+    ).fetchall()
+
+
+def _closure_depth(session, strain_id):
+    """Return the number of ancestors from the closure table."""
+    return session.execute(
+        session.query(models.StrainClosure.depth)
+        .filter(models.StrainClosure.descendant_id == strain_id)
+        .order_by(models.StrainClosure.depth.desc())
+        .limit(1)
+        .statement
+    ).scalar()
+
+
+@pytest.mark.benchmark
+def test_strain_lineage(session, data_fixtures, timeit):
+    g.jwt_claims = {"prj": {1: "read"}}
+    start = time.perf_counter()
+    session.execute(
+        text(
+            """
+            INSERT INTO strain (
+                id, created, project_id, organism_id, parent_id, name, genotype
+            )
+            SELECT :offset + i, now(), 1, :organism_id,
+                   CASE WHEN i > 1
+                   THEN :offset + (i + :children - 2) / :children END,
+                   'Strain ' || i, '+gene' || i
+            FROM generate_series(1, :strains) AS i
+            """
+        ),
+        {
+            "offset": OFFSET,
+            "children": CHILDREN,
+            "strains": STRAINS,
+            "organism_id": data_fixtures["organism"].id,
+        },
+    )
+    links = session.query(models.StrainClosure).count()
+    print(
+        f"\n{STRAINS} strains with {links} closure links inserted in "
+        f"{time.perf_counter() - start:.1f} s"
+    )
+    session.execute("ANALYZE strain")
+    session.execute("ANALYZE strain_closure")
+
+    # A strain with five generations below it, and a leaf.
+    strain = models.Strain.query.get(OFFSET + 5)
+    leaf = models.Strain.query.get(OFFSET + STRAINS)
+    descendants = lineage.descendants(strain)
+    assert len(descendants) == len(_recursive_descendants(session, strain.id))
+    assert _closure_depth(session, leaf.id) == _recursive_depth(
+        session, leaf.id
+    )
+
+    results = {}
+    for name, function in [
+        (
+            "descendants, recursive",
+            lambda: _recursive_descendants(session, strain.id),
+        ),
+        (
+            "descendants, closure",
+            lambda: _closure_descendants(session, strain.id),
+        ),
+        ("depth, recursive", lambda: _recursive_depth(session, leaf.id)),
+        ("depth, closure", lambda: _closure_depth(session, leaf.id)),
+        ("ancestors, closure", lambda: lineage.ancestors(leaf)),
+        (
+            "common ancestor, closure",
+            lambda: lineage.common_ancestor([leaf.id, OFFSET + STRAINS - 7]),
+        ),
+    ]:
+        results[name] = timeit(function)
+        print(f"{name}: {results[name] * 1000:.1f} ms")
+    print(f"{len(descendants)} descendants")
+    assert results["descendants, closure"] < results["descendants, recursive"]
@@ -0,0 +1,126 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark storing dense metabolomics packed into arrays."""
+
+import pytest
+
+from warehouse import models
+
+
+SAMPLES = 20
+COMPOUNDS_PER_SAMPLE = 2000
+
+
+def _size(session, table):
+    """Return the size of a table with its indexes and TOAST in bytes."""
+    return session.execute(
+        "SELECT pg_total_relation_size(CAST(:table AS regclass))",
+        {"table": table},
+    ).scalar()
+
+
+def _experiment(session, fixtures, name):
+    """Add an experiment of project 1 with a condition of `SAMPLES` samples."""
+    experiment = models.Experiment(project_id=1, name=name, description="")
+    condition = models.Condition(
+        experiment=experiment,
+        strain=fixtures["strain"],
+        medium=fixtures["medium"],
+        name="Condition",
+    )
+    session.add(condition)
+    session.flush()
+    session.execute(
+        """
+        INSERT INTO sample (created, condition_id, name, start_time)
+        SELECT now(), :condition_id, 'Sample ' || i, now()
+        FROM generate_series(1, :samples) AS i
+        """,
+        {"condition_id": condition.id, "samples": SAMPLES},
+    )
+    return experiment
+
+
+@pytest.mark.benchmark
+def test_packed_metabolomics(client, tokens, session, timeit, data_fixtures):
+    """Compare a row per measurement with a packed row per sample."""
+    rows = _experiment(session, data_fixtures, "Rows")
+    packed = _experiment(session, data_fixtures, "Packed")
+    parameters = {
+        "compounds": COMPOUNDS_PER_SAMPLE,
+        "rows": rows.id,
+        "packed": packed.id,
+    }
+    for statement in [
+        """
+        INSERT INTO compound (identifier, namespace, name)
+        SELECT 'C' || i, 'bigg.metabolite', 'Compound ' || i
+        FROM generate_series(1, :compounds) AS i
+        """,
+        """
+        INSERT INTO metabolomics (
+            created, updated, sample_id, compound_id, measurement, uncertainty
+        )
+        SELECT now(), now(), sample.id, compound.id, random(), 0
+        FROM sample
+        JOIN condition ON condition.id = sample.condition_id, compound
+        WHERE condition.experiment_id = :rows
+        """,
+        """
+        INSERT INTO packed_metabolomics (
+            created, updated, sample_id, ids, compound_ids, measurements,
+            uncertainties
+        )
+        SELECT now(), now(), sample.id,
+               array_agg(nextval(pg_get_serial_sequence('metabolomics', 'id'))),
+               array_agg(compound.id), array_agg(random()),
+               array_agg(0::float8)
+        FROM sample
+        JOIN condition ON condition.id = sample.condition_id, compound
+        WHERE condition.experiment_id = :packed
+        GROUP BY sample.id
+        """,
+    ]:
+        session.execute(statement, parameters)
+    session.execute("ANALYZE")
+    sizes = {
+        layout: _size(session, table)
+        for layout, table in [
+            ("rows", "metabolomics"),
+            ("packed", "packed_metabolomics"),
+        ]
+    }
+
+    def load(experiment):
+        response = client.get(
+            f"/experiments/{experiment.id}/data",
+            headers={"Authorization": f"Bearer {tokens['read']}"},
+        )
+        assert response.status_code == 200
+
+    timings = {
+        "rows": timeit(lambda: load(rows), repeat=3),
+        "packed": timeit(lambda: load(packed), repeat=3),
+    }
+    print(
+        f"\n{SAMPLES * COMPOUNDS_PER_SAMPLE} metabolomics per experiment"
+        f"\nrows: {sizes['rows'] / 2 ** 20:.1f} MiB, "
+        f"{timings['rows'] * 1000:.1f} ms"
+        f"\npacked: {sizes['packed'] / 2 ** 20:.1f} MiB, "
+        f"{timings['packed'] * 1000:.1f} ms"
+    )
+    assert sizes["packed"] < sizes["rows"]
+    assert timings["packed"] < timings["rows"]
@@ -0,0 +1,56 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the visibility predicates against nested EXISTS subqueries."""
+
+import pytest
+from flask import g
+
+from warehouse import models
+from warehouse.visibility import visible
+
+
+def _nested_exists(public):
+    """Return the hand-written predicate previously used for fluxomics."""
+    return models.Fluxomics.sample.has(
+        models.Sample.condition.has(
+            models.Condition.experiment.has(
+                models.Experiment.project_id.in_(g.jwt_claims["prj"])
+            )
+        )
+    ) | models.Fluxomics.sample.has(
+        models.Sample.condition.has(
+            models.Condition.experiment.has(
+                models.Experiment.project_id.is_(None)
+            )
+        )
+    )
+
+
+@pytest.mark.benchmark
+def test_fluxomics_visibility(session, benchmark_data, timeit):
+    g.jwt_claims = {"prj": {1: "read", 2: "read"}}
+    results = {}
+    for name, predicate in [
+        ("nested EXISTS", _nested_exists(public=True)),
+        ("semi-join", visible(models.Fluxomics)),
+    ]:
+        statement = (
+            session.query(models.Fluxomics.id).filter(predicate).statement
+        )
+        rows = session.execute(statement).fetchall()
+        results[name] = timeit(lambda: session.execute(statement).fetchall())
+        print(f"{name}: {len(rows)} rows in {results[name] * 1000:.1f} ms")
+    assert results["semi-join"] <= results["nested EXISTS"]
@@ -19,6 +19,7 @@ from datetime import datetime
 
 import pytest
 from jose import jwt
+from sqlalchemy import event
 
 from warehouse import models
 from warehouse.app import app as app_
@@ -26,6 +27,25 @@ from warehouse.app import init_app
 from warehouse.models import db as db_
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="Run the database benchmarks in `tests/benchmarks`.",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless explicitly requested."""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="Benchmarks only run with --benchmark.")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(scope="session")
 def app():
     """Provide an initialized Flask for use in certain test cases."""
@@ -89,16 +109,22 @@ def session(reset_tables, connection):
 
 @pytest.fixture(scope="session")
 def tokens(app):
-    """Provide read, write and admin JWT claims to project 1."""
+    """Provide read, write and admin JWT claims of user 1 to project 1."""
     return {
         "read": jwt.encode(
-            {"prj": {1: "read"}}, app.config["JWT_PRIVATE_KEY"], "RS512"
+            {"sub": "1", "prj": {1: "read"}},
+            app.config["JWT_PRIVATE_KEY"],
+            "RS512",
         ),
         "write": jwt.encode(
-            {"prj": {1: "write"}}, app.config["JWT_PRIVATE_KEY"], "RS512"
+            {"sub": "1", "prj": {1: "write"}},
+            app.config["JWT_PRIVATE_KEY"],
+            "RS512",
         ),
         "admin": jwt.encode(
-            {"prj": {1: "admin"}}, app.config["JWT_PRIVATE_KEY"], "RS512"
+            {"sub": "1", "prj": {1: "admin"}},
+            app.config["JWT_PRIVATE_KEY"],
+            "RS512",
         ),
     }
 
@@ -152,3 +178,130 @@ def data_fixtures(session):
         "condition": condition,
         "sample": sample,
     }
+
+
+@pytest.fixture(scope="function")
+def measurement_fixtures(session, data_fixtures):
+    """
+    Add a second sample and one measurement of every type to both samples.
+
+    Having more than one row per relation makes per-row lazy loading (N+1
+    queries) visible in the number of statements a request executes.
+    """
+    samples = [
+        data_fixtures["sample"],
+        models.Sample(
+            condition=data_fixtures["condition"],
+            name="Second sample fixture",
+            start_time=datetime(2019, 10, 28, 15, 00),
+            end_time=datetime(2019, 10, 28, 16, 00),
+        ),
+    ]
+    measurements = {
+        "fluxomics": [],
+        "metabolomics": [],
+        "proteomics": [],
+        "uptake_secretion_rates": [],
+        "molar_yields": [],
+        "growth_rates": [],
+    }
+    for sample in samples:
+        measurements["fluxomics"].append(
+            models.Fluxomics(
+                sample=sample,
+                reaction_name="Glucose-6-phosphate isomerase",
+                reaction_identifier="PGI",
+                reaction_namespace="bigg.reaction",
+                measurement=1.0,
+                uncertainty=0.1,
+            )
+        )
+        measurements["metabolomics"].append(
+            models.Metabolomics(
+                sample=sample,
+                compound_name="D-Glucose",
+                compound_identifier="glc__D",
+                compound_namespace="bigg.metabolite",
+                measurement=1.0,
+                uncertainty=0.1,
+            )
+        )
+        measurements["proteomics"].append(
+            models.Proteomics(
+                sample=sample,
+                identifier="P0A6T1",
+                name="G6PI_ECOLI",
+                full_name="Glucose-6-phosphate isomerase",
+                gene={"name": "pgi", "locus_tag": "b4025"},
+                measurement=1.0,
+                uncertainty=0.1,
+            )
+        )
+        measurements["uptake_secretion_rates"].append(
+            models.UptakeSecretionRates(
+                sample=sample,
+                compound_name="D-Glucose",
+                compound_identifier="glc__D",
+                compound_namespace="bigg.metabolite",
+                measurement=-10.0,
+                uncertainty=0.1,
+            )
+        )
+        measurements["molar_yields"].append(
+            models.MolarYields(
+                sample=sample,
+                product_name="Acetate",
+                product_identifier="ac",
+                product_namespace="bigg.metabolite",
+                substrate_name="D-Glucose",
+                substrate_identifier="glc__D",
+                substrate_namespace="bigg.metabolite",
+                measurement=0.5,
+                uncertainty=0.1,
+            )
+        )
+        measurements["growth_rates"].append(
+            models.Growth(sample=sample, measurement=0.5, uncertainty=0.01)
+        )
+    session.add(samples[1])
+    for rows in measurements.values():
+        session.add_all(rows)
+    session.commit()
+    return {**data_fixtures, "samples": samples, **measurements}
+
+
+class QueryCounter(object):
+    """Record the SQL statements executed on the database engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, many):
+        self.statements.append(statement)
+
+
+@pytest.fixture(scope="function")
+def query_counter(session):
+    """
+    Provide a context manager counting the SQL statements in its scope.
+
+    Example
+    -------
+    with query_counter as queries:
+        client.get("/organisms")
+    assert len(queries) <= 1
+
+    """
+    return QueryCounter(db_.engine)
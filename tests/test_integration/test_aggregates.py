@@ -0,0 +1,136 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the statistics of the measurements of conditions."""
+
+import math
+
+import pytest
+
+from warehouse import models
+
+
+def test_condition_statistics(client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["samples"][1]
+    sample.fluxomics[0].measurement = 3.0
+    session.add(
+        models.Fluxomics(
+            sample=sample,
+            reaction_name="Triose-phosphate isomerase",
+            reaction_identifier="TPI",
+            reaction_namespace="bigg.reaction",
+            measurement=2.0,
+            uncertainty=None,
+        )
+    )
+    session.commit()
+    response = client.get(
+        f"/conditions/{measurement_fixtures['condition'].id}/statistics",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    statistics = response.json
+    assert statistics["condition_id"] == measurement_fixtures["condition"].id
+    pgi, tpi = statistics["fluxomics"]
+    assert pgi["reaction_identifier"] == "PGI"
+    assert pgi["reaction_name"] == "Glucose-6-phosphate isomerase"
+    assert pgi["count"] == 2
+    assert pgi["mean"] == pytest.approx(2.0)
+    assert pgi["stddev"] == pytest.approx(math.sqrt(2))
+    assert (pgi["min"], pgi["max"]) == (1.0, 3.0)
+    assert pgi["uncertainty"] == pytest.approx(math.sqrt(0.02) / 2)
+    assert tpi["count"] == 1
+    assert tpi["stddev"] is None
+    assert tpi["uncertainty"] is None
+    (growth_rate,) = statistics["growth_rates"]
+    assert growth_rate["mean"] == pytest.approx(0.5)
+    (molar_yield,) = statistics["molar_yields"]
+    assert molar_yield["substrate_identifier"] == "glc__D"
+
+
+def test_experiment_statistics(client, tokens, session, measurement_fixtures):
+    response = client.get(
+        f"/experiments/{measurement_fixtures['experiment'].id}/statistics",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"types": "proteomics,growth_rates"},
+    )
+    assert response.status_code == 200
+    statistics = response.json
+    assert set(statistics) == {
+        "experiment_id",
+        "proteomics",
+        "growth_rates",
+        "conditions",
+    }
+    (condition,) = statistics["conditions"]
+    assert set(condition) == {"condition_id", "proteomics", "growth_rates"}
+    (proteomics,) = condition["proteomics"]
+    assert proteomics["identifier"] == "P0A6T1"
+    assert proteomics["count"] == 2
+
+
+def test_experiment_statistics_pooled(
+    client, tokens, session, measurement_fixtures
+):
+    experiment = measurement_fixtures["experiment"]
+    condition = models.Condition(
+        experiment=experiment,
+        strain=measurement_fixtures["condition"].strain,
+        medium=measurement_fixtures["condition"].medium,
+        name="Control",
+    )
+    sample = models.Sample(
+        condition=condition,
+        name="Control sample",
+        start_time=measurement_fixtures["sample"].start_time,
+    )
+    session.add(
+        models.Fluxomics(
+            sample=sample,
+            reaction_name="Glucose-6-phosphate isomerase",
+            reaction_identifier="PGI",
+            reaction_namespace="bigg.reaction",
+            measurement=4.0,
+            uncertainty=None,
+        )
+    )
+    session.commit()
+    response = client.get(
+        f"/experiments/{experiment.id}/statistics",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"types": "fluxomics"},
+    )
+    assert response.status_code == 200
+    statistics = response.json
+    assert statistics["experiment_id"] == experiment.id
+    assert [
+        (summary["condition_id"], summary["fluxomics"][0]["count"])
+        for summary in statistics["conditions"]
+    ] == [(measurement_fixtures["condition"].id, 2), (condition.id, 1)]
+    # The measurements of both conditions are pooled.
+    (pgi,) = statistics["fluxomics"]
+    assert pgi["reaction_identifier"] == "PGI"
+    assert pgi["count"] == 3
+    assert pgi["mean"] == pytest.approx(2.0)
+    assert (pgi["min"], pgi["max"]) == (1.0, 4.0)
+    # Only the measurements with an uncertainty propagate theirs.
+    assert pgi["uncertainty"] == pytest.approx(math.sqrt(0.02) / 2)
+
+
+def test_statistics_not_visible(client, session, measurement_fixtures):
+    response = client.get(
+        f"/conditions/{measurement_fixtures['condition'].id}/statistics"
+    )
+    assert response.status_code == 404
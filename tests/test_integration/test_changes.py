@@ -0,0 +1,196 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test querying for changes with `updated_since` and tombstones."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from warehouse import models
+
+
+@pytest.fixture(scope="function")
+def history(session, measurement_fixtures):
+    """Date back all fixtures but the measurements of the second sample."""
+    past = datetime.utcnow() - timedelta(days=1)
+    for model in [
+        models.Organism,
+        models.Strain,
+        models.Experiment,
+        models.Medium,
+        models.MediumCompound,
+        models.Condition,
+        models.Sample,
+        models.Fluxomics,
+        models.Metabolomics,
+        models.Proteomics,
+        models.UptakeSecretionRates,
+        models.MolarYields,
+        models.Growth,
+    ]:
+        query = model.query
+        if hasattr(model, "sample_id"):
+            recent = measurement_fixtures["samples"][1].id
+            query = query.filter(model.sample_id != recent)
+        query.update({"updated": past}, synchronize_session=False)
+    session.commit()
+    return past + timedelta(hours=1)
+
+
+def test_collection_updated_since(client, tokens, session, history):
+    headers = {"Authorization": f"Bearer {tokens['read']}"}
+    response = client.get("/fluxomics", headers=headers)
+    assert len(response.json) == 2
+    response = client.get(
+        f"/fluxomics?updated_since={history.isoformat()}", headers=headers
+    )
+    assert response.status_code == 200
+    assert len(response.json) == 1
+    response = client.get(
+        f"/experiments?updated_since={history.isoformat()}", headers=headers
+    )
+    assert response.json == []
+
+
+def test_collection_updated_since_time_zone(client, tokens, session, history):
+    # The same point in time as `history`, two hours ahead of UTC.
+    updated_since = (history + timedelta(hours=2)).isoformat() + "+02:00"
+    response = client.get(
+        "/growth-rates",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"updated_since": updated_since},
+    )
+    assert response.status_code == 200
+    assert len(response.json) == 1
+
+
+def test_experiment_data_updated_since(
+    client, tokens, session, measurement_fixtures, history
+):
+    response = client.get(
+        f"/experiments/{measurement_fixtures['experiment'].id}/data",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"updated_since": history.isoformat()},
+    )
+    assert response.status_code == 200
+    # Only the sample with recent measurements, and its condition.
+    (condition,) = response.json["conditions"]
+    assert len(condition["medium"]["compounds"]) == 1
+    (recent,) = condition["samples"]
+    assert recent["id"] == measurement_fixtures["samples"][1].id
+    assert len(recent["fluxomics"]) == 1
+    assert recent["growth_rate"]["measurement"] == 0.5
+
+
+def test_experiment_data_unchanged(
+    client, tokens, session, measurement_fixtures, history
+):
+    response = client.get(
+        f"/experiments/{measurement_fixtures['experiment'].id}/data",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={
+            "updated_since": (history + timedelta(days=1)).isoformat()
+        },
+    )
+    assert response.status_code == 200
+    assert response.json["conditions"] == []
+
+
+def test_condition_data_updated_since(
+    client, tokens, session, measurement_fixtures, history
+):
+    # The requested condition is included although it did not change.
+    condition = measurement_fixtures["condition"]
+    response = client.get(
+        f"/conditions/{condition.id}/data",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={
+            "updated_since": (history + timedelta(days=1)).isoformat()
+        },
+    )
+    assert response.status_code == 200
+    assert response.json["id"] == condition.id
+    assert response.json["samples"] == []
+
+
+def test_tombstones(client, tokens, session, measurement_fixtures):
+    deleted = datetime.utcnow() - timedelta(minutes=1)
+    experiment_id = measurement_fixtures["experiment"].id
+    response = client.delete(
+        f"/experiments/{experiment_id}",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 204
+
+    response = client.get(
+        "/tombstones",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"updated_since": deleted.isoformat()},
+    )
+    assert response.status_code == 200
+    tombstones = {}
+    for tombstone in response.json["tombstones"]:
+        tombstones.setdefault(tombstone["resource"], set()).add(
+            tombstone["object_id"]
+        )
+    # The rows deleted through `ON DELETE CASCADE` are left to the clients.
+    assert tombstones == {"experiment": {experiment_id}}
+
+    # Tombstones are only visible to the project of the deleted rows.
+    response = client.get("/tombstones")
+    assert response.json == {"tombstones": [], "next": None}
+
+
+def test_tombstone_of_child(client, tokens, session, measurement_fixtures):
+    deleted = datetime.utcnow() - timedelta(minutes=1)
+    sample_id = measurement_fixtures["sample"].id
+    response = client.delete(
+        f"/samples/{sample_id}",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 204
+
+    response = client.get(
+        "/tombstones",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"updated_since": deleted.isoformat()},
+    )
+    # The project of a child is looked up through its parents.
+    assert [
+        (tombstone["resource"], tombstone["object_id"])
+        for tombstone in response.json["tombstones"]
+    ] == [("sample", sample_id)]
+
+
+def test_tombstones_paged(client, tokens, session, measurement_fixtures):
+    for sample in measurement_fixtures["samples"]:
+        client.delete(
+            f"/samples/{sample.id}",
+            headers={"Authorization": f"Bearer {tokens['admin']}"},
+        )
+    headers = {"Authorization": f"Bearer {tokens['read']}"}
+    first = client.get(
+        "/tombstones", headers=headers, query_string={"limit": 1}
+    ).json
+    assert len(first["tombstones"]) == 1
+    assert first["next"] == first["tombstones"][0]["id"]
+    second = client.get(
+        "/tombstones",
+        headers=headers,
+        query_string={"limit": 1, "after": first["next"]},
+    ).json
+    assert second["tombstones"][0]["id"] > first["next"]
+    assert second["next"] is None
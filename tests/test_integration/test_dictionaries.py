@@ -0,0 +1,234 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the dictionary entries of measured reactions, compounds and proteins."""
+
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from warehouse import models
+from warehouse.app import db
+
+
+def test_entries_shared(session, measurement_fixtures):
+    first, second = measurement_fixtures["fluxomics"]
+    assert first.reaction_id == second.reaction_id
+    assert models.Reaction.query.count() == 1
+    # Metabolites, uptake rates and molar yields share the compounds.
+    assert {
+        (compound.identifier, compound.name)
+        for compound in models.Compound.query
+    } == {("glc__D", "D-Glucose"), ("ac", "Acetate")}
+    molar_yield = measurement_fixtures["molar_yields"][0]
+    metabolomics = measurement_fixtures["metabolomics"][0]
+    assert molar_yield.substrate_id == metabolomics.compound_id
+
+
+def test_batch_post_shares_entries(
+    client, tokens, session, measurement_fixtures
+):
+    sample = measurement_fixtures["sample"]
+    response = client.post(
+        "/fluxomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={
+            "body": [
+                {
+                    "sample_id": sample.id,
+                    "reaction_name": name,
+                    "reaction_identifier": identifier,
+                    "reaction_namespace": "bigg.reaction",
+                    "measurement": 1.0,
+                    "uncertainty": 0.1,
+                }
+                for name, identifier in [
+                    ("Triose-phosphate isomerase", "TPI"),
+                    ("Phosphofructokinase", "PFK"),
+                ]
+            ]
+            + [
+                {
+                    "sample_id": measurement_fixtures["samples"][1].id,
+                    "reaction_name": "Triose-phosphate isomerase",
+                    "reaction_identifier": "TPI",
+                    "reaction_namespace": "bigg.reaction",
+                    "measurement": 2.0,
+                    "uncertainty": 0.1,
+                }
+            ],
+        },
+    )
+    assert response.status_code == 201
+    assert sorted(
+        reaction.identifier for reaction in models.Reaction.query
+    ) == ["PFK", "PGI", "TPI"]
+    tpi = models.Reaction.query.filter_by(identifier="TPI").one()
+    assert models.Fluxomics.query.filter_by(reaction_id=tpi.id).count() == 2
+
+
+def test_put_renames_own_entry(client, tokens, session, measurement_fixtures):
+    first, second = measurement_fixtures["fluxomics"]
+    response = client.put(
+        f"/fluxomics/{first.id}",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+        json={"reaction_name": "Phosphoglucose isomerase"},
+    )
+    assert response.status_code == 200
+    session.expire_all()
+    assert first.reaction_name == "Phosphoglucose isomerase"
+    assert first.reaction_identifier == "PGI"
+    assert first.reaction_namespace == "bigg.reaction"
+    # The entry of the other measurement is left as it was.
+    assert second.reaction_name == "Glucose-6-phosphate isomerase"
+    assert first.reaction_id != second.reaction_id
+    response = client.get(
+        f"/fluxomics/{first.id}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.json["reaction_name"] == "Phosphoglucose isomerase"
+
+
+def test_put_changes_identifier(client, tokens, session, measurement_fixtures):
+    first, second = measurement_fixtures["fluxomics"]
+    response = client.put(
+        f"/fluxomics/{first.id}",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+        json={"reaction_identifier": "PGI2"},
+    )
+    assert response.status_code == 200
+    session.expire_all()
+    # The new entry takes the names of the previous one, which is unchanged.
+    assert first.reaction_identifier == "PGI2"
+    assert first.reaction_name == "Glucose-6-phosphate isomerase"
+    assert second.reaction_identifier == "PGI"
+    assert first.reaction_id != second.reaction_id
+
+
+def test_upsert_renamed(client, tokens, session, measurement_fixtures):
+    """Measurements naming their entity differently are not duplicated."""
+    sample = measurement_fixtures["sample"]
+    (measurement,) = sample.fluxomics
+    response = client.post(
+        "/fluxomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={
+            "upsert": True,
+            "body": [
+                {
+                    "sample_id": sample.id,
+                    "reaction_name": "Phosphoglucose isomerase",
+                    "reaction_identifier": "PGI",
+                    "reaction_namespace": "bigg.reaction",
+                    "measurement": 2.0,
+                    "uncertainty": 0.1,
+                }
+            ],
+        },
+    )
+    assert response.status_code == 201
+    assert response.json == [{"id": measurement.id}]
+    session.expire_all()
+    assert sample.fluxomics.count() == 1
+    assert measurement.measurement == 2.0
+    assert measurement.reaction_name == "Phosphoglucose isomerase"
+    # The entry shared with the other sample is left as it was.
+    other = measurement_fixtures["samples"][1].fluxomics.one()
+    assert other.reaction_name == "Glucose-6-phosphate isomerase"
+    assert models.Reaction.query.count() == 2
+
+
+def _wait_for_lock():
+    """Wait until a statement waits for a lock held by another transaction."""
+    for _ in range(50):
+        waiting = db.engine.execute(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE wait_event_type = 'Lock'"
+        ).scalar()
+        if waiting:
+            return
+        time.sleep(0.1)
+    raise AssertionError("The statement did not wait for the lock.")
+
+
+def test_entries_committed_concurrently(app, reset_tables):
+    """Entries committed while the statement waits for them are returned."""
+    reactions = models.Reaction.__table__
+    ids = {}
+
+    def resolve():
+        with app.app_context():
+            session = Session(bind=db.engine)
+            try:
+                ids.update(
+                    models.entry_ids(
+                        session,
+                        models.Reaction,
+                        [
+                            (
+                                "TPI",
+                                "bigg.reaction",
+                                "Triose-phosphate isomerase",
+                            )
+                        ],
+                    )
+                )
+                session.commit()
+            finally:
+                session.close()
+
+    try:
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            (inserted_id,) = connection.execute(
+                reactions.insert().values(
+                    identifier="TPI",
+                    namespace="bigg.reaction",
+                    name="Triose-phosphate isomerase",
+                )
+            ).inserted_primary_key
+            thread = threading.Thread(target=resolve)
+            thread.start()
+            _wait_for_lock()
+            transaction.commit()
+        thread.join(timeout=5)
+        assert ids == {
+            ("TPI", "bigg.reaction", "Triose-phosphate isomerase"): inserted_id
+        }
+    finally:
+        db.engine.execute(reactions.delete())
+
+
+def test_batch_patch_completes_entries(
+    client, tokens, session, measurement_fixtures
+):
+    first, second = measurement_fixtures["proteomics"]
+    response = client.patch(
+        "/proteomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={
+            "body": [
+                {"id": first.id, "full_name": "Phosphoglucose isomerase"},
+                {"id": second.id, "full_name": "Phosphoglucose isomerase"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    session.expire_all()
+    assert first.protein_id == second.protein_id
+    assert first.identifier == "P0A6T1"
+    assert first.name == "G6PI_ECOLI"
+    assert first.full_name == "Phosphoglucose isomerase"
@@ -21,6 +21,10 @@ Expect to see GET, POST for list endpoints, then GET, PUT, DELETE for item
 endpoints, repeated for each resource type.
 """
 
+import re
+
+import pytest
+from jose import jwt
 from sqlalchemy import Integer, cast
 
 from warehouse import models
@@ -99,6 +103,25 @@ def test_post_strain(client, tokens, session, data_fixtures):
     assert response.status_code == 201
 
 
+def test_post_strain_parent(client, tokens, session, data_fixtures):
+    parent = data_fixtures["strain"]
+    response = client.post(
+        "/strains",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+        json={
+            "project_id": 1,
+            "organism_id": data_fixtures["organism"].id,
+            "parent_id": parent.id,
+            "name": "Child strain",
+            "genotype": "Some genotype",
+        },
+    )
+    assert response.status_code == 201
+    strain = models.Strain.query.get(response.json["id"])
+    assert strain.parent_id == parent.id
+    assert parent.parent_id is None
+
+
 def test_get_strain(client, tokens, session, data_fixtures):
     response = client.get(
         f"/strains/{data_fixtures['strain'].id}",
@@ -189,6 +212,138 @@ def test_delete_experiment(client, tokens, session, data_fixtures):
     )
 
 
+def test_delete_experiment_cascade(
+    client, tokens, session, measurement_fixtures
+):
+    """Ensure the database removes everything belonging to the experiment."""
+    response = client.delete(
+        f"/experiments/{measurement_fixtures['experiment'].id}",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 204
+    for model in [
+        models.Condition,
+        models.Sample,
+        models.Fluxomics,
+        models.Metabolomics,
+        models.Proteomics,
+        models.UptakeSecretionRates,
+        models.MolarYields,
+        models.Growth,
+    ]:
+        assert model.query.count() == 0
+    # The medium is shared and must survive its conditions.
+    assert models.Medium.query.count() == 1
+
+
+def test_clone_experiment(client, tokens, session, measurement_fixtures):
+    experiment = measurement_fixtures["experiment"]
+    response = client.post(
+        f"/experiments/{experiment.id}/clone",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"name": "Clone"},
+    )
+    assert response.status_code == 201
+    clone = models.Experiment.query.get(response.json["id"])
+    assert clone.name == "Clone"
+    assert clone.project_id == experiment.project_id
+    assert clone.description == experiment.description
+
+    (original_condition,) = experiment.conditions
+    (condition,) = clone.conditions
+    assert condition.id != original_condition.id
+    assert condition.strain_id == original_condition.strain_id
+    assert condition.medium_id == original_condition.medium_id
+    original_samples = original_condition.samples.order_by(models.Sample.id)
+    samples = condition.samples.order_by(models.Sample.id).all()
+    assert [sample.name for sample in samples] == [
+        sample.name for sample in original_samples
+    ]
+    for sample, original in zip(samples, original_samples):
+        assert sample.id != original.id
+        assert sample.start_time == original.start_time
+        assert sample.fluxomics.count() == 1
+        assert sample.proteomics.one().gene == original.proteomics.one().gene
+        assert sample.growth_rate.measurement == (
+            original.growth_rate.measurement
+        )
+    # The originals are untouched.
+    assert models.Fluxomics.query.count() == 4
+    assert original_condition.samples.count() == 2
+
+
+def test_clone_experiment_other_project(
+    client, tokens, session, measurement_fixtures
+):
+    response = client.post(
+        f"/experiments/{measurement_fixtures['experiment'].id}/clone",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"project_id": 2},
+    )
+    assert response.status_code == 403
+
+
+def _clone_headers(app):
+    """Return the headers of a user reading project 1 and writing project 2."""
+    token = jwt.encode(
+        {"sub": "1", "prj": {1: "read", 2: "write"}},
+        app.config["JWT_PRIVATE_KEY"],
+        "RS512",
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_clone_experiment_copies_shared(
+    app, client, session, measurement_fixtures
+):
+    strain = measurement_fixtures["strain"]
+    strain.parent = models.Strain(
+        project_id=1,
+        name="Parent fixture",
+        organism=measurement_fixtures["organism"],
+        genotype="Lorem",
+    )
+    medium = measurement_fixtures["medium"]
+    medium.project_id = 1
+    session.commit()
+    response = client.post(
+        f"/experiments/{measurement_fixtures['experiment'].id}/clone",
+        headers=_clone_headers(app),
+        json={"project_id": 2},
+    )
+    assert response.status_code == 201
+    (condition,) = models.Experiment.query.get(response.json["id"]).conditions
+    # The clone refers to copies in its project, with their lineage.
+    copy = condition.strain
+    assert (copy.project_id, copy.name) == (2, strain.name)
+    assert (copy.parent.project_id, copy.parent.name) == (2, "Parent fixture")
+    assert copy.organism.project_id == 2
+    assert copy.parent.organism_id == copy.organism_id
+    assert models.StrainClosure.query.get((copy.parent_id, copy.id)).depth == 1
+    assert (condition.medium.project_id, condition.medium.name) == (
+        2,
+        medium.name,
+    )
+    assert condition.medium.compounds.count() == 1
+    # The originals are untouched.
+    assert strain.project_id == 1
+    assert models.Strain.query.count() == 4
+    assert medium.compounds.count() == 1
+
+
+def test_clone_experiment_unreadable_strain(
+    app, client, session, measurement_fixtures
+):
+    measurement_fixtures["strain"].project_id = 3
+    session.commit()
+    response = client.post(
+        f"/experiments/{measurement_fixtures['experiment'].id}/clone",
+        headers=_clone_headers(app),
+        json={"project_id": 2},
+    )
+    assert response.status_code == 403
+
+
 def test_get_experiment_data(client, tokens, session, data_fixtures):
     response = client.get(
         f"/experiments/{data_fixtures['experiment'].id}/data",
@@ -197,6 +352,69 @@ def test_get_experiment_data(client, tokens, session, data_fixtures):
     assert response.status_code == 200
 
 
+def test_get_experiment_data_included(
+    client, tokens, session, query_counter, measurement_fixtures
+):
+    with query_counter as queries:
+        response = client.get(
+            f"/experiments/{measurement_fixtures['experiment'].id}/data"
+            f"?include=fluxomics,growth_rate",
+            headers={"Authorization": f"Bearer {tokens['read']}"},
+        )
+    assert response.status_code == 200
+    (condition,) = response.json["conditions"]
+    assert "strain" not in condition
+    assert "medium" not in condition
+    for sample in condition["samples"]:
+        assert set(sample) == {
+            "id",
+            "condition_id",
+            "name",
+            "start_time",
+            "end_time",
+            "fluxomics",
+            "growth_rate",
+        }
+        assert len(sample["fluxomics"]) == 1
+    # Relations left out are never queried.
+    statements = "\n".join(queries.statements)
+    for table in ["strain", "medium", "metabolomics", "proteomics"]:
+        assert not re.search(rf"(FROM|JOIN) {table}\b", statements)
+
+
+def test_get_condition_data_fields(
+    client, tokens, session, measurement_fixtures
+):
+    first, second = measurement_fixtures["samples"]
+    response = client.get(
+        f"/conditions/{measurement_fixtures['condition'].id}/data"
+        f"?fields=id,medium.name,samples.growth_rate.measurement",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert response.json == {
+        "id": measurement_fixtures["condition"].id,
+        "medium": {"name": "Medium fixture"},
+        "samples": [
+            {"growth_rate": {"measurement": 0.5}},
+            {"growth_rate": {"measurement": 0.5}},
+        ],
+    }
+
+
+@pytest.mark.parametrize(
+    "query", ["fields=conditions.samples.color", "include=samples"]
+)
+def test_get_experiment_data_invalid_projection(
+    client, tokens, session, data_fixtures, query
+):
+    response = client.get(
+        f"/experiments/{data_fixtures['experiment'].id}/data?{query}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 422
+
+
 def test_post_proteomics(client, tokens, session, data_fixtures):
     proteomics_request = {
         "sample_id": data_fixtures["sample"].id,
@@ -247,7 +465,8 @@ def test_batch_post_proteomics(client, tokens, session, data_fixtures):
     # Check that database entries match posted data
     proteomics_ids = set([data["id"] for data in response.json])
     proteomics = (
-        models.Proteomics.query.filter(models.Proteomics.id.in_(proteomics_ids))
+        models.Proteomics.query.join(models.Proteomics.protein)
+        .filter(models.Proteomics.id.in_(proteomics_ids))
         .order_by(cast(models.Proteomics.identifier, Integer))
         .all()
     )
@@ -283,7 +502,8 @@ def test_batch_post_fluxomics(client, tokens, session, data_fixtures):
     # Check that database entries match posted data
     fluxomics_ids = set([data["id"] for data in response.json])
     fluxomics = (
-        models.Fluxomics.query.filter(models.Fluxomics.id.in_(fluxomics_ids))
+        models.Fluxomics.query.join(models.Fluxomics.reaction)
+        .filter(models.Fluxomics.id.in_(fluxomics_ids))
         .order_by(cast(models.Fluxomics.reaction_identifier, Integer))
         .all()
     )
@@ -319,9 +539,8 @@ def test_batch_post_metabolomics(client, tokens, session, data_fixtures):
     # Check that database entries match posted data
     metabolomics_ids = set([data["id"] for data in response.json])
     metabolomics = (
-        models.Metabolomics.query.filter(
-            models.Metabolomics.id.in_(metabolomics_ids)
-        )
+        models.Metabolomics.query.join(models.Metabolomics.compound)
+        .filter(models.Metabolomics.id.in_(metabolomics_ids))
         .order_by(cast(models.Metabolomics.compound_identifier, Integer))
         .all()
     )
@@ -330,3 +549,239 @@ def test_batch_post_metabolomics(client, tokens, session, data_fixtures):
             metabolomics[i].compound_identifier
             == metabolomics_request["body"][i]["compound_identifier"]
         )
+
+
+def test_delete_experiment_measurements(
+    client, tokens, session, measurement_fixtures
+):
+    response = client.delete(
+        f"/experiments/{measurement_fixtures['experiment'].id}/measurements",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 200
+    assert response.json == {
+        "fluxomics": 2,
+        "metabolomics": 2,
+        "proteomics": 2,
+        "uptake_secretion_rates": 2,
+        "molar_yields": 2,
+        "growth_rates": 2,
+    }
+    assert models.Fluxomics.query.count() == 0
+    assert models.Growth.query.count() == 0
+    assert models.Sample.query.count() == 2
+
+
+def test_delete_sample_measurements_by_type(
+    client, tokens, session, measurement_fixtures
+):
+    sample = measurement_fixtures["samples"][0]
+    response = client.delete(
+        f"/samples/{sample.id}/measurements?types=fluxomics,proteomics",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 200
+    assert response.json == {"fluxomics": 1, "proteomics": 1}
+    assert models.Fluxomics.query.count() == 1
+    assert models.Proteomics.query.count() == 1
+    assert models.Metabolomics.query.count() == 2
+
+
+def test_delete_condition_measurements_invalid_type(
+    client, tokens, session, measurement_fixtures
+):
+    response = client.delete(
+        f"/conditions/{measurement_fixtures['condition'].id}/measurements"
+        f"?types=strains",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 422
+    assert models.Fluxomics.query.count() == 2
+
+
+def test_delete_condition_measurements_requires_admin(
+    client, tokens, session, measurement_fixtures
+):
+    response = client.delete(
+        f"/conditions/{measurement_fixtures['condition'].id}/measurements",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+    )
+    assert response.status_code == 403
+    assert models.Fluxomics.query.count() == 2
+
+
+def _fluxomics_items(fluxomics):
+    """Return a batch updating the given fluxomics and adding another one."""
+    item = {
+        "sample_id": fluxomics.sample_id,
+        "reaction_name": fluxomics.reaction_name,
+        "reaction_identifier": fluxomics.reaction_identifier,
+        "reaction_namespace": fluxomics.reaction_namespace,
+        "measurement": 5.0,
+        "uncertainty": 0,
+    }
+    new_item = {**item, "reaction_identifier": "TPI", "measurement": 1.0}
+    return [item, new_item, {**new_item, "measurement": 2.0}]
+
+
+def test_batch_post_fluxomics_conflict(
+    client, tokens, session, measurement_fixtures
+):
+    response = client.post(
+        "/fluxomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": _fluxomics_items(measurement_fixtures["fluxomics"][0])},
+    )
+    assert response.status_code == 409
+
+
+def test_batch_upsert_fluxomics(client, tokens, session, measurement_fixtures):
+    existing = measurement_fixtures["fluxomics"][0]
+    response = client.post(
+        "/fluxomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": _fluxomics_items(existing), "upsert": True},
+    )
+    assert response.status_code == 201
+    assert len(response.json) == 2
+    assert existing.id in {data["id"] for data in response.json}
+    session.expire_all()
+    assert existing.measurement == 5.0
+    assert existing.updated is not None
+    # The last of several items sharing their natural key takes precedence.
+    fluxomics = (
+        models.Fluxomics.query.join(models.Fluxomics.reaction)
+        .filter(
+            models.Fluxomics.sample_id == existing.sample_id,
+            models.Fluxomics.reaction_identifier == "TPI",
+        )
+        .one()
+    )
+    assert fluxomics.measurement == 2.0
+
+
+def test_batch_patch_fluxomics(client, tokens, session, measurement_fixtures):
+    first, second = measurement_fixtures["fluxomics"]
+    response = client.patch(
+        "/fluxomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={
+            "body": [
+                {"id": first.id, "measurement": 3.0, "uncertainty": None},
+                {"id": second.id, "reaction_name": "Renamed"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert {data["id"] for data in response.json} == {first.id, second.id}
+    session.expire_all()
+    assert first.measurement == 3.0
+    assert first.uncertainty is None
+    # Only the patched measurement refers to the renamed reaction.
+    assert first.reaction_name == "Glucose-6-phosphate isomerase"
+    assert second.reaction_name == "Renamed"
+    assert second.measurement == 1.0
+
+
+def test_batch_patch_proteomics(client, tokens, session, measurement_fixtures):
+    proteomics = measurement_fixtures["proteomics"][0]
+    response = client.patch(
+        "/proteomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": [{"id": proteomics.id, "gene": {"name": "pgi"}}]},
+    )
+    assert response.status_code == 200
+    session.expire_all()
+    assert proteomics.gene == {"name": "pgi"}
+    assert proteomics.updated is not None
+
+
+def test_get_proteomics_by_gene(client, tokens, session, measurement_fixtures):
+    first, second = measurement_fixtures["proteomics"]
+    second.gene = {"name": "tpiA", "locus_tag": "b3919"}
+    session.commit()
+    headers = {"Authorization": f"Bearer {tokens['read']}"}
+    response = client.get(
+        "/proteomics?gene=locus_tag:b3919,name:tpiA", headers=headers
+    )
+    assert response.status_code == 200
+    assert [data["id"] for data in response.json] == [second.id]
+    response = client.get(
+        "/proteomics?gene=name:tpiA,locus_tag:b4025", headers=headers
+    )
+    assert response.json == []
+    response = client.get("/proteomics?gene_keys=locus_tag", headers=headers)
+    assert {data["id"] for data in response.json} == {first.id, second.id}
+    response = client.get("/proteomics?gene=locus_tag", headers=headers)
+    assert response.status_code == 422
+
+
+def test_get_samples_by_ids(client, tokens, session, measurement_fixtures):
+    first, second = measurement_fixtures["samples"]
+    response = client.get(
+        f"/samples?ids={first.id},{second.id}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert {data["id"] for data in response.json} == {first.id, second.id}
+
+
+def test_get_by_ids_missing(client, tokens, session, data_fixtures):
+    hidden = models.Strain(
+        project_id=2,
+        organism=data_fixtures["organism"],
+        parent=None,
+        name="Hidden strain",
+    )
+    session.add(hidden)
+    session.commit()
+    strain_id = data_fixtures["strain"].id
+    response = client.get(
+        f"/strains?ids={strain_id},{hidden.id},404,405",
+        headers={
+            "Authorization": f"Bearer {tokens['read']}",
+            "Origin": "http://localhost",
+        },
+    )
+    # The visible objects are returned; the others are listed in the headers.
+    assert response.status_code == 200
+    assert [data["id"] for data in response.json] == [strain_id]
+    assert response.headers["X-Missing-Ids"] == "404,405"
+    assert response.headers["X-Forbidden-Ids"] == str(hidden.id)
+    assert set(
+        response.headers["Access-Control-Expose-Headers"].split(", ")
+    ) == {"X-Missing-Ids", "X-Forbidden-Ids"}
+
+
+def test_get_by_ids_filtered(client, tokens, session, measurement_fixtures):
+    first, second = measurement_fixtures["proteomics"]
+    second.gene = {"name": "tpiA"}
+    session.commit()
+    response = client.get(
+        f"/proteomics?ids={first.id},{second.id}&gene=name:tpiA",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    # Objects excluded by the other filters are not missing.
+    assert response.status_code == 200
+    assert [data["id"] for data in response.json] == [second.id]
+    assert "X-Missing-Ids" not in response.headers
+    assert "X-Forbidden-Ids" not in response.headers
+
+
+def test_batch_patch_growth_rates_missing(
+    client, tokens, session, measurement_fixtures
+):
+    growth = measurement_fixtures["growth_rates"][0]
+    response = client.patch(
+        "/growth-rates/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={
+            "body": [
+                {"id": growth.id, "measurement": 0.1},
+                {"id": growth.id + 1000, "measurement": 0.1},
+            ]
+        },
+    )
+    assert response.status_code == 404
+    session.expire_all()
+    assert growth.measurement == 0.5
@@ -0,0 +1,238 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test streaming changes as server-sent events."""
+
+import json
+import select
+import time
+
+import pytest
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+
+from warehouse import events, models
+from warehouse.app import db
+
+
+def _notify(payload):
+    """Send a notification outside of the test transaction."""
+    with db.engine.connect() as connection:
+        connection.execution_options(autocommit=True).execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            channel=models.CHANGES_CHANNEL,
+            payload=json.dumps(payload),
+        )
+
+
+def _wait_for_listener():
+    """Wait until the listener has subscribed to the channel."""
+    for _ in range(50):
+        listening = db.engine.execute(
+            text("SELECT count(*) FROM pg_stat_activity WHERE query = :query"),
+            query=f"LISTEN {models.CHANGES_CHANNEL}",
+        ).scalar()
+        if listening:
+            return
+        time.sleep(0.1)
+    raise AssertionError("The listener did not start.")
+
+
+@pytest.fixture(scope="function")
+def listener(app, reset_tables, monkeypatch):
+    monkeypatch.setattr(events, "KEEP_ALIVE", 0.1)
+    listener = events.Listener(app, timeout=0.1)
+    yield listener
+    if listener.thread is not None:
+        listener.thread.join(timeout=5)
+
+
+def test_stream(listener):
+    stream = listener.stream(claims={1})
+    assert next(stream) == ": subscribed\n\n"
+    _wait_for_listener()
+    _notify(
+        {"resource": "strain", "action": "update", "ids": [1], "project_id": 2}
+    )
+    _notify(
+        {"resource": "strain", "action": "insert", "ids": [2], "project_id": 1}
+    )
+    # The sample does not exist; the event is dropped.
+    _notify(
+        {
+            "resource": "fluxomics",
+            "action": "insert",
+            "ids": [3],
+            "sample_id": 0,
+        }
+    )
+    _notify(
+        {
+            "resource": "organism",
+            "action": "delete",
+            "ids": [4],
+            "project_id": None,
+        }
+    )
+
+    received = []
+    while len(received) < 2:
+        message = next(stream)
+        if message.startswith("event: change\n"):
+            received.append(json.loads(message.split("data: ", 1)[1]))
+    stream.close()
+    assert received == [
+        {"resource": "strain", "action": "insert", "ids": [2], "project_id": 1},
+        {
+            "resource": "organism",
+            "action": "delete",
+            "ids": [4],
+            "project_id": None,
+        },
+    ]
+    assert not listener.subscribers
+
+
+def test_resolve_projects(session, measurement_fixtures):
+    sample = measurement_fixtures["samples"][0]
+    events_ = events.resolve_projects(
+        session,
+        [
+            {
+                "resource": "fluxomics",
+                "action": "insert",
+                "sample_id": sample.id,
+            },
+            {"resource": "experiment", "action": "update", "project_id": 1},
+        ],
+    )
+    assert events_ == [
+        {
+            "resource": "fluxomics",
+            "action": "insert",
+            "sample_id": sample.id,
+            "project_id": measurement_fixtures["experiment"].project_id,
+        },
+        {"resource": "experiment", "action": "update", "project_id": 1},
+    ]
+
+
+def test_triggers(app, reset_tables):
+    """Changes are announced once committed."""
+    listening = db.engine.raw_connection()
+    listening.detach()
+    listening.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    listening.cursor().execute(f"LISTEN {models.CHANGES_CHANNEL}")
+    organisms = models.Organism.__table__
+    tombstones = models.Tombstone.__table__
+    with db.engine.begin() as connection:
+        organism_id = connection.execute(
+            organisms.insert().values(name="E. coli", project_id=1)
+        ).inserted_primary_key[0]
+    with db.engine.begin() as connection:
+        connection.execute(
+            organisms.update()
+            .where(organisms.c.id == organism_id)
+            .values(name="Escherichia coli")
+        )
+    with db.engine.begin() as connection:
+        connection.execute(
+            organisms.delete().where(organisms.c.id == organism_id)
+        )
+        connection.execute(
+            tombstones.delete().where(tombstones.c.object_id == organism_id)
+        )
+
+    notifications = []
+    connection = listening.connection
+    while len(notifications) < 3 and select.select([connection], [], [], 5)[0]:
+        connection.poll()
+        notifications.extend(
+            json.loads(notification.payload)
+            for notification in connection.notifies
+        )
+        del connection.notifies[:]
+    listening.close()
+    assert notifications == [
+        {
+            "resource": "organism",
+            "action": action,
+            "ids": [organism_id],
+            "project_id": 1,
+        }
+        for action in ["insert", "update", "delete"]
+    ]
+
+
+def test_triggers_per_statement(app, reset_tables):
+    """A statement sends a notification per parent and chunk of rows."""
+    listening = db.engine.raw_connection()
+    listening.detach()
+    listening.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    listening.cursor().execute(f"LISTEN {models.CHANGES_CHANNEL}")
+    count = models.NOTIFICATION_IDS + 1
+    with db.engine.begin() as connection:
+        connection.execute(
+            models.Organism.__table__.insert().values(
+                [
+                    {"name": f"Organism {i}", "project_id": 1}
+                    for i in range(count)
+                ]
+                + [{"name": "Organism", "project_id": 2}]
+            )
+        )
+
+    notifications = []
+    connection = listening.connection
+    while len(notifications) < 3 and select.select([connection], [], [], 5)[0]:
+        connection.poll()
+        notifications.extend(
+            json.loads(notification.payload)
+            for notification in connection.notifies
+        )
+        del connection.notifies[:]
+    listening.close()
+    assert [
+        (notification["project_id"], len(notification["ids"]))
+        for notification in notifications
+    ] == [(1, models.NOTIFICATION_IDS), (1, 1), (2, 1)]
+
+
+def test_publish_visible(listener):
+    subscriber = events.Subscriber({1})
+    listener.subscribers.add(subscriber)
+    listener.publish(
+        [
+            {"resource": "strain", "action": "update", "project_id": 2},
+            {"resource": "strain", "action": "insert", "project_id": 1},
+        ]
+    )
+    # Only the visible event is queued.
+    assert subscriber.events.qsize() == 1
+    assert subscriber.events.get()["project_id"] == 1
+
+
+def test_publish_overflow(listener, monkeypatch):
+    monkeypatch.setattr(events, "QUEUE_SIZE", 1)
+    stream = listener.stream(claims={1})
+    assert next(stream) == ": subscribed\n\n"
+    listener.publish(
+        [{"resource": "strain", "action": "insert", "project_id": 1}] * 2
+    )
+    # The subscriber fell behind and its stream ends.
+    assert not listener.subscribers
+    assert next(stream) == "event: overflow\ndata: {}\n\n"
+    with pytest.raises(StopIteration):
+        next(stream)
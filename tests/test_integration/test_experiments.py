@@ -0,0 +1,84 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the experiment denormalized onto the measurements."""
+
+from warehouse import models
+from warehouse.utils import MEASUREMENTS
+
+
+def _experiments(session):
+    """Return the experiments of all measurements."""
+    session.expire_all()
+    return {
+        measurement.experiment_id
+        for Measurement in MEASUREMENTS.values()
+        for measurement in Measurement.query
+    }
+
+
+def test_measurements_assigned(session, measurement_fixtures):
+    assert _experiments(session) == {measurement_fixtures["experiment"].id}
+
+
+def test_condition_moved(session, measurement_fixtures):
+    other = models.Experiment(
+        project_id=1, name="Other experiment", description="Lorem ipsum"
+    )
+    session.add(other)
+    measurement_fixtures["condition"].experiment = other
+    session.commit()
+    assert _experiments(session) == {other.id}
+
+
+def test_sample_moved(session, measurement_fixtures):
+    other = models.Condition(
+        experiment=models.Experiment(
+            project_id=1, name="Other experiment", description="Lorem ipsum"
+        ),
+        strain=measurement_fixtures["strain"],
+        medium=measurement_fixtures["medium"],
+        name="Other condition",
+    )
+    session.add(other)
+    sample = measurement_fixtures["sample"]
+    sample.condition = other
+    session.commit()
+    session.expire_all()
+    for Measurement in MEASUREMENTS.values():
+        for measurement in Measurement.query:
+            if measurement.sample_id == sample.id:
+                assert measurement.experiment_id == other.experiment_id
+            else:
+                assert measurement.experiment_id == (
+                    measurement_fixtures["experiment"].id
+                )
+
+
+def test_clone_assigned(client, tokens, session, measurement_fixtures):
+    experiment = measurement_fixtures["experiment"]
+    response = client.post(
+        f"/experiments/{experiment.id}/clone",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"name": "Clone"},
+    )
+    assert response.status_code == 201
+    clone = models.Experiment.query.get(response.json["id"])
+    (condition,) = clone.conditions
+    for sample in condition.samples:
+        for measurement in sample.fluxomics:
+            assert measurement.experiment_id == clone.id
+        assert sample.growth_rate.experiment_id == clone.id
+    assert _experiments(session) == {experiment.id, clone.id}
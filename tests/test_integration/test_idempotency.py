@@ -0,0 +1,231 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test replaying the responses to retried batches with idempotency keys."""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import g
+from jose import jwt
+from sqlalchemy import event
+
+from warehouse import idempotency, models
+from warehouse.app import db
+
+
+def _batch(sample_id, identifier="TPI", name="Triose-phosphate isomerase"):
+    return {
+        "body": [
+            {
+                "sample_id": sample_id,
+                "reaction_name": name,
+                "reaction_identifier": identifier,
+                "reaction_namespace": "bigg.reaction",
+                "measurement": 1.0,
+                "uncertainty": 0.1,
+            }
+        ]
+    }
+
+
+def _post(client, tokens, json, key="retried-batch", token="write"):
+    return client.post(
+        "/fluxomics/batch",
+        headers={
+            "Authorization": f"Bearer {tokens[token]}",
+            "Idempotency-Key": key,
+        },
+        json=json,
+    )
+
+
+def _write_token(app, claims):
+    return jwt.encode(
+        {"prj": {1: "write"}, **claims}, app.config["JWT_PRIVATE_KEY"], "RS512"
+    )
+
+
+def test_retry_replayed(
+    client, tokens, session, measurement_fixtures, query_counter
+):
+    sample = measurement_fixtures["sample"]
+    response = _post(client, tokens, _batch(sample.id))
+    assert response.status_code == 201
+    with query_counter as queries:
+        retry = _post(client, tokens, _batch(sample.id))
+    assert retry.status_code == 201
+    assert retry.json == response.json
+    assert sample.fluxomics.count() == 2
+    # The measurements are not touched by the retry.
+    assert not any("fluxomics" in statement for statement in queries.statements)
+
+
+def test_key_reused(client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    assert _post(client, tokens, _batch(sample.id)).status_code == 201
+    response = _post(
+        client, tokens, _batch(sample.id, "PFK", "Phosphofructokinase")
+    )
+    assert response.status_code == 422
+    assert "Idempotency-Key" in response.json["headers"]
+
+
+def test_key_expired(client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    assert _post(client, tokens, _batch(sample.id)).status_code == 201
+    record = models.IdempotencyKey.query.get(("1", "retried-batch"))
+    record.created = datetime.utcnow() - timedelta(days=2)
+    session.commit()
+    response = _post(
+        client, tokens, _batch(sample.id, "PFK", "Phosphofructokinase")
+    )
+    assert response.status_code == 201
+    assert sample.fluxomics.count() == 3
+
+
+def test_failed_request_not_recorded(
+    client, tokens, session, connection, measurement_fixtures
+):
+    sample = measurement_fixtures["sample"]
+    # Conflicts with the fixture of the sample.
+    batch = _batch(sample.id, "PGI", "Glucose-6-phosphate isomerase")
+    # Roll back the failed request like the app does at the end of the
+    # request, but to a savepoint instead of the transaction of the test.
+    connection.begin_nested()
+    assert _post(client, tokens, batch).status_code == 409
+    session.rollback()
+    assert models.IdempotencyKey.query.get(("1", "retried-batch")) is None
+
+
+def test_background_retry_replayed(
+    client, tokens, session, measurement_fixtures
+):
+    sample = measurement_fixtures["sample"]
+    batch = {**_batch(sample.id), "background": True}
+    response = _post(client, tokens, batch)
+    assert response.status_code == 202
+    retry = _post(client, tokens, batch)
+    assert retry.status_code == 202
+    assert retry.json["id"] == response.json["id"]
+    assert models.Job.query.count() == 1
+
+
+def test_key_scoped_to_user(app, client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    assert _post(client, tokens, _batch(sample.id)).status_code == 201
+    # Another user neither collides with nor replays the first one's request.
+    other = {**tokens, "other": _write_token(app, {"sub": "2"})}
+    response = _post(
+        client,
+        other,
+        _batch(sample.id, "PFK", "Phosphofructokinase"),
+        token="other",
+    )
+    assert response.status_code == 201
+    assert sample.fluxomics.count() == 3
+
+
+def test_key_requires_subject(app, client, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    response = _post(
+        client,
+        {"anonymous": _write_token(app, {})},
+        _batch(sample.id),
+        token="anonymous",
+    )
+    assert response.status_code == 422
+    assert "Idempotency-Key" in response.json["headers"]
+    assert sample.fluxomics.count() == 1
+
+
+def test_recorded_with_batch(client, tokens, session, measurement_fixtures):
+    commits = []
+
+    def listener(session):
+        commits.append(session)
+
+    event.listen(session.session_factory, "after_commit", listener)
+    try:
+        response = _post(
+            client, tokens, _batch(measurement_fixtures["sample"].id)
+        )
+    finally:
+        event.remove(session.session_factory, "after_commit", listener)
+    assert response.status_code == 201
+    # The measurements and the response are committed together.
+    assert len(commits) == 1
+    record = models.IdempotencyKey.query.get(("1", "retried-batch"))
+    assert (record.status_code, record.response) == (201, response.json)
+
+
+def _wait_for_lock():
+    """Wait until a statement waits for a lock held by another transaction."""
+    for _ in range(50):
+        waiting = db.engine.execute(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE wait_event_type = 'Lock'"
+        ).scalar()
+        if waiting:
+            return
+        time.sleep(0.1)
+    raise AssertionError("The statement did not wait for the lock.")
+
+
+def test_concurrent_retry_replayed(app, reset_tables):
+    """A retry waiting for the request claiming its key replays its response."""
+    keys = models.IdempotencyKey.__table__
+    request = {
+        "path": "/fluxomics/batch",
+        "method": "POST",
+        "data": b'{"body": []}',
+        "headers": {"Idempotency-Key": "retried-batch"},
+    }
+    with app.test_request_context(**request):
+        digest = idempotency.request_hash()
+    responses = []
+
+    def retry():
+        with app.test_request_context(**request):
+            g.jwt_claims = {"sub": "1", "prj": {1: "write"}}
+            try:
+                responses.append(idempotency.begin())
+            finally:
+                db.session.remove()
+
+    try:
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            connection.execute(
+                keys.insert().values(
+                    subject="1",
+                    key="retried-batch",
+                    request_hash=digest,
+                    created=datetime.utcnow(),
+                    status_code=201,
+                    response=[{"id": 1}],
+                )
+            )
+            thread = threading.Thread(target=retry)
+            thread.start()
+            _wait_for_lock()
+            transaction.commit()
+        thread.join(timeout=5)
+        (response,) = responses
+        assert response.status_code == 201
+        assert response.get_json() == [{"id": 1}]
+    finally:
+        db.engine.execute(keys.delete())
@@ -0,0 +1,297 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test running imports and exports as background jobs."""
+
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from warehouse import jobs, models
+from warehouse.utils import insert_measurements
+
+
+# The names of the measured reactions; PGI is also measured by the measurement
+# fixtures.
+NAMES = {
+    "PGI": "Glucose-6-phosphate isomerase",
+    "PFK": "Phosphofructokinase",
+    "TPI": "Triose-phosphate isomerase",
+    "ENO": "Enolase",
+}
+
+
+def _fluxomics(sample_id, identifiers):
+    return [
+        {
+            "sample_id": sample_id,
+            "reaction_name": NAMES[identifier],
+            "reaction_identifier": identifier,
+            "reaction_namespace": "bigg.reaction",
+            "measurement": 1.0,
+            "uncertainty": 0.1,
+        }
+        for identifier in identifiers
+    ]
+
+
+def _import(client, tokens, body):
+    response = client.post(
+        "/fluxomics/batch",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": body, "background": True},
+    )
+    assert response.status_code == 202
+    return response.json
+
+
+def test_import(client, tokens, session, measurement_fixtures, monkeypatch):
+    monkeypatch.setattr(jobs, "IMPORT_CHUNK_SIZE", 2)
+    sample = measurement_fixtures["sample"]
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI", "PFK", "ENO"]))
+    assert job["kind"] == "import"
+    assert job["status"] == "pending"
+    assert (job["progress"], job["total"]) == (0, 3)
+    # Nothing is inserted by the request itself.
+    assert sample.fluxomics.count() == 1
+
+    jobs.run(jobs.claim())
+    response = client.get(
+        f"/jobs/{job['id']}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert response.json["status"] == "done"
+    assert (response.json["progress"], response.json["total"]) == (3, 3)
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 201
+    ids = [item["id"] for item in response.json]
+    assert len(ids) == 3
+    assert models.Fluxomics.query.filter(
+        models.Fluxomics.id.in_(ids)
+    ).count() == len(ids)
+
+
+def test_import_failed(
+    client, tokens, session, connection, measurement_fixtures
+):
+    sample = measurement_fixtures["sample"]
+    # Conflicts with the fixture of the sample.
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI", "PGI"]))
+    # The worker rolls back the failed import; let it roll back a savepoint
+    # instead of the transaction of the test.
+    connection.begin_nested()
+    jobs.run(jobs.claim())
+    response = client.get(
+        f"/jobs/{job['id']}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.json["status"] == "failed"
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 409
+    assert response.json == {"message": "Conflicts with an existing object"}
+
+
+def test_export(client, tokens, session, measurement_fixtures):
+    experiment = measurement_fixtures["experiment"]
+    response = client.post(
+        f"/experiments/{experiment.id}/export",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        json={"include": ["fluxomics", "growth_rate"]},
+    )
+    assert response.status_code == 202
+    job = response.json
+    assert job["kind"] == "export"
+    assert job["total"] is None
+
+    jobs.run(jobs.claim())
+    response = client.get(
+        f"/jobs/{job['id']}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.json["status"] == "done"
+    assert (response.json["progress"], response.json["total"]) == (1, 1)
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    # The result is the response of the synchronous request.
+    assert (
+        response.json
+        == client.get(
+            f"/experiments/{experiment.id}/data",
+            headers={"Authorization": f"Bearer {tokens['read']}"},
+            query_string={"include": "fluxomics,growth_rate"},
+        ).json
+    )
+
+
+def test_export_requires_jwt(client, session, measurement_fixtures):
+    response = client.post(
+        f"/experiments/{measurement_fixtures['experiment'].id}/export",
+        json={"include": ["fluxomics"]},
+    )
+    assert response.status_code == 401
+    assert models.Job.query.count() == 0
+
+
+def test_result_streamed(
+    client, tokens, session, measurement_fixtures, monkeypatch
+):
+    monkeypatch.setattr(jobs, "RESULT_CHUNK_SIZE", 7)
+    sample = measurement_fixtures["sample"]
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI", "PFK"]))
+    jobs.run(jobs.claim())
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.is_streamed
+    assert response.status_code == 201
+    assert len(response.json) == 2
+
+
+def test_result_pending(client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI"]))
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 404
+
+
+def test_job_invisible(client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI"]))
+    # The job writes to project 1.
+    response = client.get(f"/jobs/{job['id']}")
+    assert response.status_code == 404
+
+
+def test_claim_oldest(client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    first = _import(client, tokens, _fluxomics(sample.id, ["TPI"]))
+    second = _import(client, tokens, _fluxomics(sample.id, ["PFK"]))
+    assert jobs.claim().id == first["id"]
+    assert jobs.claim().id == second["id"]
+    assert jobs.claim() is None
+
+
+def test_claim_lost_job(app, client, tokens, session, measurement_fixtures):
+    sample = measurement_fixtures["sample"]
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI"]))
+    claimed = jobs.claim()
+    assert (claimed.id, claimed.status, claimed.attempts) == (
+        job["id"],
+        "running",
+        1,
+    )
+    # The worker is alive.
+    assert jobs.claim() is None
+    # The worker died.
+    claimed.heartbeat = (
+        datetime.utcnow() - app.config["JOB_LEASE"] - timedelta(seconds=1)
+    )
+    session.commit()
+    reclaimed = jobs.claim()
+    assert (reclaimed.id, reclaimed.attempts) == (job["id"], 2)
+    jobs.run(reclaimed)
+    response = client.get(
+        f"/jobs/{job['id']}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.json["status"] == "done"
+
+
+def test_claim_lost_import(
+    app, client, tokens, session, measurement_fixtures, monkeypatch
+):
+    monkeypatch.setattr(jobs, "IMPORT_CHUNK_SIZE", 2)
+    sample = measurement_fixtures["sample"]
+    body = _fluxomics(sample.id, ["TPI", "PFK", "ENO"])
+    job = _import(client, tokens, body)
+    claimed = jobs.claim()
+    # The worker died after committing the first chunk.
+    insert_measurements(models.Fluxomics, body[:2])
+    claimed.progress = 2
+    claimed.heartbeat = (
+        datetime.utcnow() - app.config["JOB_LEASE"] - timedelta(seconds=1)
+    )
+    session.commit()
+    jobs.run(jobs.claim())
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 201
+    ids = [item["id"] for item in response.json]
+    assert len(ids) == 3
+    assert sample.fluxomics.count() == 4
+
+
+def test_job_of_no_project(client, tokens, session, app):
+    experiment = models.Experiment(
+        project_id=None, name="Public experiment", description="Lorem ipsum"
+    )
+    session.add(experiment)
+    session.commit()
+    response = client.post(
+        f"/experiments/{experiment.id}/export",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        json={"include": ["fluxomics"]},
+    )
+    assert response.status_code == 202
+    path = f"/jobs/{response.json['id']}"
+    other = jwt.encode(
+        {"sub": "2", "prj": {}}, app.config["JWT_PRIVATE_KEY"], "RS512"
+    )
+    # Only the user who submitted the job sees it.
+    assert client.get(path).status_code == 404
+    assert (
+        client.get(path, headers={"Authorization": f"Bearer {other}"})
+    ).status_code == 404
+    assert (
+        client.get(path, headers={"Authorization": f"Bearer {tokens['read']}"})
+    ).status_code == 200
+
+
+def test_claim_attempts_exhausted(
+    app, client, tokens, session, measurement_fixtures
+):
+    sample = measurement_fixtures["sample"]
+    job = _import(client, tokens, _fluxomics(sample.id, ["TPI"]))
+    claimed = jobs.claim()
+    claimed.attempts = app.config["JOB_MAX_ATTEMPTS"]
+    claimed.heartbeat = datetime.utcnow() - app.config["JOB_LEASE"] * 2
+    session.commit()
+    assert jobs.claim() is None
+    response = client.get(
+        f"/jobs/{job['id']}/result",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 500
+    assert response.json == {
+        "message": (
+            f"The job was interrupted {app.config['JOB_MAX_ATTEMPTS']} times"
+        )
+    }
@@ -0,0 +1,159 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test resolving the lineage of strains."""
+
+import pytest
+
+from warehouse import models
+
+
+@pytest.fixture(scope="function")
+def strains(session, data_fixtures):
+    """Add three generations below the strain fixture."""
+    root = data_fixtures["strain"]
+    child = models.Strain(
+        project_id=1,
+        organism=root.organism,
+        parent=root,
+        name="Child",
+        genotype="+geneA",
+    )
+    grandchild = models.Strain(
+        project_id=1,
+        organism=root.organism,
+        parent=child,
+        name="Grandchild",
+        genotype="-geneB",
+    )
+    great_grandchild = models.Strain(
+        project_id=1,
+        organism=root.organism,
+        parent=grandchild,
+        name="Great-grandchild",
+        genotype="+geneC",
+    )
+    # A descendant in another project is hidden, along with its descendants.
+    hidden = models.Strain(
+        project_id=2,
+        organism=root.organism,
+        parent=child,
+        name="Hidden",
+        genotype="+geneD",
+    )
+    hidden_child = models.Strain(
+        project_id=1,
+        organism=root.organism,
+        parent=hidden,
+        name="Below hidden",
+        genotype="+geneE",
+    )
+    session.add_all([child, grandchild, great_grandchild, hidden, hidden_child])
+    session.commit()
+    return [root, child, grandchild, great_grandchild]
+
+
+def test_ancestors(client, tokens, session, strains):
+    response = client.get(
+        f"/strains/{strains[3].id}/ancestors",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert [strain["id"] for strain in response.json] == [
+        strain.id for strain in reversed(strains[:3])
+    ]
+    assert [strain["depth"] for strain in response.json] == [1, 2, 3]
+    # The changes leading from the root to the requested strain.
+    assert response.json[-1]["genotypes"] == ["+geneA", "-geneB", "+geneC"]
+
+
+def test_descendants(client, tokens, session, strains):
+    response = client.get(
+        f"/strains/{strains[0].id}/descendants",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert [strain["name"] for strain in response.json] == [
+        "Child",
+        "Grandchild",
+        "Great-grandchild",
+    ]
+    assert response.json[-1]["genotypes"] == ["+geneA", "-geneB", "+geneC"]
+
+
+def test_lineage_max_depth(client, tokens, session, strains):
+    response = client.get(
+        f"/strains/{strains[0].id}/descendants",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"max_depth": 2},
+    )
+    assert [strain["depth"] for strain in response.json] == [1, 2]
+    response = client.get(
+        f"/strains/{strains[0].id}/descendants",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"max_depth": 0},
+    )
+    assert response.status_code == 422
+
+
+def test_lineage_move(client, tokens, session, strains):
+    """Moving a strain moves its descendants along."""
+    response = client.put(
+        f"/strains/{strains[2].id}",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"parent_id": strains[0].id},
+    )
+    assert response.status_code == 200
+    response = client.get(
+        f"/strains/{strains[3].id}/ancestors",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert [strain["name"] for strain in response.json] == [
+        "Grandchild",
+        "Strain fixture",
+    ]
+    assert response.json[-1]["genotypes"] == ["-geneB", "+geneC"]
+
+
+def test_common_ancestor(client, tokens, session, strains):
+    hidden_child = models.Strain.query.filter_by(name="Below hidden").one()
+    response = client.get(
+        "/strains/common-ancestor",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"ids": f"{strains[3].id},{strains[2].id}"},
+    )
+    assert response.status_code == 200
+    assert response.json["id"] == strains[2].id
+    # The lineage of the strain below the hidden one is hidden as well.
+    response = client.get(
+        "/strains/common-ancestor",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"ids": f"{strains[3].id},{hidden_child.id}"},
+    )
+    assert response.status_code == 404
+
+
+def test_lineage_cycle(client, tokens, session, strains):
+    response = client.put(
+        f"/strains/{strains[1].id}",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"parent_id": strains[3].id},
+    )
+    assert response.status_code == 400
+
+
+def test_lineage_not_visible(client, session, strains):
+    response = client.get(f"/strains/{strains[0].id}/descendants")
+    assert response.status_code == 404
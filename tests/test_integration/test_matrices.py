@@ -0,0 +1,136 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the measurement matrices of experiments."""
+
+import ast
+import io
+import math
+import struct
+import zipfile
+
+import pytest
+
+from warehouse import models
+
+
+@pytest.fixture(scope="function")
+def matrix_fixtures(session, measurement_fixtures):
+    """Measure a second reaction in the second sample only."""
+    session.add(
+        models.Fluxomics(
+            sample=measurement_fixtures["samples"][1],
+            reaction_name="Triose-phosphate isomerase",
+            reaction_identifier="TPI",
+            reaction_namespace="bigg.reaction",
+            measurement=2.0,
+            uncertainty=0.1,
+        )
+    )
+    session.commit()
+    return measurement_fixtures
+
+
+def _load_npy(data):
+    """Decode the arrays written by `warehouse.matrices`, without NumPy."""
+    (header_length,) = struct.unpack("<H", data[8:10])
+    header = ast.literal_eval(data[10 : 10 + header_length].decode("latin1"))
+    body = data[10 + header_length :]
+    size = math.prod(header["shape"])
+    if header["descr"].startswith("<U"):
+        width = int(header["descr"][2:])
+        return [
+            body[index * width * 4 : (index + 1) * width * 4]
+            .decode("utf-32-le")
+            .rstrip("\0")
+            for index in range(size)
+        ]
+    format = {"<i8": "q", "<f8": "d"}[header["descr"]]
+    return list(struct.unpack(f"<{size}{format}", body)), header["shape"]
+
+
+def test_matrix_dense(client, tokens, session, matrix_fixtures):
+    response = client.get(
+        f"/experiments/{matrix_fixtures['experiment'].id}/matrix",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "fluxomics"},
+    )
+    assert response.status_code == 200
+    matrix = response.json
+    assert matrix["sample_ids"] == [
+        sample.id for sample in matrix_fixtures["samples"]
+    ]
+    assert matrix["columns"] == {
+        "reaction_namespace": ["bigg.reaction", "bigg.reaction"],
+        "reaction_identifier": ["PGI", "TPI"],
+    }
+    assert matrix["shape"] == [2, 2]
+    assert matrix["values"] == [[1.0, None], [1.0, 2.0]]
+
+
+def test_matrix_sparse(client, tokens, session, matrix_fixtures):
+    response = client.get(
+        f"/experiments/{matrix_fixtures['experiment'].id}/matrix",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "fluxomics", "sparse": "true"},
+    )
+    matrix = response.json
+    assert matrix["row_indices"] == [0, 1, 1]
+    assert matrix["column_indices"] == [0, 0, 1]
+    assert matrix["values"] == [1.0, 1.0, 2.0]
+
+
+def test_matrix_npz(client, tokens, session, matrix_fixtures):
+    response = client.get(
+        f"/experiments/{matrix_fixtures['experiment'].id}/matrix",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "fluxomics", "format": "npz"},
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/octet-stream"
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        arrays = {
+            name[: -len(".npy")]: _load_npy(archive.read(name))
+            for name in archive.namelist()
+        }
+    assert arrays["reaction_identifier"] == ["PGI", "TPI"]
+    assert arrays["sample_names"] == [
+        sample.name for sample in matrix_fixtures["samples"]
+    ]
+    values, shape = arrays["values"]
+    assert shape == (2, 2)
+    assert values[0] == 1.0
+    assert math.isnan(values[1])
+    assert values[2:] == [1.0, 2.0]
+
+
+def test_matrix_empty(client, tokens, session, data_fixtures):
+    response = client.get(
+        f"/experiments/{data_fixtures['experiment'].id}/matrix",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "proteomics", "sparse": "true"},
+    )
+    assert response.status_code == 200
+    assert response.json["shape"] == [0, 0]
+    assert response.json["values"] == []
+
+
+def test_matrix_invalid_type(client, tokens, session, data_fixtures):
+    response = client.get(
+        f"/experiments/{data_fixtures['experiment'].id}/matrix",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "growth_rates"},
+    )
+    assert response.status_code == 422
@@ -0,0 +1,382 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test storing dense measurements of samples packed into arrays."""
+
+from datetime import datetime
+
+import pytest
+
+from warehouse import models
+
+
+# The names of the measured compounds; glucose and acetate are also measured by
+# the measurement fixtures.
+NAMES = {"glc__D": "D-Glucose", "ac": "Acetate", "pyr": "Pyruvate"}
+
+
+def _metabolomics(sample_id, identifiers, measurement=1.0):
+    return [
+        {
+            "sample_id": sample_id,
+            "compound_name": NAMES[identifier],
+            "compound_identifier": identifier,
+            "compound_namespace": "bigg.metabolite",
+            "measurement": measurement,
+            "uncertainty": None,
+        }
+        for identifier in identifiers
+    ]
+
+
+def _proteomics(sample_id):
+    return {
+        "sample_id": sample_id,
+        "identifier": "P0AB71",
+        "name": "ALF_ECOLI",
+        "full_name": "Fructose-bisphosphate aldolase class 2",
+        "gene": {"name": "fbaA"},
+        "measurement": 0.2,
+        "uncertainty": 0.01,
+    }
+
+
+@pytest.fixture(scope="function")
+def packed(client, tokens, session, measurement_fixtures):
+    """Pack metabolomics and proteomics for a third sample."""
+    sample = models.Sample(
+        condition=measurement_fixtures["condition"],
+        name="Packed sample fixture",
+        start_time=datetime(2019, 10, 28, 16, 00),
+        end_time=datetime(2019, 10, 28, 17, 00),
+    )
+    session.add(sample)
+    session.commit()
+    response = client.post(
+        "/metabolomics/packed",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": _metabolomics(sample.id, ["glc__D", "ac", "pyr"])},
+    )
+    assert response.status_code == 201
+    assert response.json == [{"sample_id": sample.id}]
+    response = client.post(
+        "/proteomics/packed",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": [_proteomics(sample.id)]},
+    )
+    assert response.status_code == 201
+    return {**measurement_fixtures, "packed_sample": sample}
+
+
+def test_pack(session, packed):
+    packed_metabolomics = packed["packed_sample"].packed_metabolomics
+    assert packed_metabolomics.experiment_id == packed["experiment"].id
+    assert packed_metabolomics.measurements == [1.0, 1.0, 1.0]
+    assert packed_metabolomics.uncertainties == [None, None, None]
+    # The compounds are shared with the measurements stored as rows.
+    assert len(packed_metabolomics.compound_ids) == 3
+    assert models.Compound.query.count() == 3
+    # The ids are drawn from the sequence of the measurements stored as rows.
+    assert len(set(packed_metabolomics.ids)) == 3
+    assert not set(packed_metabolomics.ids) & {
+        metabolomics.id for metabolomics in packed["metabolomics"]
+    }
+    assert packed["packed_sample"].packed_proteomics.genes == [{"name": "fbaA"}]
+
+
+def test_pack_replaces(client, tokens, session, packed):
+    sample = packed["packed_sample"]
+    glc, ac, pyr = sample.packed_metabolomics.ids
+    response = client.post(
+        "/metabolomics/packed",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={
+            "body": _metabolomics(sample.id, ["glc__D", "ac"])
+            + _metabolomics(sample.id, ["ac"], measurement=2.0)
+        },
+    )
+    assert response.status_code == 201
+    session.expire_all()
+    assert models.PackedMetabolomics.query.count() == 1
+    # Of the measurements of the same compound, the last one wins.
+    assert sample.packed_metabolomics.measurements == [1.0, 2.0]
+    # The measurements of the compounds packed before keep their ids.
+    assert sample.packed_metabolomics.ids == [glc, ac]
+    # The measurement which is not packed again is deleted.
+    assert [
+        (tombstone.resource, tombstone.object_id)
+        for tombstone in models.Tombstone.query
+    ] == [("metabolomics", pyr)]
+
+
+def test_pack_stored_as_rows(client, tokens, session, packed):
+    sample = packed["sample"]
+    response = client.post(
+        "/metabolomics/packed",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": _metabolomics(sample.id, ["pyr"])},
+    )
+    assert response.status_code == 409
+    assert response.json["message"] == (
+        f"The measurements of samples {sample.id} are stored as rows"
+    )
+    assert sample.packed_metabolomics is None
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/metabolomics", lambda id: _metabolomics(id, ["pyr"])[0]),
+        (
+            "/metabolomics/batch",
+            lambda id: {"body": _metabolomics(id, ["pyr"])},
+        ),
+        ("/proteomics", _proteomics),
+        ("/proteomics/batch", lambda id: {"body": [_proteomics(id)]}),
+    ],
+)
+def test_rows_stored_packed(client, tokens, session, packed, path, body):
+    sample = packed["packed_sample"]
+    response = client.post(
+        path,
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json=body(sample.id),
+    )
+    assert response.status_code == 409
+    assert response.json["message"] == (
+        f"The measurements of samples {sample.id} are stored packed"
+    )
+
+
+def test_pack_missing_sample(client, tokens, session, data_fixtures):
+    response = client.post(
+        "/metabolomics/packed",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"body": _metabolomics(404, ["glc__D"])},
+    )
+    assert response.status_code == 404
+    assert models.PackedMetabolomics.query.count() == 0
+
+
+def test_pack_requires_write(client, tokens, session, data_fixtures):
+    response = client.post(
+        "/metabolomics/packed",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        json={"body": _metabolomics(data_fixtures["sample"].id, ["glc__D"])},
+    )
+    assert response.status_code == 403
+
+
+def test_data_unpacked(client, tokens, session, packed):
+    response = client.get(
+        f"/conditions/{packed['condition'].id}/data",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    first, _, third = response.json["samples"]
+    assert [metabolomics["id"] for metabolomics in first["metabolomics"]] == [
+        packed["metabolomics"][0].id
+    ]
+    glc, ac, pyr = packed["packed_sample"].packed_metabolomics.ids
+    assert [
+        (metabolomics["id"], metabolomics["compound_identifier"])
+        for metabolomics in third["metabolomics"]
+    ] == [(glc, "glc__D"), (ac, "ac"), (pyr, "pyr")]
+    assert third["metabolomics"][1] == {
+        "id": ac,
+        "sample_id": packed["packed_sample"].id,
+        "compound_name": "Acetate",
+        "compound_identifier": "ac",
+        "compound_namespace": "bigg.metabolite",
+        "measurement": 1.0,
+        "uncertainty": None,
+    }
+    (proteomics,) = third["proteomics"]
+    assert proteomics["full_name"] == "Fructose-bisphosphate aldolase class 2"
+    assert proteomics["gene"] == {"name": "fbaA"}
+
+    response = client.get(
+        f"/experiments/{packed['experiment'].id}/data",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    (condition,) = response.json["conditions"]
+    assert condition["samples"][2]["metabolomics"] == third["metabolomics"]
+
+
+def test_get_unpacked(client, tokens, session, packed):
+    glc, ac, pyr = packed["packed_sample"].packed_metabolomics.ids
+    response = client.get(
+        "/metabolomics", headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert {metabolomics["id"] for metabolomics in response.json} == {
+        *(metabolomics.id for metabolomics in packed["metabolomics"]),
+        glc,
+        ac,
+        pyr,
+    }
+
+    response = client.get(
+        "/metabolomics",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"ids": f"{packed['metabolomics'][0].id},{ac}"},
+    )
+    assert response.status_code == 200
+    assert sorted(
+        metabolomics["compound_identifier"] for metabolomics in response.json
+    ) == ["ac", "glc__D"]
+
+    response = client.get(
+        f"/metabolomics/{pyr}",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert response.json["compound_name"] == "Pyruvate"
+    assert response.json["sample_id"] == packed["packed_sample"].id
+
+    (protein_id,) = packed["packed_sample"].packed_proteomics.ids
+    response = client.get(
+        "/proteomics",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"gene": "name:fbaA"},
+    )
+    assert response.status_code == 200
+    assert [proteomics["id"] for proteomics in response.json] == [protein_id]
+
+
+def test_get_unpacked_invisible(client, tokens, session, packed):
+    (id, *_) = packed["packed_sample"].packed_metabolomics.ids
+    # The experiment belongs to project 1.
+    response = client.get(f"/metabolomics/{id}")
+    assert response.status_code == 404
+
+
+def test_statistics_unpacked(client, tokens, session, packed):
+    response = client.get(
+        f"/conditions/{packed['condition'].id}/statistics",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"types": "metabolomics"},
+    )
+    assert response.status_code == 200
+    # Glucose is measured in all three samples, one of which is packed.
+    glucose, pyruvate = [
+        (statistics["compound_identifier"], statistics["count"])
+        for statistics in response.json["metabolomics"]
+        if statistics["compound_identifier"] in ("glc__D", "pyr")
+    ]
+    assert glucose == ("glc__D", 3)
+    assert pyruvate == ("pyr", 1)
+
+
+def test_matrix_unpacked(client, tokens, session, packed):
+    response = client.get(
+        f"/experiments/{packed['experiment'].id}/matrix",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "metabolomics"},
+    )
+    assert response.status_code == 200
+    matrix = response.json
+    assert matrix["sample_ids"][-1] == packed["packed_sample"].id
+    assert "pyr" in matrix["columns"]["compound_identifier"]
+
+
+def test_time_series_unpacked(client, tokens, session, packed):
+    response = client.get(
+        f"/conditions/{packed['condition'].id}/time-series",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"type": "proteomics", "identifier": "P0AB71"},
+    )
+    assert response.status_code == 200
+    assert response.json == [
+        {
+            "start_time": "2019-10-28T16:00:00",
+            "end_time": "2019-10-28T17:00:00",
+            "measurement": 0.2,
+            "uncertainty": 0.01,
+            "count": 1,
+        }
+    ]
+
+
+def test_search_unpacked(client, tokens, session, packed):
+    response = client.get(
+        "/measurements/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"identifier": "pyr", "types": "metabolomics"},
+    )
+    assert response.status_code == 200
+    (group,) = response.json["conditions"]
+    (_, _, pyr) = packed["packed_sample"].packed_metabolomics.ids
+    assert [metabolomics["id"] for metabolomics in group["metabolomics"]] == [
+        pyr
+    ]
+
+
+def test_delete_packed(client, tokens, session, packed):
+    ids = [
+        *packed["packed_sample"].packed_metabolomics.ids,
+        *(metabolomics.id for metabolomics in packed["metabolomics"]),
+    ]
+    response = client.delete(
+        f"/experiments/{packed['experiment'].id}/measurements"
+        f"?types=metabolomics",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+    )
+    assert response.status_code == 200
+    # The packed measurements are counted one by one.
+    assert response.json == {"metabolomics": 5}
+    assert models.PackedMetabolomics.query.count() == 0
+    assert models.PackedProteomics.query.count() == 1
+    # Tombstones are recorded for the packed measurements one by one.
+    assert {
+        (tombstone.resource, tombstone.object_id)
+        for tombstone in models.Tombstone.query
+    } == {("metabolomics", id) for id in ids}
+
+
+@pytest.mark.parametrize("method", ["put", "delete"])
+def test_item_packed(client, tokens, session, packed, method):
+    (id, *_) = packed["packed_sample"].packed_metabolomics.ids
+    response = getattr(client, method)(
+        f"/metabolomics/{id}",
+        headers={"Authorization": f"Bearer {tokens['admin']}"},
+        json={"measurement": 2.0},
+    )
+    assert response.status_code == 409
+    assert response.json["message"] == (
+        f"The measurement {id} is stored packed with those of sample "
+        f"{packed['packed_sample'].id}, which are replaced together"
+    )
+    session.expire_all()
+    assert packed["packed_sample"].packed_metabolomics.measurements[0] == 1.0
+
+
+def test_clone_packed(client, tokens, session, packed):
+    response = client.post(
+        f"/experiments/{packed['experiment'].id}/clone",
+        headers={"Authorization": f"Bearer {tokens['write']}"},
+        json={"name": "Clone"},
+    )
+    assert response.status_code == 201
+    (copy,) = models.PackedMetabolomics.query.filter_by(
+        experiment_id=response.json["id"]
+    ).all()
+    original = packed["packed_sample"].packed_metabolomics
+    assert copy.sample_id != original.sample_id
+    assert copy.compound_ids == original.compound_ids
+    # The copied measurements have ids of their own.
+    assert len(set(copy.ids)) == 3
+    assert not set(copy.ids) & set(original.ids)
@@ -0,0 +1,454 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Guard the number of SQL statements executed per API request.
+
+Every method of every registered resource declares the maximum number of
+statements it may execute against a dataset with several rows per relation.
+Lazy loading of relationships per row (N+1 queries) therefore exceeds the
+declared budget and fails the test. Lower a budget when optimizing an endpoint;
+raising one should be a conscious decision made during review.
+"""
+
+from datetime import datetime
+
+import pytest
+from flask_apispec import MethodResource
+
+from warehouse import models
+
+
+def _fluxomics(sample_id):
+    return {
+        "sample_id": sample_id,
+        "reaction_name": "Triose-phosphate isomerase",
+        "reaction_identifier": "TPI",
+        "reaction_namespace": "bigg.reaction",
+        "measurement": 1.0,
+        "uncertainty": 0.1,
+    }
+
+
+def _compound(sample_id):
+    return {
+        "sample_id": sample_id,
+        "compound_name": "D-Fructose",
+        "compound_identifier": "fru",
+        "compound_namespace": "bigg.metabolite",
+        "measurement": 1.0,
+        "uncertainty": 0.1,
+    }
+
+
+def _proteomics(sample_id):
+    return {
+        "sample_id": sample_id,
+        "identifier": "P0A858",
+        "name": "TPIS_ECOLI",
+        "full_name": "Triosephosphate isomerase",
+        "gene": {"name": "tpiA"},
+        "measurement": 1.0,
+        "uncertainty": 0.1,
+    }
+
+
+def _molar_yield(sample_id):
+    return {
+        "sample_id": sample_id,
+        "product_name": "Acetate",
+        "product_identifier": "ac",
+        "product_namespace": "bigg.metabolite",
+        "substrate_name": "D-Glucose",
+        "substrate_identifier": "glc__D",
+        "substrate_namespace": "bigg.metabolite",
+        "measurement": 0.5,
+        "uncertainty": 0.1,
+    }
+
+
+def _batch(factory):
+    """Create a batch request spanning every sample in the fixtures."""
+    return lambda f: {"body": [factory(sample.id) for sample in f["samples"]]}
+
+
+# Each case is (method, rule, fixture key of the `<int:id>` object, payload
+# factory, maximum number of statements).
+BUDGETS = [
+    ("GET", "/organisms", None, None, 1),
+    ("POST", "/organisms", None, lambda f: {"project_id": 1, "name": "A"}, 2),
+    ("GET", "/organisms/<int:id>", "organism", None, 1),
+    ("PUT", "/organisms/<int:id>", "organism", lambda f: {"name": "B"}, 3),
+    ("DELETE", "/organisms/<int:id>", "organism", None, 2),
+    ("GET", "/strains", None, None, 1),
+    (
+        "POST",
+        "/strains",
+        None,
+        lambda f: {
+            "project_id": 1,
+            "organism_id": f["organism"].id,
+            "parent_id": f["strain"].id,
+            "name": "Child",
+            "genotype": "+pgi",
+        },
+        5,
+    ),
+    ("GET", "/strains/<int:id>", "strain", None, 1),
+    ("GET", "/strains/<int:id>/ancestors", "strain", None, 2),
+    ("GET", "/strains/<int:id>/descendants", "strain", None, 2),
+    (
+        "GET",
+        "/strains/common-ancestor",
+        None,
+        lambda f: {"ids": f["strain"].id},
+        2,
+    ),
+    ("PUT", "/strains/<int:id>", "strain", lambda f: {"name": "B"}, 3),
+    ("DELETE", "/strains/<int:id>", "strain", None, 3),
+    ("GET", "/experiments", None, None, 1),
+    (
+        "POST",
+        "/experiments",
+        None,
+        lambda f: {"project_id": 1, "name": "A", "description": "B"},
+        2,
+    ),
+    ("GET", "/experiments/<int:id>", "experiment", None, 1),
+    ("PUT", "/experiments/<int:id>", "experiment", lambda f: {"name": "B"}, 3),
+    ("DELETE", "/experiments/<int:id>", "experiment", None, 2),
+    ("POST", "/experiments/<int:id>/clone", "experiment", None, 2),
+    # The packed measurements are loaded and deleted along with each type.
+    ("GET", "/experiments/<int:id>/data", "experiment", None, 12),
+    # Relations left out are not loaded.
+    (
+        "GET",
+        "/experiments/<int:id>/data",
+        "experiment",
+        lambda f: {"include": "growth_rate"},
+        4,
+    ),
+    # Exports only queue a job, like background imports.
+    ("POST", "/experiments/<int:id>/export", "experiment", None, 4),
+    ("GET", "/experiments/<int:id>/statistics", "experiment", None, 8),
+    (
+        "GET",
+        "/experiments/<int:id>/matrix",
+        "experiment",
+        lambda f: {"type": "fluxomics"},
+        2,
+    ),
+    ("DELETE", "/experiments/<int:id>/measurements", "experiment", None, 9),
+    ("GET", "/media", None, None, 1),
+    ("POST", "/media", None, lambda f: {"project_id": 1, "name": "A"}, 2),
+    ("GET", "/media/<int:id>", "medium", None, 1),
+    ("PUT", "/media/<int:id>", "project_medium", lambda f: {"name": "B"}, 3),
+    ("DELETE", "/media/<int:id>", "project_medium", None, 2),
+    ("GET", "/media/compounds", None, None, 1),
+    (
+        "POST",
+        "/media/compounds",
+        None,
+        lambda f: {
+            "medium_id": f["project_medium"].id,
+            "compound_name": "D-Glucose",
+            "compound_identifier": "glc__D",
+            "compound_namespace": "bigg.metabolite",
+            "mass_concentration": 2.0,
+        },
+        3,
+    ),
+    ("GET", "/media/compounds/<int:id>", "medium_compound", None, 1),
+    (
+        "PUT",
+        "/media/compounds/<int:id>",
+        "project_medium_compound",
+        lambda f: {"mass_concentration": 4.0},
+        3,
+    ),
+    (
+        "DELETE",
+        "/media/compounds/<int:id>",
+        "project_medium_compound",
+        None,
+        2,
+    ),
+    ("GET", "/conditions", None, None, 1),
+    (
+        "POST",
+        "/conditions",
+        None,
+        lambda f: {
+            "experiment_id": f["experiment"].id,
+            "strain_id": f["strain"].id,
+            "medium_id": f["medium"].id,
+            "name": "A",
+        },
+        5,
+    ),
+    ("GET", "/conditions/<int:id>", "condition", None, 1),
+    ("PUT", "/conditions/<int:id>", "condition", lambda f: {"name": "B"}, 3),
+    ("DELETE", "/conditions/<int:id>", "condition", None, 2),
+    ("GET", "/conditions/<int:id>/statistics", "condition", None, 7),
+    (
+        "GET",
+        "/conditions/<int:id>/time-series",
+        "condition",
+        lambda f: {
+            "type": "fluxomics",
+            "namespace": "bigg.reaction",
+            "identifier": "PGI",
+            "buckets": 10,
+        },
+        2,
+    ),
+    ("GET", "/conditions/<int:id>/data", "condition", None, 11),
+    ("DELETE", "/conditions/<int:id>/measurements", "condition", None, 9),
+    ("GET", "/samples", None, None, 1),
+    (
+        "GET",
+        "/samples",
+        None,
+        lambda f: {"ids": ",".join(str(sample.id) for sample in f["samples"])},
+        1,
+    ),
+    (
+        "POST",
+        "/samples",
+        None,
+        lambda f: {
+            "condition_id": f["condition"].id,
+            "name": "A",
+            "start_time": datetime(2019, 10, 28, 17, 00).isoformat(),
+            "end_time": None,
+        },
+        3,
+    ),
+    ("GET", "/samples/<int:id>", "sample", None, 1),
+    ("PUT", "/samples/<int:id>", "sample", lambda f: {"name": "B"}, 3),
+    ("DELETE", "/samples/<int:id>", "sample", None, 2),
+    ("DELETE", "/samples/<int:id>/measurements", "sample", None, 9),
+    ("GET", "/search", None, lambda f: {"q": "fixture"}, 1),
+    # One query finds the conditions of the page, one per type loads them.
+    (
+        "GET",
+        "/measurements/search",
+        None,
+        lambda f: {"identifier": "glc__D", "namespace": "bigg.metabolite"},
+        6,
+    ),
+    ("GET", "/tombstones", None, None, 1),
+    ("GET", "/jobs/<int:id>", "job", None, 1),
+    # The job, and its result in a single chunk.
+    ("GET", "/jobs/<int:id>/result", "job", None, 2),
+    # The test client does not consume the stream.
+    ("GET", "/changes", None, None, 0),
+]
+
+# The measurement resources share their structure; declare them in bulk.
+# Creating measurements of entities looks up their dictionary entries first.
+# Those which may be packed check that their samples are not packed.
+for _path, _key, _factory, _post, _batch_post in [
+    ("/fluxomics", "fluxomics", _fluxomics, 4, 3),
+    ("/metabolomics", "metabolomics", _compound, 5, 4),
+    ("/proteomics", "proteomics", _proteomics, 5, 4),
+    ("/uptake-secretion-rates", "uptake_secretion_rates", _compound, 4, None),
+    ("/molar-yields", "molar_yields", _molar_yield, 4, None),
+    # Replacing the growth rate of a sample loads and deletes the previous one.
+    ("/growth-rates", "growth_rates", None, 5, None),
+]:
+    if _factory is None:
+        _factory = lambda sample_id: {  # noqa: E731
+            "sample_id": sample_id,
+            "measurement": 0.4,
+            "uncertainty": 0.0,
+        }
+    BUDGETS.extend(
+        [
+            ("GET", _path, None, None, 1),
+            (
+                "POST",
+                _path,
+                None,
+                # Bind the loop variable at definition time.
+                lambda f, factory=_factory: factory(f["sample"].id),
+                _post,
+            ),
+            ("GET", f"{_path}/<int:id>", _key, None, 1),
+            (
+                "PUT",
+                f"{_path}/<int:id>",
+                _key,
+                lambda f: {"measurement": 2.0},
+                3,
+            ),
+            ("DELETE", f"{_path}/<int:id>", _key, None, 2),
+            (
+                "PATCH",
+                f"{_path}/batch",
+                None,
+                lambda f, key=_key: {
+                    "body": [
+                        {"id": measurement.id, "uncertainty": 0.2}
+                        for measurement in f[key]
+                    ]
+                },
+                2,
+            ),
+        ]
+    )
+    if _batch_post is not None:
+        BUDGETS.append(
+            ("POST", f"{_path}/batch", None, _batch(_factory), _batch_post)
+        )
+
+# Background imports check the samples and queue a job, which is reloaded
+# after the commit to be serialized.
+BUDGETS.append(
+    (
+        "POST",
+        "/fluxomics/batch",
+        None,
+        lambda f: {**_batch(_fluxomics)(f), "background": True},
+        4,
+    )
+)
+
+# Packing measurements looks up their dictionary entries like creating them,
+# checks that the samples store none as rows, and looks up the ids of the
+# measurements packed before the ids drawn for the others.
+for _path, _factory in [
+    ("/metabolomics", _compound),
+    ("/proteomics", _proteomics),
+]:
+    BUDGETS.append(
+        (
+            "POST",
+            f"{_path}/packed",
+            None,
+            lambda f, factory=_factory: {
+                "body": [factory(f["packed_sample"].id)]
+            },
+            6,
+        )
+    )
+
+
+@pytest.fixture(scope="function")
+def fixtures(session, measurement_fixtures):
+    """
+    Extend the measurement fixtures with a medium owned by project 1.
+
+    Measurements are packed for an additional sample, as those of the others
+    are stored as rows.
+    """
+    # The shared medium fixture is public and can therefore not be modified.
+    medium = models.Medium(project_id=1, name="Project medium fixture")
+    medium_compound = models.MediumCompound(
+        medium=medium,
+        compound_name="D-Glucose",
+        compound_identifier="glc__D",
+        compound_namespace="bigg.metabolite",
+        mass_concentration=2.0,
+    )
+    job = models.Job(
+        kind="export",
+        status="done",
+        project_ids=[1],
+        payload={},
+        total=0,
+        status_code=200,
+        result=b"{}",
+    )
+    packed_sample = models.Sample(
+        condition=measurement_fixtures["condition"],
+        name="Packed sample fixture",
+        start_time=datetime(2019, 10, 28, 16, 00),
+        end_time=None,
+    )
+    session.add(medium)
+    session.add(medium_compound)
+    session.add(job)
+    session.add(packed_sample)
+    session.commit()
+    return {
+        **measurement_fixtures,
+        "packed_sample": packed_sample,
+        "project_medium": medium,
+        "project_medium_compound": medium_compound,
+        "job": job,
+    }
+
+
+def _registered_endpoints(app):
+    """Return all (method, rule) pairs served by the API resources."""
+    endpoints = set()
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        view_class = getattr(view, "view_class", None)
+        if view_class is None or not issubclass(view_class, MethodResource):
+            continue
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            endpoints.add((method, rule.rule))
+    return endpoints
+
+
+def test_all_endpoints_have_budgets(app):
+    """Ensure that new endpoints declare their query budget."""
+    declared = {(method, rule) for method, rule, *_ in BUDGETS}
+    assert declared == _registered_endpoints(app)
+
+
+@pytest.mark.parametrize(
+    "method, rule, key, payload, max_queries",
+    BUDGETS,
+    ids=[f"{method} {rule}" for method, rule, *_ in BUDGETS],
+)
+def test_query_budget(
+    client,
+    tokens,
+    session,
+    fixtures,
+    query_counter,
+    method,
+    rule,
+    key,
+    payload,
+    max_queries,
+):
+    if key is None:
+        path = rule
+    else:
+        # The measurement fixtures are lists; address the first item.
+        instance = fixtures[key]
+        if isinstance(instance, list):
+            instance = instance[0]
+        path = rule.replace("<int:id>", str(instance.id))
+    json = payload(fixtures) if payload is not None else None
+    # The payloads of GET requests are their query parameters.
+    query_string = None
+    if method == "GET":
+        query_string, json = json, None
+    token = tokens["read"] if method == "GET" else tokens["admin"]
+    with query_counter as queries:
+        response = client.open(
+            path,
+            method=method,
+            headers={"Authorization": f"Bearer {token}"},
+            json=json,
+            query_string=query_string,
+        )
+    assert response.status_code < 400, response.json
+    assert len(queries) <= max_queries, "\n\n".join(queries.statements)
@@ -0,0 +1,195 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test searching measurements across experiments."""
+
+from datetime import datetime
+
+import pytest
+
+from warehouse import models
+
+
+@pytest.fixture(scope="function")
+def search_fixtures(session, measurement_fixtures):
+    """Measure PGI in two more conditions, one of them in another project."""
+    conditions = []
+    for project_id in (1, 2):
+        experiment = models.Experiment(
+            project_id=project_id, name="Experiment", description=""
+        )
+        condition = models.Condition(
+            experiment=experiment,
+            strain=measurement_fixtures["strain"],
+            medium=measurement_fixtures["medium"],
+            name="Condition",
+        )
+        sample = models.Sample(
+            condition=condition,
+            name="Sample",
+            start_time=datetime(2019, 10, 28, 14, 00),
+        )
+        session.add(
+            models.Fluxomics(
+                sample=sample,
+                reaction_name="Glucose-6-phosphate isomerase",
+                reaction_identifier="PGI",
+                reaction_namespace="bigg.reaction",
+                measurement=2.0,
+                uncertainty=0.1,
+            )
+        )
+        conditions.append(condition)
+    session.commit()
+    return {**measurement_fixtures, "conditions": conditions}
+
+
+def test_search(client, tokens, session, search_fixtures):
+    response = client.get(
+        "/measurements/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={
+            "identifier": "PGI",
+            "namespace": "bigg.reaction",
+            "types": "fluxomics,metabolomics",
+        },
+    )
+    assert response.status_code == 200
+    page = response.json
+    assert page["next"] is None
+    assert [group["condition_id"] for group in page["conditions"]] == [
+        search_fixtures["condition"].id,
+        search_fixtures["conditions"][0].id,
+    ]
+    group = page["conditions"][0]
+    assert group["experiment_id"] == search_fixtures["experiment"].id
+    assert [fluxomics["id"] for fluxomics in group["fluxomics"]] == [
+        fluxomics.id for fluxomics in search_fixtures["fluxomics"]
+    ]
+    assert group["metabolomics"] == []
+    assert "proteomics" not in group
+
+
+def test_search_pages(client, tokens, session, search_fixtures):
+    query = {"identifier": "PGI", "types": "fluxomics", "limit": 1}
+    response = client.get(
+        "/measurements/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string=query,
+    )
+    first = response.json
+    assert first["next"] == search_fixtures["condition"].id
+    response = client.get(
+        "/measurements/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={**query, "after": first["next"]},
+    )
+    second = response.json
+    assert second["next"] is None
+    assert [group["condition_id"] for group in second["conditions"]] == [
+        search_fixtures["conditions"][0].id
+    ]
+
+
+def test_search_molar_yields(client, tokens, session, measurement_fixtures):
+    # Molar yields match both their product and their substrate.
+    for identifier in ("ac", "glc__D"):
+        response = client.get(
+            "/measurements/search",
+            headers={"Authorization": f"Bearer {tokens['read']}"},
+            query_string={"identifier": identifier, "types": "molar_yields"},
+        )
+        (group,) = response.json["conditions"]
+        assert len(group["molar_yields"]) == 2
+
+
+def test_search_not_visible(client, session, search_fixtures):
+    response = client.get(
+        "/measurements/search", query_string={"identifier": "PGI"}
+    )
+    assert response.status_code == 200
+    assert response.json == {"conditions": [], "next": None}
+
+
+def test_search_text(client, tokens, session, data_fixtures):
+    response = client.get(
+        "/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"q": "Samp fix"},
+    )
+    assert response.status_code == 200
+    assert [(hit["type"], hit["id"]) for hit in response.json] == [
+        ("sample", data_fixtures["sample"].id)
+    ]
+    assert response.json[0]["rank"] > 0
+
+
+def test_search_text_genotype(client, tokens, session, data_fixtures):
+    strain = data_fixtures["strain"]
+    strain.genotype = "+pgi -zwf"
+    session.commit()
+    response = client.get(
+        "/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"q": "ZWF", "types": "strain,organism"},
+    )
+    assert response.json == [
+        {"type": "strain", "id": strain.id, "rank": response.json[0]["rank"]}
+    ]
+
+
+def test_search_text_ranking(client, tokens, session, data_fixtures):
+    session.add(
+        models.Experiment(
+            project_id=1,
+            name="Glucose limitation",
+            description="Glucose limited chemostats at glucose 1 g/l",
+        )
+    )
+    session.add(
+        models.Experiment(
+            project_id=1, name="Fed batch", description="Glucose feed"
+        )
+    )
+    session.commit()
+    response = client.get(
+        "/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"q": "gluc", "types": "experiment", "limit": 1},
+    )
+    (hit,) = response.json
+    assert (
+        hit["id"]
+        == models.Experiment.query.filter_by(name="Glucose limitation").one().id
+    )
+
+
+def test_search_text_not_visible(client, session, data_fixtures):
+    response = client.get("/search", query_string={"q": "fixture"})
+    assert response.status_code == 200
+    # Only the compound of the public medium is visible.
+    assert [(hit["type"], hit["id"]) for hit in response.json] == [
+        ("medium_compound", data_fixtures["medium_compound"].id)
+    ]
+
+
+def test_search_text_syntax(client, tokens, session, data_fixtures):
+    response = client.get(
+        "/search",
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+        query_string={"q": "!(&|:*"},
+    )
+    assert response.status_code == 200
+    assert response.json == []
@@ -0,0 +1,185 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test the time series of measurements in conditions."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from warehouse import models
+
+
+@pytest.fixture(scope="function")
+def growth_fixtures(session, data_fixtures):
+    """Measure the growth rate every hour for a day, in reverse order."""
+    start = datetime(2019, 10, 28, 0, 0)
+    for hour in reversed(range(24)):
+        sample = models.Sample(
+            condition=data_fixtures["condition"],
+            name=f"Hour {hour}",
+            start_time=start + timedelta(hours=hour),
+            end_time=start + timedelta(hours=hour, minutes=30),
+        )
+        session.add(
+            models.Growth(sample=sample, measurement=hour, uncertainty=0.1)
+        )
+    session.commit()
+    return data_fixtures
+
+
+def test_time_series(client, tokens, session, measurement_fixtures):
+    response = client.get(
+        f"/conditions/{measurement_fixtures['condition'].id}/time-series",
+        query_string={
+            "type": "fluxomics",
+            "namespace": "bigg.reaction",
+            "identifier": "PGI",
+        },
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 200
+    assert response.json == [
+        {
+            "start_time": "2019-10-28T14:00:00",
+            "end_time": None,
+            "measurement": 1.0,
+            "uncertainty": 0.1,
+            "count": 1,
+        },
+        {
+            "start_time": "2019-10-28T15:00:00",
+            "end_time": "2019-10-28T16:00:00",
+            "measurement": 1.0,
+            "uncertainty": 0.1,
+            "count": 1,
+        },
+    ]
+
+
+def test_time_series_window(client, tokens, session, growth_fixtures):
+    response = client.get(
+        f"/conditions/{growth_fixtures['condition'].id}/time-series",
+        query_string={
+            "type": "growth_rates",
+            "start": "2019-10-28T06:00:00",
+            "end": "2019-10-28T09:00:00",
+        },
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert [point["measurement"] for point in response.json] == [6, 7, 8]
+
+
+def test_time_series_downsampled(client, tokens, session, growth_fixtures):
+    response = client.get(
+        f"/conditions/{growth_fixtures['condition'].id}/time-series",
+        query_string={
+            "type": "growth_rates",
+            "start": "2019-10-28T00:00:00",
+            "buckets": 4,
+        },
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    points = response.json
+    # 23 hours between the first and the last sample in intervals of 5.75.
+    assert [point["count"] for point in points] == [6, 6, 6, 6]
+    assert points[0]["start_time"] == "2019-10-28T00:00:00"
+    assert points[0]["end_time"] == "2019-10-28T05:30:00"
+    assert [point["measurement"] for point in points] == [
+        2.5,
+        8.5,
+        14.5,
+        20.5,
+    ]
+    assert points[0]["uncertainty"] == pytest.approx(0.1 / 6 ** 0.5)
+
+
+def test_time_series_downsampled_unknown_uncertainty(
+    client, tokens, session, data_fixtures
+):
+    start = datetime(2019, 10, 28, 0, 0)
+    for hour in range(6):
+        sample = models.Sample(
+            condition=data_fixtures["condition"],
+            name=f"Hour {hour}",
+            start_time=start + timedelta(hours=hour),
+        )
+        session.add(
+            models.Proteomics(
+                sample=sample,
+                identifier="P0A6T1",
+                name="G6PI_ECOLI",
+                full_name="Glucose-6-phosphate isomerase",
+                gene={"name": "pgi", "locus_tag": "b4025"},
+                measurement=1.0,
+                uncertainty=0.1 if hour % 2 else None,
+            )
+        )
+    session.commit()
+    response = client.get(
+        f"/conditions/{data_fixtures['condition'].id}/time-series",
+        query_string={
+            "type": "proteomics",
+            "identifier": "P0A6T1",
+            "start": "2019-10-28T00:00:00",
+            "buckets": 1,
+        },
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    (point,) = response.json
+    # Only the 3 measurements with an uncertainty propagate theirs.
+    assert point["count"] == 6
+    assert point["uncertainty"] == pytest.approx(0.1 / 3 ** 0.5)
+
+
+def test_time_series_single_bucket(
+    client, tokens, session, measurement_fixtures
+):
+    response = client.get(
+        f"/conditions/{measurement_fixtures['condition'].id}/time-series",
+        query_string={
+            "type": "proteomics",
+            "identifier": "P0A6T1",
+            "start": "2019-10-28T15:00:00",
+            "buckets": 3,
+        },
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.json == [
+        {
+            "start_time": "2019-10-28T15:00:00",
+            "end_time": "2019-10-28T16:00:00",
+            "measurement": 1.0,
+            "uncertainty": 0.1,
+            "count": 1,
+        }
+    ]
+
+
+def test_time_series_requires_entity(client, tokens, session, data_fixtures):
+    response = client.get(
+        f"/conditions/{data_fixtures['condition'].id}/time-series",
+        query_string={"type": "fluxomics", "identifier": "PGI"},
+        headers={"Authorization": f"Bearer {tokens['read']}"},
+    )
+    assert response.status_code == 422
+
+
+def test_time_series_not_visible(client, session, data_fixtures):
+    response = client.get(
+        f"/conditions/{data_fixtures['condition'].id}/time-series",
+        query_string={"type": "growth_rates"},
+    )
+    assert response.status_code == 404
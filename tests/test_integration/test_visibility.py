@@ -0,0 +1,113 @@
+# Copyright (c) 2018, Novo Nordisk Foundation Center for Biosustainability,
+# Technical University of Denmark.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test that resources are visible exactly to the projects owning them."""
+
+import json
+from datetime import datetime
+
+import pytest
+from flask import g
+
+from warehouse import models
+from warehouse.visibility import visible
+
+
+RESOURCES = [("/conditions", "condition"), ("/samples", "sample")]
+
+
+@pytest.fixture(scope="function")
+def projects(session, data_fixtures):
+    """Add an experiment with a condition and sample for projects 2 and None."""
+    fixtures = {}
+    for project_id in (2, None):
+        experiment = models.Experiment(
+            project_id=project_id, name="Other experiment", description="-"
+        )
+        condition = models.Condition(
+            experiment=experiment,
+            strain=data_fixtures["strain"],
+            medium=data_fixtures["medium"],
+            name="Other condition",
+        )
+        sample = models.Sample(
+            condition=condition,
+            name="Other sample",
+            start_time=datetime(2019, 10, 28, 14, 00),
+        )
+        session.add(sample)
+        fixtures[project_id] = {
+            "experiment": experiment,
+            "condition": condition,
+            "sample": sample,
+        }
+    session.commit()
+    fixtures[1] = data_fixtures
+    return fixtures
+
+
+@pytest.mark.parametrize("resource, key", RESOURCES)
+def test_list_visibility(client, tokens, session, projects, resource, key):
+    response = client.get(
+        resource, headers={"Authorization": f"Bearer {tokens['read']}"}
+    )
+    assert response.status_code == 200
+    ids = {item["id"] for item in response.json}
+    assert projects[1][key].id in ids
+    assert projects[None][key].id in ids
+    assert projects[2][key].id not in ids
+
+
+@pytest.mark.parametrize("resource, key", RESOURCES)
+def test_list_visibility_anonymous(client, session, projects, resource, key):
+    response = client.get(resource)
+    assert response.status_code == 200
+    ids = {item["id"] for item in response.json}
+    assert ids == {projects[None][key].id}
+
+
+@pytest.mark.parametrize("resource, key", RESOURCES)
+def test_item_visibility(client, tokens, session, projects, resource, key):
+    headers = {"Authorization": f"Bearer {tokens['admin']}"}
+    for project_id, status_code in [(1, 200), (None, 200), (2, 404)]:
+        response = client.get(
+            f"{resource}/{projects[project_id][key].id}", headers=headers
+        )
+        assert response.status_code == status_code
+    # Public and foreign resources can not be modified.
+    for project_id in (None, 2):
+        response = client.put(
+            f"{resource}/{projects[project_id][key].id}",
+            headers=headers,
+            json={"name": "Modified"},
+        )
+        assert response.status_code == 404
+        response = client.delete(
+            f"{resource}/{projects[project_id][key].id}", headers=headers
+        )
+        assert response.status_code == 404
+
+
+def test_sample_visibility_plan(app, session, projects):
+    """Ensure the sample predicate is planned as a join, not a subplan."""
+    g.jwt_claims = {"prj": {1: "read"}}
+    query = models.Sample.query.filter(visible(models.Sample))
+    statement = query.statement.compile(
+        dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    ((plan,),) = session.execute(f"EXPLAIN (FORMAT JSON) {statement}")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    assert "Subplan Name" not in json.dumps(plan)